@@ -0,0 +1,82 @@
+"""
+Benchmark da exportacao em xlsx
+
+Compara o DataFrame.to_excel (openpyxl padrao) com o export.to_excel
+(openpyxl write_only em blocos), cada modo em um processo separado
+para medir o pico de RSS
+
+uso: python benchmarks/bench_excel.py --linhas 300000
+"""
+from comum import pico_rss_mb, roda_isolado, imprime_tabela
+from pathlib import Path
+import argparse
+import json
+import tempfile
+import time
+
+
+def produtos_sintetico(linhas: int):
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+    meses = pd.date_range('2023-01-01', periods=18, freq='MS').strftime('%Y-%m-%d')
+
+    return pd.DataFrame({
+        'page_dh_inclusao': pd.Timestamp('2024-07-01'),
+        'page_cd_filial': rng.integers(1, 400, linhas).astype('int16'),
+        'prfi_vl_cmpg': rng.uniform(1, 300, linhas).astype('float32'),
+        'prme_cd_produto': rng.integers(1, 90_000, linhas),
+        'prme_vl_conffinal': rng.integers(1, 30, linhas).astype('int8'),
+        'valor_total': rng.uniform(1, 5000, linhas),
+        **{mes: rng.integers(0, 40, linhas).astype('int32') for mes in meses},
+        'vendas': rng.uniform(0, 10_000, linhas),
+        'nivel1': pd.Categorical(rng.choice(['Medicamentos', 'Perfumaria', 'Conveniencia'], linhas)),
+    })
+
+
+def executa_modo(modo: str, linhas: int, pasta: str) -> None:
+    from export import to_excel
+
+    df = produtos_sintetico(linhas)
+    saida = Path(pasta) / f'{modo}.xlsx'
+
+    inicio = time.perf_counter()
+    if modo == 'to_excel':
+        df.to_excel(saida, index=False)
+    else:
+        to_excel(df, saida)
+    tempo = time.perf_counter() - inicio
+
+    print(json.dumps({
+        'modo': modo,
+        'linhas': linhas,
+        'segundos': round(tempo, 2),
+        'linhas_s': int(linhas / tempo),
+        'pico_rss_mb': round(pico_rss_mb(), 1),
+        'arquivo_mb': round(saida.stat().st_size / 1024 ** 2, 1),
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--linhas', type=int, default=300_000)
+    parser.add_argument('--modo', choices=['to_excel', 'write_only'])
+    parser.add_argument('--pasta')
+    args = parser.parse_args()
+
+    if args.modo:
+        executa_modo(args.modo, args.linhas, args.pasta)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        resultados = [
+            roda_isolado(__file__, '--modo', modo, '--linhas', str(args.linhas), '--pasta', tmp)
+            for modo in ['to_excel', 'write_only']
+        ]
+
+    imprime_tabela(resultados)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark do fetch do get_table
+
+Compara o caminho antigo (fetchall + um dict por linha) com o
+fetch_frame (fetchmany em lotes direto para colunas arrow),
+cada modo roda em um processo separado para medir o pico de RSS
+
+uso: python benchmarks/bench_fetch.py --linhas 2000000 --batch 50000
+"""
+from comum import pico_rss_mb, roda_isolado, imprime_tabela
+from datetime import datetime, timedelta
+from pathlib import Path
+import argparse
+import json
+import random
+import sqlite3
+import tempfile
+import time
+
+
+def cria_kardex(file: Path, linhas: int) -> None:
+    inicio = datetime(2023, 1, 1)
+
+    with sqlite3.connect(file) as con:
+        con.execute("""
+            create table KARDEX_FILIAL (
+                KAFI_CD_PRODUTO integer,
+                KAFI_DT_MOV timestamp,
+                KAFI_TP_MOV text,
+                KAFI_QT_SALDO integer,
+                KAFI_VL_CMPG real
+            )
+        """)
+        con.executemany(
+            'insert into KARDEX_FILIAL values (?, ?, ?, ?, ?)',
+            (
+                (
+                    random.randint(1, 50_000),
+                    inicio + timedelta(days=random.randint(0, 600)),
+                    random.choice(['SV', 'EN', 'TR']),
+                    random.randint(1, 20),
+                    round(random.uniform(1, 300), 2)
+                )
+                for _ in range(linhas)
+            )
+        )
+
+
+def fetch_dicts(cursor, batch_size: int):
+    import pandas as pd
+
+    cols = [col[0] for col in cursor.description]
+    data = [dict(zip(cols, row)) for row in cursor.fetchall()]
+
+    return pd.DataFrame(data)
+
+
+def fetch_colunar(cursor, batch_size: int):
+    from sources import fetch_frame
+
+    return fetch_frame(cursor, batch_size)
+
+
+MODOS = {
+    'dicts': fetch_dicts,
+    'colunar': fetch_colunar,
+}
+
+
+def executa_modo(modo: str, file: str, batch_size: int) -> None:
+    con = sqlite3.connect(file, detect_types=sqlite3.PARSE_DECLTYPES)
+    cursor = con.execute('select * from KARDEX_FILIAL')
+
+    inicio = time.perf_counter()
+    df = MODOS[modo](cursor, batch_size)
+    tempo = time.perf_counter() - inicio
+
+    con.close()
+
+    print(json.dumps({
+        'modo': modo,
+        'linhas': len(df),
+        'segundos': round(tempo, 3),
+        'linhas_s': int(len(df) / tempo),
+        'pico_rss_mb': round(pico_rss_mb(), 1),
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--linhas', type=int, default=1_000_000)
+    parser.add_argument('--batch', type=int, default=50_000)
+    parser.add_argument('--modo', choices=list(MODOS))
+    parser.add_argument('--file')
+    args = parser.parse_args()
+
+    if args.modo:
+        executa_modo(args.modo, args.file, args.batch)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file = Path(tmp) / 'kardex.sqlite'
+        cria_kardex(file, args.linhas)
+
+        resultados = [
+            roda_isolado(__file__, '--modo', modo, '--file', str(file), '--batch', str(args.batch))
+            for modo in MODOS
+        ]
+
+    imprime_tabela(resultados)
+
+
+if __name__ == '__main__':
+    main()
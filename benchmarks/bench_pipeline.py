@@ -0,0 +1,178 @@
+"""
+Benchmark das etapas do pipeline sobre os bancos sinteticos
+
+Etapas: fetch (get_table das tres tabelas), transform_produto,
+transform_ruptura, os dois na mesma leitura dos bancos (transform_completo),
+consolidacao do Produtos e exportacao em parquet.
+Para cada etapa: segundos, linhas, linhas/s e pico de RSS da etapa.
+O resultado pode ser salvo em json e comparado com uma execucao anterior
+
+uso:
+    python benchmarks/bench_pipeline.py --lojas 20 --skus 3000 --movimentos 15
+    python benchmarks/bench_pipeline.py --pasta D:/sintetico --saida hoje.json --compara ontem.json
+    python benchmarks/bench_pipeline.py --pasta D:/sintetico --snapshot
+"""
+from comum import PicoMemoria, pico_rss_mb, imprime_tabela
+from dataset import gera_lojas
+from pathlib import Path
+import argparse
+import json
+import tempfile
+import time
+
+
+class Etapas:
+    def __init__(self) -> None:
+        self.resultados: list[dict] = []
+
+    def mede(self, nome: str, func, linhas_entrada: int | None = None):
+        with PicoMemoria() as memoria:
+            inicio = time.perf_counter()
+            resultado, linhas = func()
+            tempo = time.perf_counter() - inicio
+
+        linhas_base = linhas_entrada if linhas_entrada is not None else linhas
+
+        self.resultados.append({
+            'etapa': nome,
+            'segundos': round(tempo, 3),
+            'linhas': linhas,
+            'linhas_s': int(linhas_base / tempo) if tempo else 0,
+            'pico_rss_mb': round(memoria.pico, 1),
+        })
+
+        return resultado
+
+
+def categ_sintetica(skus: int):
+    import numpy as np
+    import pandas as pd
+
+    niveis = ['Medicamentos', 'Perfumaria', 'Conveniencia', 'Higiene', 'Dermocosmeticos']
+
+    return pd.DataFrame({
+        'prme_cd_produto': np.arange(1, skus + 1, dtype='int64'),
+        'descprod': [f'PRODUTO {i}' for i in range(1, skus + 1)],
+        **{f'nivel{n}': pd.Categorical(np.resize(niveis, skus)) for n in range(1, 5)},
+    })
+
+
+class SemProgresso:
+    def emit(self, logs: tuple) -> None:
+        pass
+
+
+def executa(raiz: list[Path], skus: int, workers: int, pasta_saida: Path) -> list[dict]:
+    import utils
+
+    etapas = Etapas()
+    progresso = utils.Progresso(SemProgresso())
+
+    def fetch():
+        linhas = 0
+        for file in raiz:
+            for tabela, cols in [
+                ('KARDEX_FILIAL', utils.COLUNAS_KARDEX),
+                ('PRODUTO_MESTRE', utils.COLUNAS_MESTRE_RUPTURA),
+                ('PARAMETRO_GERAL', utils.COLUNAS_PARAMETRO),
+            ]:
+                linhas += len(utils.get_table(file, tabela, columns=cols))
+        return None, linhas
+
+    etapas.mede('fetch', fetch)
+    # NOTE: linhas/s dos transforms sobre as linhas lidas dos bancos
+    linhas_bancos = etapas.resultados[-1]['linhas']
+
+    def produtos():
+        pre_dfs = utils.processa_arquivos(raiz, utils.transform_produto, progresso, workers)
+        return pre_dfs, sum(len(df) for df in pre_dfs)
+
+    pre_dfs = etapas.mede('transform_produto', produtos, linhas_bancos)
+
+    def ruptura():
+        dfs = utils.processa_arquivos(raiz, utils.transform_ruptura, progresso, workers)
+        return dfs, sum(len(df) for df in dfs)
+
+    etapas.mede('transform_ruptura', ruptura, linhas_bancos)
+
+    def completo():
+        dfs = utils.processa_arquivos(raiz, utils.TransformCompleto(), progresso, workers)
+        return dfs, sum(len(p) + len(r) for p, r in dfs)
+
+    etapas.mede('transform_completo', completo, linhas_bancos)
+
+    categ = categ_sintetica(skus)
+    linhas_longo = sum(len(df) for df in pre_dfs)
+
+    def consolida():
+        dfs = utils.consolida_produtos(pre_dfs, categ)
+        return dfs, len(dfs)
+
+    dfs = etapas.mede('consolida', consolida, linhas_longo)
+
+    def exporta():
+        utils.exporta(dfs, str(pasta_saida / 'Produtos.parquet'), 'parquet')
+        return None, len(dfs)
+
+    etapas.mede('export_parquet', exporta)
+
+    etapas.resultados.append({
+        'etapa': 'total',
+        'segundos': round(sum(r['segundos'] for r in etapas.resultados), 3),
+        'linhas': len(dfs),
+        'linhas_s': 0,
+        'pico_rss_mb': round(pico_rss_mb(), 1),
+    })
+
+    return etapas.resultados
+
+
+def compara(atual: list[dict], anterior: list[dict]) -> None:
+    base = {r['etapa']: r for r in anterior}
+
+    for r in atual:
+        ant = base.get(r['etapa'])
+
+        if ant and ant['segundos']:
+            r['vs_anterior'] = f"{(r['segundos'] / ant['segundos'] - 1) * 100:+.1f}%"
+        else:
+            r['vs_anterior'] = '-'
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pasta', type=Path, help='bancos ja gerados pelo dataset.py')
+    parser.add_argument('--lojas', type=int, default=10)
+    parser.add_argument('--skus', type=int, default=2_000)
+    parser.add_argument('--movimentos', type=float, default=10)
+    parser.add_argument('--meses', type=int, default=24)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--snapshot', action='store_true', help='mede lendo os snapshots parquet dos bancos')
+    parser.add_argument('--saida', type=Path, help='salva o resultado em json')
+    parser.add_argument('--compara', type=Path, help='json de uma execucao anterior')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pasta = args.pasta or Path(tmp) / 'lojas'
+
+        if args.pasta is None:
+            gera_lojas(pasta, args.lojas, args.skus, args.movimentos, args.meses)
+
+        raiz = sorted(pasta.glob('**/*.sqlite'))
+
+        if args.snapshot:
+            from sources import exporta_snapshot
+            raiz = [exporta_snapshot(file, Path(tmp) / 'snapshots', pasta) for file in raiz]
+        resultados = executa(raiz, args.skus, args.workers, Path(tmp))
+
+    if args.compara:
+        compara(resultados, json.loads(args.compara.read_text()))
+
+    imprime_tabela(resultados)
+
+    if args.saida:
+        args.saida.write_text(json.dumps(resultados, indent=4))
+
+
+if __name__ == '__main__':
+    main()
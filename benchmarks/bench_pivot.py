@@ -0,0 +1,147 @@
+"""
+Benchmark da consolidacao do Produtos: pivot por loja x pivot unico
+
+'por_loja' reproduz o fluxo antigo, cada loja pivotada em colunas
+de mes e o concat preenchendo com NaN os meses que faltam, seguido
+de fillna(0) e cast int32. 'unico' concatena o formato longo do
+transform_produto e pivota uma vez (consolida_produtos). 'longo'
+e a exportacao sem pivot. Cada modo roda em um processo separado
+
+uso: python benchmarks/bench_pivot.py --lojas 400 --skus 3000 --meses 24
+"""
+from comum import pico_rss_mb, roda_isolado, imprime_tabela
+import argparse
+import json
+import time
+
+
+def lojas_longo(lojas: int, skus: int, meses: int) -> list:
+    import numpy as np
+    import pandas as pd
+    from utils import LINHA_BASE
+
+    rng = np.random.default_rng(0)
+    calendario = pd.date_range('2022-01-01', periods=meses + 6, freq='MS')
+    pre_dfs = []
+
+    for filial in range(1, lojas + 1):
+        # NOTE: cada loja com uma janela de meses diferente
+        inicio = rng.integers(0, 6)
+        produtos = np.arange(1, skus + 1, dtype='int32')
+        com_venda = produtos[rng.random(skus) < 0.7]
+
+        kardex = pd.DataFrame({
+            'prme_cd_produto': np.repeat(com_venda, meses),
+            'kafi_dt_mov': np.tile(calendario[inicio:inicio + meses], len(com_venda)),
+            'kafi_qt_saldo': rng.integers(1, 40, len(com_venda) * meses).astype('int32'),
+            'valor': rng.uniform(1, 500, len(com_venda) * meses),
+        })
+        kardex['vendas'] = kardex.groupby('prme_cd_produto')['valor'].transform('sum')
+
+        mestre = pd.DataFrame({
+            'page_dh_inclusao': pd.Timestamp('2024-07-01'),
+            'page_cd_filial': np.int16(filial),
+            'prfi_vl_cmpg': rng.uniform(1, 300, skus).astype('float32'),
+            'prme_cd_produto': produtos,
+            'prme_vl_conffinal': rng.integers(1, 30, skus).astype('int8'),
+            'valor_total': rng.uniform(1, 5000, skus),
+            LINHA_BASE: np.arange(skus, dtype='int32'),
+        })
+
+        pre_dfs.append(
+            mestre.merge(kardex, on='prme_cd_produto', how='left')
+            .fillna({'kafi_qt_saldo': 0, 'valor': 0, 'vendas': 0})
+            .astype({'kafi_qt_saldo': 'int32'})
+        )
+
+    return pre_dfs
+
+
+def pivot_por_loja(df):
+    """pivot antigo do transform_produto, uma loja por vez"""
+    import pandas as pd
+    from utils import COLUNAS_LONGO, LINHA_BASE
+
+    kardex = (
+        df.loc[df['kafi_dt_mov'].notna(), ['prme_cd_produto', 'kafi_dt_mov', 'kafi_qt_saldo', 'vendas']]
+        .assign(kafi_dt_mov = lambda _df: _df['kafi_dt_mov'].dt.strftime('%Y-%m-%d'))
+        .pivot_table(
+            values='kafi_qt_saldo',
+            index=['prme_cd_produto', 'vendas'],
+            columns='kafi_dt_mov',
+            aggfunc='sum',
+            fill_value=0
+        )
+        .reset_index()
+    )
+
+    return (
+        df.drop_duplicates('prme_cd_produto')
+        .drop(columns=[*COLUNAS_LONGO, LINHA_BASE, 'vendas'])
+        .merge(kardex, on='prme_cd_produto', how='left')
+        .fillna(0)
+        .pipe(lambda _df: _df.assign(**{col: _df[col].astype('int32') for col in _df.columns if '-' in col}))
+    )
+
+
+def executa_modo(modo: str, lojas: int, skus: int, meses: int) -> None:
+    import numpy as np
+    import pandas as pd
+    from utils import consolida_produtos, ordem_colunas, prepara_produtos
+
+    pre_dfs = lojas_longo(lojas, skus, meses)
+    categ = pd.DataFrame({
+        'prme_cd_produto': np.arange(1, skus + 1, dtype='int64'),
+        'nivel1': pd.Categorical(np.resize(['Medicamentos', 'Perfumaria', 'Conveniencia'], skus)),
+    })
+    base_rss = pico_rss_mb()
+
+    inicio = time.perf_counter()
+    if modo == 'por_loja':
+        largos = [pivot_por_loja(df) for df in pre_dfs]
+        dfs = (
+            pd.concat(largos, ignore_index=True)
+            .loc[:, lambda _df: ordem_colunas(_df.columns.to_list())]
+            .pipe(prepara_produtos, categ)
+        )
+    elif modo == 'unico':
+        dfs = consolida_produtos(pre_dfs, categ)
+    else:
+        dfs = consolida_produtos(pre_dfs, categ, 'longo')
+    tempo = time.perf_counter() - inicio
+
+    print(json.dumps({
+        'modo': modo,
+        'linhas': len(dfs),
+        'colunas': dfs.shape[1],
+        'segundos': round(tempo, 2),
+        'pico_rss_mb': round(pico_rss_mb(), 1),
+        'delta_rss_mb': round(pico_rss_mb() - base_rss, 1),
+        'saida_mb': round(dfs.memory_usage(deep=True).sum() / 1024 ** 2, 1),
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--lojas', type=int, default=400)
+    parser.add_argument('--skus', type=int, default=3_000)
+    parser.add_argument('--meses', type=int, default=24)
+    parser.add_argument('--modo', choices=['por_loja', 'unico', 'longo'])
+    args = parser.parse_args()
+
+    escala = [str(args.lojas), str(args.skus), str(args.meses)]
+
+    if args.modo:
+        executa_modo(args.modo, args.lojas, args.skus, args.meses)
+        return
+
+    resultados = [
+        roda_isolado(__file__, '--modo', modo, '--lojas', escala[0], '--skus', escala[1], '--meses', escala[2])
+        for modo in ['por_loja', 'unico', 'longo']
+    ]
+
+    imprime_tabela(resultados)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark de inicializacao do app (main.py)
+
+Mede o tempo ate a primeira janela e a quantidade de modulos
+importados, e confere que a janela principal e o dialogo de Login
+sobem sem carregar pandas, pyarrow, pyodbc, duckdb ou boto3.
+Retorna 1 quando algum limite e violado (uso em CI / antes do build)
+
+uso: python benchmarks/bench_startup.py --repeticoes 5 --max-ms 1500 --max-modulos 400
+"""
+from comum import RAIZ, imprime_tabela
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+PESADOS = ['pandas', 'pyarrow', 'pyodbc', 'duckdb', 'boto3', 'athena_mvsh', 'numpy']
+
+
+def filho() -> None:
+    inicio = time.perf_counter()
+
+    from PySide6.QtWidgets import QApplication
+    import main
+
+    app = QApplication([])
+    window = main.MainWindow()
+    window.show()
+    app.processEvents()
+
+    t_janela = (time.perf_counter() - inicio) * 1000
+    modulos = len(sys.modules)
+    pesados_janela = [m for m in PESADOS if m in sys.modules]
+
+    from dialog.login import Login
+
+    dialog = Login()
+    dialog.show()
+    app.processEvents()
+
+    print(json.dumps({
+        'ms_janela': round(t_janela, 1),
+        'modulos_janela': modulos,
+        'pesados_janela': pesados_janela,
+        'pesados_login': [m for m in PESADOS if m in sys.modules],
+    }))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--max-ms', type=float)
+    parser.add_argument('--max-modulos', type=int)
+    parser.add_argument('--filho', action='store_true')
+    args = parser.parse_args()
+
+    if args.filho:
+        filho()
+        return 0
+
+    env = {**os.environ, 'QT_QPA_PLATFORM': os.environ.get('QT_QPA_PLATFORM', 'offscreen')}
+    resultados = []
+
+    for _ in range(args.repeticoes):
+        inicio = time.perf_counter()
+        saida = subprocess.run(
+            [sys.executable, __file__, '--filho'],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=RAIZ,
+            env=env
+        )
+        processo_ms = (time.perf_counter() - inicio) * 1000
+
+        resultado = json.loads(saida.stdout.splitlines()[-1])
+        resultado['ms_processo'] = round(processo_ms, 1)
+        resultados.append(resultado)
+
+    ms_janela = statistics.median(r['ms_janela'] for r in resultados)
+    modulos = max(r['modulos_janela'] for r in resultados)
+    pesados = sorted({m for r in resultados for m in r['pesados_janela'] + r['pesados_login']})
+
+    imprime_tabela([{
+        'repeticoes': args.repeticoes,
+        'ms_janela_mediana': ms_janela,
+        'ms_processo_mediana': statistics.median(r['ms_processo'] for r in resultados),
+        'modulos': modulos,
+        'pesados': ','.join(pesados) or '-',
+    }])
+
+    falhas = []
+    if pesados:
+        falhas.append(f'modulos pesados carregados na inicializacao: {pesados}')
+    if args.max_ms is not None and ms_janela > args.max_ms:
+        falhas.append(f'tempo ate a janela {ms_janela} ms > {args.max_ms} ms')
+    if args.max_modulos is not None and modulos > args.max_modulos:
+        falhas.append(f'modulos importados {modulos} > {args.max_modulos}')
+
+    for falha in falhas:
+        print(f'FALHA: {falha}', file=sys.stderr)
+
+    return 1 if falhas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+Micro-benchmark da remocao de acentos no converter_numeric_txt
+
+Compara o map(remove_accent) por celula, sem memo, com o
+normaliza_texto (factorize + lru_cache) sobre a tabela de
+categorias do categ_athena. Usa o categ.parquet do CategCache
+(CACHE_DIR) se existir, senao gera uma tabela com a mesma forma
+
+uso: python benchmarks/bench_texto.py --linhas 600000
+"""
+from comum import imprime_tabela
+from unicodedata import combining, normalize
+from pathlib import Path
+import argparse
+import random
+import time
+
+
+NIVEIS = [
+    'Medicamentos', 'Higiene e Beleza', 'Perfumaria', 'Conveniência',
+    'Dermocosméticos', 'Genéricos', 'Nutrição', 'Mamãe e Bebê',
+    'Cuidados Diários', 'Saúde', 'Ortopédicos', 'Suplementação'
+]
+
+
+def remove_accent_antigo(txt):
+    import pandas as pd
+
+    if txt is None:
+        return txt
+
+    if pd.isna(txt):
+        return txt
+
+    nfd = normalize('NFD', txt)
+    comb = ''.join(c for c in nfd if not combining(c))
+
+    return normalize('NFC', comb)
+
+
+def categ_sintetica(linhas: int):
+    import pandas as pd
+
+    descricoes = [
+        f'{random.choice(NIVEIS)} Ação {i} Cápsulas {random.randint(1, 90)}mg'
+        for i in range(linhas // 4)
+    ]
+
+    return pd.DataFrame({
+        'prme_cd_produto': range(linhas),
+        'descprod': random.choices(descricoes, k=linhas),
+        **{
+            f'nivel{n}': random.choices([f'{v} Nível {n}' for v in NIVEIS], k=linhas)
+            for n in range(1, 5)
+        }
+    })
+
+
+def main() -> None:
+    import pandas as pd
+    from config import CACHE_DIR
+    from utils import normaliza_texto, _remove_accent
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--linhas', type=int, default=600_000)
+    parser.add_argument('--categ', type=Path, default=CACHE_DIR / 'categ.parquet')
+    args = parser.parse_args()
+
+    if args.categ.is_file():
+        categ = pd.read_parquet(args.categ)
+        categ = categ.astype({c: object for c in categ.select_dtypes(['category', 'string']).columns})
+        print(f'categoria: {args.categ}')
+    else:
+        categ = categ_sintetica(args.linhas)
+        print(f'categoria: sintetica, {args.categ} nao encontrado')
+
+    texto = categ.select_dtypes('object').columns
+
+    resultados = []
+    for modo, func in [
+        ('map', lambda s: s.map(remove_accent_antigo)),
+        ('factorize', normaliza_texto),
+        ('factorize_arrow', lambda s: normaliza_texto(s, 'arrow')),
+    ]:
+        _remove_accent.cache_clear()
+
+        inicio = time.perf_counter()
+        saida = categ.assign(**{c: func(categ[c]) for c in texto})
+        tempo = time.perf_counter() - inicio
+
+        resultados.append({
+            'modo': modo,
+            'linhas': len(categ),
+            'segundos': round(tempo, 3),
+            'celulas_s': int(len(categ) * len(texto) / tempo),
+            'memoria_mb': round(saida[texto].memory_usage(deep=True).sum() / 1024 ** 2, 1),
+        })
+
+    imprime_tabela(resultados)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark da conversao de tipos: encadeamento de assign x otimiza_tipos
+
+'encadeado' reproduz o converter_numeric_txt antigo, quatro assign
+encadeados (cada um copia o frame inteiro), seguido do fillna(0) dos
+numeros e do assign int32 dos meses do prepara_produtos. 'otimiza' faz
+o mesmo em uma passada por coluna (utils.otimiza_tipos). O frame tem a
+forma do Produtos largo: meses com nulos, valores, codigos e texto das
+categorias. Cada modo roda em um processo separado
+
+uso: python benchmarks/bench_tipos.py --linhas 500000 --meses 36
+"""
+from comum import pico_rss_mb, roda_isolado, imprime_tabela
+import argparse
+import json
+import time
+
+
+NIVEIS = ['Medicamentos', 'Higiene e Beleza', 'Perfumaria', 'Conveniência', 'Dermocosméticos']
+
+
+def produtos_largo(linhas: int, meses: int):
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+    calendario = pd.date_range('2022-01-01', periods=meses, freq='MS').strftime('%Y-%m-%d')
+
+    # NOTE: meses em float com NaN, como no concat dos pivots por loja
+    vendas = rng.integers(0, 40, (linhas, meses)).astype('float64')
+    vendas[rng.random((linhas, meses)) < 0.3] = np.nan
+
+    return pd.concat(
+        [
+            pd.DataFrame({
+                'page_cd_filial': rng.integers(1, 1_500, linhas),
+                'prme_cd_produto': rng.integers(1, 90_000, linhas),
+                'prfi_vl_cmpg': rng.uniform(1, 300, linhas),
+                'prme_vl_conffinal': rng.integers(1, 30, linhas).astype('float64'),
+                'valor_total': rng.uniform(1, 5_000, linhas),
+                'nivel1': rng.choice(NIVEIS, linhas).astype(object),
+                'nivel2': rng.choice([f'{n} Nível 2' for n in NIVEIS], linhas).astype(object),
+            }),
+            pd.DataFrame(vendas, columns=calendario),
+        ],
+        axis=1
+    )
+
+
+def encadeado(df):
+    import pandas as pd
+    from utils import normaliza_texto
+
+    numeros = ['number']
+    inteiros = ['integer']
+    ponto_flutuante = ['float']
+    texto = ['object']
+
+    return (
+        df
+        .pipe(lambda _df: _df.assign(**{c:_df[c].fillna(0) for c in _df.select_dtypes(numeros)}))
+        .pipe(lambda _df: _df.assign(**{c:pd.to_numeric(_df[c], downcast='integer') for c in _df.select_dtypes(inteiros)}))
+        .pipe(lambda _df: _df.assign(**{c:pd.to_numeric(_df[c], downcast='float') for c in _df.select_dtypes(ponto_flutuante)}))
+        .pipe(lambda _df: _df.assign(**{c:normaliza_texto(_df[c]) for c in _df.select_dtypes(texto)}))
+        .pipe(lambda _df: _df.fillna({c: 0 for c in _df.select_dtypes(numeros)}))
+        .pipe(lambda _df: _df.assign(**{col: _df[col].astype('int32') for col in _df.columns if '-' in col}))
+    )
+
+
+def executa_modo(modo: str, linhas: int, meses: int) -> None:
+    from utils import otimiza_tipos, tamanho
+
+    df = produtos_largo(linhas, meses)
+    bytes_antes = tamanho(df)
+    base_rss = pico_rss_mb()
+
+    inicio = time.perf_counter()
+    if modo == 'encadeado':
+        saida = encadeado(df)
+    else:
+        saida = otimiza_tipos(df, {col: 'int32' for col in df.columns if '-' in col})
+    tempo = time.perf_counter() - inicio
+
+    print(json.dumps({
+        'modo': modo,
+        'linhas': len(saida),
+        'colunas': saida.shape[1],
+        'segundos': round(tempo, 2),
+        'pico_rss_mb': round(pico_rss_mb(), 1),
+        'delta_rss_mb': round(pico_rss_mb() - base_rss, 1),
+        'antes_mb': round(bytes_antes / 1024 ** 2, 1),
+        'depois_mb': round(tamanho(saida) / 1024 ** 2, 1),
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--linhas', type=int, default=500_000)
+    parser.add_argument('--meses', type=int, default=36)
+    parser.add_argument('--modo', choices=['encadeado', 'otimiza'])
+    args = parser.parse_args()
+
+    escala = ['--linhas', str(args.linhas), '--meses', str(args.meses)]
+
+    if args.modo:
+        executa_modo(args.modo, args.linhas, args.meses)
+        return
+
+    resultados = [
+        roda_isolado(__file__, '--modo', modo, *escala)
+        for modo in ['encadeado', 'otimiza']
+    ]
+
+    imprime_tabela(resultados)
+
+
+if __name__ == '__main__':
+    main()
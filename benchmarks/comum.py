@@ -0,0 +1,66 @@
+"""
+Funcoes comuns aos benchmarks
+"""
+from pathlib import Path
+import json
+import subprocess
+import sys
+import threading
+
+
+RAIZ = Path(__file__).parent.parent
+
+if str(RAIZ) not in sys.path:
+    sys.path.insert(0, str(RAIZ))
+
+from metrics import pico_rss_mb, rss_atual_mb
+
+
+class PicoMemoria:
+    """amostra o rss em uma thread enquanto o bloco executa,
+    para ter o pico de cada etapa e nao so o do processo
+    """
+
+    def __init__(self, intervalo: float = 0.01) -> None:
+        self.intervalo = intervalo
+        self.pico = 0.0
+        self._parar = threading.Event()
+
+    def _amostra(self) -> None:
+        while not self._parar.is_set():
+            self.pico = max(self.pico, rss_atual_mb())
+            self._parar.wait(self.intervalo)
+
+    def __enter__(self) -> 'PicoMemoria':
+        self.pico = rss_atual_mb()
+        self._thread = threading.Thread(target=self._amostra, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._parar.set()
+        self._thread.join()
+        self.pico = max(self.pico, rss_atual_mb())
+
+
+def roda_isolado(script: str, *args: str) -> dict:
+    """executa o script em outro processo para medir o pico de memoria
+    sem interferencia das outras medicoes, o script imprime um json
+    """
+    saida = subprocess.run(
+        [sys.executable, script, *args],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+    return json.loads(saida.stdout.splitlines()[-1])
+
+
+def imprime_tabela(linhas: list[dict]) -> None:
+    cols = list(linhas[0].keys())
+    larguras = [max(len(c), *(len(f'{l[c]}') for l in linhas)) for c in cols]
+
+    print('  '.join(c.ljust(w) for c, w in zip(cols, larguras)))
+    for linha in linhas:
+        print('  '.join(f'{linha[c]}'.ljust(w) for c, w in zip(cols, larguras)))
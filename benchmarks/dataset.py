@@ -0,0 +1,133 @@
+"""
+Gerador de bancos sinteticos das lojas
+
+Cria um arquivo sqlite por loja com as tabelas KARDEX_FILIAL,
+PRODUTO_MESTRE e PARAMETRO_GERAL nos mesmos nomes e tipos lidos
+pelo get_table, para medir o pipeline sem os .accdb reais
+
+uso: python benchmarks/dataset.py D:/sintetico --lojas 400 --skus 5000 --movimentos 20 --meses 24
+"""
+from comum import RAIZ
+from datetime import datetime
+from pathlib import Path
+import argparse
+import sqlite3
+
+import numpy as np
+
+
+TIPOS_MOV = np.array(['SV', 'EN', 'TR', 'AJ'])
+PROB_MOV = [0.7, 0.15, 0.1, 0.05]
+
+
+def gera_loja(
+    file: Path,
+    filial: int,
+    skus: int,
+    movimentos: int,
+    meses: int,
+    rng: np.random.Generator
+) -> dict:
+    """movimentos -> media de linhas do kardex por sku"""
+
+    produtos = np.arange(1, skus + 1)
+    estoque = rng.integers(0, 60, skus)
+    subestoque = np.where(rng.random(skus) < 0.15, estoque, rng.integers(0, 5, skus))
+    custo = rng.uniform(1, 300, skus).round(2)
+
+    mestre = zip(
+        produtos.tolist(),
+        estoque.tolist(),
+        subestoque.tolist(),
+        custo.tolist(),
+        rng.integers(0, 80, skus).tolist(),
+        (custo * rng.uniform(1.2, 2.5, skus)).round(2).tolist(),
+    )
+
+    linhas = int(skus * movimentos)
+    fim = np.datetime64(f'{datetime.now():%Y-%m}-01', 's')
+    segundos = rng.integers(0, meses * 30 * 86400, linhas)
+    datas = (fim - segundos.astype('timedelta64[s]')).astype(datetime)
+
+    kardex = zip(
+        rng.choice(produtos, linhas).tolist(),
+        datas.tolist(),
+        rng.choice(TIPOS_MOV, linhas, p=PROB_MOV).tolist(),
+        rng.integers(1, 12, linhas).tolist(),
+        rng.uniform(1, 300, linhas).round(2).tolist(),
+    )
+
+    file.unlink(missing_ok=True)
+
+    with sqlite3.connect(file) as con:
+        con.executescript("""
+            create table PRODUTO_MESTRE (
+                PRME_CD_PRODUTO integer primary key,
+                PRME_VL_CONFFINAL integer,
+                QTDE_SUBESTOQUE integer,
+                PRFI_VL_CMPG real,
+                PRFI_QT_ESTOQATUAL integer,
+                PRFI_VL_PRECOVENDA real
+            );
+            create table KARDEX_FILIAL (
+                KAFI_CD_PRODUTO integer,
+                KAFI_DT_MOV timestamp,
+                KAFI_TP_MOV text,
+                KAFI_QT_SALDO integer,
+                KAFI_VL_CMPG real
+            );
+            create table PARAMETRO_GERAL (
+                PAGE_CD_FILIAL integer,
+                PAGE_DH_INCLUSAO text
+            );
+        """)
+        con.executemany('insert into PRODUTO_MESTRE values (?, ?, ?, ?, ?, ?)', mestre)
+        con.executemany('insert into KARDEX_FILIAL values (?, ?, ?, ?, ?)', kardex)
+        con.execute(
+            'insert into PARAMETRO_GERAL values (?, ?)',
+            # NOTE: texto dia/mes como no access, lido com dayfirst
+            (filial, f'{datetime.now():%d/%m/%Y %H:%M:%S}')
+        )
+
+    return {'PRODUTO_MESTRE': skus, 'KARDEX_FILIAL': linhas, 'PARAMETRO_GERAL': 1}
+
+
+def gera_lojas(
+    pasta: Path | str,
+    lojas: int = 10,
+    skus: int = 2_000,
+    movimentos: float = 10,
+    meses: int = 24,
+    seed: int = 0
+) -> list[Path]:
+    pasta = Path(pasta)
+    pasta.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    arquivos = []
+    for filial in range(1, lojas + 1):
+        file = pasta / f'loja_{filial:04d}' / 'loja.sqlite'
+        file.parent.mkdir(exist_ok=True)
+
+        gera_loja(file, filial, skus, movimentos, meses, rng)
+        arquivos.append(file)
+
+    return arquivos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('pasta', type=Path, nargs='?', default=RAIZ / 'sintetico')
+    parser.add_argument('--lojas', type=int, default=10)
+    parser.add_argument('--skus', type=int, default=2_000)
+    parser.add_argument('--movimentos', type=float, default=10)
+    parser.add_argument('--meses', type=int, default=24)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    arquivos = gera_lojas(args.pasta, args.lojas, args.skus, args.movimentos, args.meses, args.seed)
+    print(f'{len(arquivos)} lojas geradas em {args.pasta}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,465 @@
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+from contextlib import contextmanager
+import pandas as pd
+import hashlib
+import json
+import os
+import time
+import logging
+import threading
+import shutil
+from datetime import datetime
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+@contextmanager
+def grava_atomico(destino: Path | str) -> Iterator[Path]:
+    """caminho temporario para gravar o destino, trocado com os.replace
+    ao sair sem erro, um arquivo interrompido nunca fica pela metade
+
+    o nome leva pid e thread (o agenda grava de varias threads do mesmo
+    processo) e comeca com '.', fora dos glob e do ds.dataset. pasta no
+    lugar de arquivo tambem vale, o destino antigo e removido antes
+
+    with grava_atomico(file) as tmp:
+        df.to_parquet(tmp)
+    """
+    destino = Path(destino)
+    tmp = destino.with_name(f'.{destino.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+
+    try:
+        yield tmp
+
+        if tmp.is_dir():
+            shutil.rmtree(destino, ignore_errors=True)
+
+        os.replace(tmp, destino)
+    finally:
+        if tmp.is_dir():
+            shutil.rmtree(tmp, ignore_errors=True)
+        else:
+            tmp.unlink(missing_ok=True)
+
+
+def limpa_pasta(
+    arquivos: Iterable[Path],
+    vencido: Callable[[Path], bool],
+    max_bytes: int
+) -> int:
+    """remove os arquivos vencidos e, depois, os menos usados (mtime)
+    ate o total ficar abaixo de max_bytes, retorna a quantidade removida
+
+    usado pelo evict() do RunCache e do QueryCache
+    """
+    entradas = []
+    removidos = 0
+
+    for file in arquivos:
+        try:
+            if vencido(file):
+                file.unlink()
+                removidos += 1
+            else:
+                metadados = file.stat()
+                entradas.append((metadados.st_mtime, metadados.st_size, file))
+
+        except Exception as e:
+            logging.warning(f"Cache nao removido, {e} @{file}")
+
+    total = sum(tamanho for _, tamanho, _ in entradas)
+
+    for _, tamanho, file in sorted(entradas):
+        if total <= max_bytes:
+            break
+
+        try:
+            file.unlink()
+        except OSError as e:
+            logging.warning(f"Cache nao removido, {e} @{file}")
+            continue
+
+        total -= tamanho
+        removidos += 1
+
+    return removidos
+
+
+class RunCache:
+    """cache em disco do resultado de cada banco (.accdb)
+
+    a chave e o caminho, tamanho e mtime do banco mais o nome
+    e a versao do pipeline, o resultado fica salvo em parquet
+    """
+
+    def __init__(
+        self,
+        pasta: Path | str,
+        max_idade_dias: float = 30,
+        max_bytes: int = 2 * 1024 ** 3
+    ) -> None:
+        self.pasta = Path(pasta)
+        self.max_idade_dias = max_idade_dias
+        self.max_bytes = max_bytes
+
+    def chave(self, file: Path | str, pipeline: str, versao: int) -> str:
+        file = Path(file).resolve()
+        metadados = file.stat()
+
+        dados = [
+            str(file).lower(),
+            metadados.st_size,
+            metadados.st_mtime_ns,
+            pipeline,
+            versao
+        ]
+
+        return hashlib.sha1(json.dumps(dados).encode('utf-8')).hexdigest()
+
+    def arquivo(self, chave: str) -> Path:
+        return self.pasta / f'{chave}.parquet'
+
+    def get(self, chave: str) -> pd.DataFrame | None:
+        file = self.arquivo(chave)
+
+        if not file.is_file():
+            return None
+
+        try:
+            df = pd.read_parquet(file)
+        except Exception as e:
+            logging.warning(f"Cache invalido, {e} @{file}")
+            file.unlink(missing_ok=True)
+            return None
+
+        # NOTE: atualiza o mtime, usado como ultimo acesso na limpeza
+        os.utime(file)
+        return df
+
+    def put(self, chave: str, df: pd.DataFrame) -> None:
+        self.pasta.mkdir(parents=True, exist_ok=True)
+
+        with grava_atomico(self.arquivo(chave)) as tmp:
+            df.to_parquet(tmp, index=False)
+
+    def evict(self) -> int:
+        """remove entradas mais velhas que max_idade_dias e, depois,
+        as menos usadas ate o total ficar abaixo de max_bytes
+        retorna a quantidade de arquivos removidos
+        """
+        if not self.pasta.is_dir():
+            return 0
+
+        limite = time.time() - self.max_idade_dias * 86400
+
+        return limpa_pasta(
+            self.pasta.glob('*.parquet'),
+            lambda file: file.stat().st_mtime < limite,
+            self.max_bytes
+        )
+
+
+class CachedTransform:
+    """envolve o transform de um banco com o RunCache"""
+
+    def __init__(
+        self,
+        transform: Callable[[Path], pd.DataFrame],
+        cache: RunCache,
+        versao: int
+    ) -> None:
+        self.transform = transform
+        self.cache = cache
+        self.versao = versao
+
+    def __call__(self, file: Path) -> pd.DataFrame:
+        chave = self.cache.chave(file, self.transform.__name__, self.versao)
+        df = self.cache.get(chave)
+
+        if df is None:
+            df = self.transform(file)
+            self.cache.put(chave, df)
+
+        return df
+
+
+class CategCache:
+    """cache da base de categorias do athena
+
+    parquet mais um json de metadados com a data da busca e a quantidade
+    de linhas, gravados com grava_atomico, valido por
+    ttl_horas, a ultima base lida fica em memoria para a sessao do app
+    """
+
+    _memoria: dict[Path, tuple[float, pd.DataFrame]] = {}
+    _lock = threading.Lock()
+
+    def __init__(
+        self,
+        pasta: Path | str,
+        ttl_horas: float = 24,
+        nome: str = 'categ'
+    ) -> None:
+        self.pasta = Path(pasta)
+        self.ttl_horas = ttl_horas
+        self.file = self.pasta / f'{nome}.parquet'
+        self.file_meta = self.pasta / f'{nome}.json'
+
+    def valido(self, fetched_at: float) -> bool:
+        return time.time() - fetched_at < self.ttl_horas * 3600
+
+    def metadados(self) -> dict | None:
+        try:
+            with self.file_meta.open('r') as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            return None
+
+    def memoria(self) -> pd.DataFrame | None:
+        fetched_at, df = self._memoria.get(self.file, (0, None))
+
+        if df is not None and self.valido(fetched_at):
+            return df
+
+        return None
+
+    def disco(self) -> pd.DataFrame | None:
+        meta = self.metadados()
+
+        if meta is None or not self.file.is_file():
+            return None
+
+        if not self.valido(meta['fetched_at']):
+            return None
+
+        # NOTE: gravacao interrompida entre o parquet e o json
+        if pq.read_metadata(self.file).num_rows != meta['rows']:
+            return None
+
+        df = pd.read_parquet(self.file)
+        self._memoria[self.file] = (meta['fetched_at'], df)
+
+        return df
+
+    def put(self, df: pd.DataFrame) -> None:
+        self.pasta.mkdir(parents=True, exist_ok=True)
+
+        fetched_at = time.time()
+        meta = {
+            'fetched_at': fetched_at,
+            'fetched_at_iso': datetime.fromtimestamp(fetched_at).isoformat(timespec='seconds'),
+            'rows': len(df),
+        }
+
+        with grava_atomico(self.file) as tmp:
+            df.to_parquet(tmp, index=False)
+
+        with grava_atomico(self.file_meta) as tmp:
+            with tmp.open('w') as fp:
+                json.dump(meta, fp, indent=4)
+
+        self._memoria[self.file] = (fetched_at, df)
+
+    def load(self, fetch: Callable[[], pd.DataFrame]) -> tuple[pd.DataFrame, str]:
+        """retorna a base e a origem: memoria, disco ou download"""
+
+        with self._lock:
+            df = self.memoria()
+            if df is not None:
+                return df, 'memoria'
+
+            df = self.disco()
+            if df is not None:
+                return df, 'disco'
+
+            df = fetch()
+            self.put(df)
+
+            return df, 'download'
+
+
+class KardexCache:
+    """agregado mensal do KARDEX_FILIAL por filial (quantidade e valor
+    por produto e mes) e a marca d'agua, o maior kafi_dt_mov ja lido
+
+    um parquet por filial, marca, versao do pipeline e o banco de origem
+    nos metadados do arquivo, versao ou origem diferente vale como sem
+    historico
+    reconstroi -> ignora o historico salvo, le o kardex inteiro e regrava
+    """
+
+    def __init__(self, pasta: Path | str, versao: int = 0, reconstroi: bool = False) -> None:
+        self.pasta = Path(pasta)
+        self.versao = versao
+        self.reconstroi = reconstroi
+
+    def arquivo(self, filial: int) -> Path:
+        return self.pasta / f'filial_{filial}.parquet'
+
+    @staticmethod
+    def origem(file: Path | str) -> str:
+        """caminho do banco, como na chave do RunCache"""
+        return str(Path(file).resolve()).lower()
+
+    def get(
+        self,
+        filial: int,
+        origem: str | None = None
+    ) -> tuple[pd.DataFrame | None, pd.Timestamp | None]:
+        file = self.arquivo(filial)
+
+        if self.reconstroi or not file.is_file():
+            return None, None
+
+        try:
+            tabela = pq.read_table(file)
+            meta = json.loads(tabela.schema.metadata[b'kardex'])
+        except Exception as e:
+            logging.warning(f"Kardex incremental invalido, {e} @{file}")
+            return None, None
+
+        if meta['versao'] != self.versao or meta.get('origem') != origem:
+            return None, None
+
+        return tabela.to_pandas(), pd.Timestamp(meta['marca'])
+
+    def put(
+        self,
+        filial: int,
+        df: pd.DataFrame,
+        marca: pd.Timestamp,
+        origem: str | None = None
+    ) -> None:
+        self.pasta.mkdir(parents=True, exist_ok=True)
+
+        tabela = pa.Table.from_pandas(df, preserve_index=False)
+        meta = json.dumps({
+            'versao': self.versao,
+            'marca': marca.isoformat(),
+            'origem': origem,
+            'linhas': len(df),
+        })
+        tabela = tabela.replace_schema_metadata({**tabela.schema.metadata, b'kardex': meta.encode('utf-8')})
+
+        with grava_atomico(self.arquivo(filial)) as tmp:
+            pq.write_table(tabela, tmp)
+
+
+class QueryCache:
+    """resultado das consultas do athena em arquivos arrow ipc
+
+    a chave e o sha256 do sql (espacos normalizados) mais os parametros
+    da conexao, sem a chave secreta. o arquivo e aberto com memory map,
+    a tabela nao e copiada ate a conversao para pandas
+
+    valido por ttl_horas a partir da consulta, evict() remove os vencidos
+    e, depois, os menos usados ate o total ficar abaixo de max_bytes
+    """
+
+    # NOTE: fora da chave, trocar a senha nao muda o resultado
+    SEGREDOS = ('aws_secret_access_key', 'aws_session_token')
+
+    def __init__(
+        self,
+        pasta: Path | str,
+        ttl_horas: float = 24,
+        max_bytes: int = 1024 ** 3
+    ) -> None:
+        self.pasta = Path(pasta)
+        self.ttl_horas = ttl_horas
+        self.max_bytes = max_bytes
+
+    def chave(self, stmt: str, **conexao) -> str:
+        sql = ' '.join(stmt.split())
+        parametros = {k: v for k, v in sorted(conexao.items()) if k not in self.SEGREDOS}
+
+        return hashlib.sha256(json.dumps([sql, parametros], default=str).encode('utf-8')).hexdigest()
+
+    def arquivo(self, chave: str) -> Path:
+        return self.pasta / f'{chave}.arrow'
+
+    def valido(self, tabela: pa.Table) -> bool:
+        meta = json.loads(tabela.schema.metadata[b'query_cache'])
+        return time.time() - meta['fetched_at'] < self.ttl_horas * 3600
+
+    def get(self, chave: str) -> pa.Table | None:
+        file = self.arquivo(chave)
+
+        if not file.is_file():
+            return None
+
+        try:
+            with pa.memory_map(str(file)) as fonte:
+                tabela = pa.ipc.open_file(fonte).read_all()
+
+            if not self.valido(tabela):
+                return None
+
+        except Exception as e:
+            logging.warning(f"Cache invalido, {e} @{file}")
+            file.unlink(missing_ok=True)
+            return None
+
+        # NOTE: atualiza o mtime, usado como ultimo acesso na limpeza
+        os.utime(file)
+        return tabela
+
+    def put(self, chave: str, tabela: pa.Table, stmt: str) -> None:
+        self.pasta.mkdir(parents=True, exist_ok=True)
+
+        fetched_at = time.time()
+        meta = {
+            'fetched_at': fetched_at,
+            'fetched_at_iso': datetime.fromtimestamp(fetched_at).isoformat(timespec='seconds'),
+            'rows': tabela.num_rows,
+            'sql': stmt,
+        }
+        tabela = tabela.replace_schema_metadata({
+            **(tabela.schema.metadata or {}),
+            b'query_cache': json.dumps(meta).encode('utf-8')
+        })
+
+        file = self.arquivo(chave)
+
+        try:
+            with grava_atomico(file) as tmp:
+                with pa.OSFile(str(tmp), 'wb') as destino:
+                    with pa.ipc.new_file(destino, tabela.schema) as escritor:
+                        escritor.write_table(tabela)
+
+        except OSError as e:
+            # NOTE: no windows o arquivo aberto com memory map nao e substituido
+            logging.warning(f"Cache nao gravado, {e} @{file}")
+
+    def evict(self) -> int:
+        """remove entradas vencidas e, depois, as menos usadas ate o
+        total ficar abaixo de max_bytes, retorna a quantidade removida
+        """
+        if not self.pasta.is_dir():
+            return 0
+
+        return limpa_pasta(self.pasta.glob('*.arrow'), self.vencido, self.max_bytes)
+
+    def vencido(self, file: Path) -> bool:
+        with pa.memory_map(str(file)) as fonte:
+            return not self.valido(pa.ipc.open_file(fonte).schema.empty_table())
+
+    def consulta(
+        self,
+        stmt: str,
+        executa: Callable[[], pa.Table],
+        **conexao
+    ) -> tuple[pa.Table, str]:
+        """retorna a tabela e a origem: cache ou athena"""
+        chave = self.chave(stmt, **conexao)
+        tabela = self.get(chave)
+
+        if tabela is not None:
+            return tabela, 'cache'
+
+        tabela = executa()
+        self.put(chave, tabela, stmt)
+        self.evict()
+
+        return tabela, 'athena'
@@ -0,0 +1,35 @@
+"""
+Cancelamento cooperativo das execucoes
+
+O Worker cria um CancelToken por tarefa, o botao Cancelar (ou o
+fechamento do dialogo) chama cancel() e o processa_arquivos deixa de
+iniciar novos bancos, as etapas seguintes chamam verifica()
+
+Modulo leve (sem pandas / PySide6), importado pelo worker
+"""
+import threading
+
+
+class Cancelado(Exception):
+    """execucao interrompida pelo usuario"""
+
+
+class CancelToken:
+
+    def __init__(self) -> None:
+        self._evento = threading.Event()
+
+    def cancel(self) -> None:
+        self._evento.set()
+
+    @property
+    def cancelado(self) -> bool:
+        return self._evento.is_set()
+
+    def verifica(self) -> None:
+        if self._evento.is_set():
+            raise Cancelado('Execucao cancelada')
+
+    def espera(self, segundos: float) -> bool:
+        """aguarda ate segundos ou ate o cancelamento, retorna se cancelou"""
+        return self._evento.wait(segundos)
@@ -0,0 +1,180 @@
+"""
+Execucao sem interface grafica (agendamento noturno / servidor)
+
+Nao importa o PySide6, roda os mesmos pipelines dos dialogos e
+reporta o progresso no stdout, retorna 0 em sucesso e 1 em falha
+
+uso:
+    python cli.py produtos D:/lojas --export parquet --workers 8 --output D:/saida
+    python cli.py ruptura D:/lojas --export csv --stream
+    python cli.py completo D:/lojas --workers 8 --output D:/saida
+    python cli.py ruptura D:/lojas --workers 4 --timeout 600
+    python cli.py ruptura D:/lojas --historico D:/historico/ruptura
+    python cli.py snapshot D:/lojas --output D:/snapshots --workers 8
+    python cli.py produtos D:/snapshots --fonte snapshot
+    python cli.py ruptura D:/lojas --excluir ARQUIVO* --excluir *backup*
+"""
+from pathlib import Path
+import argparse
+import logging
+import sys
+import traceback
+
+from config import (
+    is_start_json,
+    read_start_json,
+    CACHE_DIR,
+    HISTORICO_DIR
+)
+
+
+class ProgressoConsole:
+    """substitui o progress_callback (Signal) dos dialogos"""
+
+    def __init__(self, total: int) -> None:
+        self.total = total
+
+    def emit(self, logs: tuple) -> None:
+        value, name = logs
+        print(f'[{value}/{self.total}] {name}', flush=True)
+
+
+# NOTE: bancos procurados na raiz por tipo de origem (ver sources.open_source)
+FONTES = {
+    'accdb': '**/*.accdb',
+    'sqlite': '**/*.sqlite',
+    'duckdb': '**/*.duckdb',
+    'snapshot': '**/*.snapshot',
+}
+
+
+def lista_accdb(raiz: Path, fonte: str = 'accdb', excluir: tuple[str, ...] = ()) -> list[Path]:
+    # NOTE: snapshots sao pastas, os demais usam a busca com manifesto
+    if fonte == 'snapshot':
+        return sorted(raiz.glob(FONTES[fonte]))
+
+    from discovery import lista_bancos
+
+    return lista_bancos(raiz, (Path(FONTES[fonte]).name,), excluir, CACHE_DIR)
+
+
+def parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='ruptura',
+        description='Gera os relatorios de Produtos e Ruptura sem interface grafica'
+    )
+    parser.add_argument('relatorio', choices=['produtos', 'ruptura', 'completo', 'snapshot'])
+    parser.add_argument('raiz', type=Path, help='pasta com os bancos .accdb')
+    parser.add_argument('--fonte', choices=list(FONTES), default='accdb', help='tipo dos bancos na raiz')
+    parser.add_argument('--excluir', action='append', default=[], help='padrao de pastas ignoradas, ex: ARQUIVO*')
+    parser.add_argument('--export', choices=['xlsx', 'csv', 'parquet'], default='parquet')
+    parser.add_argument('--workers', type=int, default=1, help='bancos processados em paralelo')
+    parser.add_argument('--pool', choices=['thread', 'process'], default='thread')
+    parser.add_argument('--timeout', type=float, help='segundos por banco, o banco que passar e ignorado')
+    parser.add_argument('--output', type=Path, help='pasta ou arquivo de saida')
+    parser.add_argument('--stream', action='store_true', help='exporta uma loja por vez')
+    parser.add_argument('--sem-cache', action='store_true', help='ignora o cache por banco')
+    parser.add_argument(
+        '--historico', type=Path, nargs='?', const=HISTORICO_DIR,
+        help='acrescenta a ruptura ao parquet particionado por data e filial (padrao: pasta historico)'
+    )
+    parser.add_argument('--kardex-completo', action='store_true', help='rele todo o kardex e refaz o historico incremental')
+    parser.add_argument('--engine', choices=['pandas', 'duckdb'], default='pandas', help='produtos e completo')
+    parser.add_argument('--layout', choices=['largo', 'longo'], default='largo', help='produtos e completo')
+
+    return parser
+
+
+def snapshot(raiz: list[Path], args: argparse.Namespace) -> int:
+    """copia os bancos para pastas .snapshot (parquet), lidas depois com --fonte snapshot"""
+    from functools import partial
+    from sources import exporta_snapshot
+    from utils import Progresso, processa_arquivos
+
+    exporta = partial(exporta_snapshot, pasta=args.output, raiz=args.raiz)
+    progresso = Progresso(ProgressoConsole(len(raiz)))
+
+    feitos = processa_arquivos(raiz, exporta, progresso, args.workers, args.pool, timeout=args.timeout)
+    print(f'{len(feitos)} de {len(raiz)} snapshots gravados', flush=True)
+
+    return 0 if len(feitos) == len(raiz) else 1
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parser().parse_args(argv)
+
+    if not args.raiz.is_dir():
+        print(f'ERRO: pasta nao encontrada {args.raiz}', file=sys.stderr)
+        return 1
+
+    raiz = lista_accdb(args.raiz, args.fonte, tuple(args.excluir))
+
+    if not raiz:
+        print(f'ERRO: nao existe arquivo ({FONTES[args.fonte]}) em {args.raiz}', file=sys.stderr)
+        return 1
+
+    if args.relatorio == 'snapshot':
+        return snapshot(raiz, args)
+
+    # NOTE: import depois do parse, --help nao carrega pandas/pyodbc
+    from utils import main_produtos, main_ruptura, main_completo, kardex_incremental
+    from cache import RunCache
+
+    opcoes = dict(
+        workers=args.workers,
+        pool=args.pool,
+        timeout=args.timeout,
+        cache=None if args.sem_cache else RunCache(CACHE_DIR),
+        stream=args.stream,
+        output=args.output
+    )
+
+    print(f'{len(raiz)} bancos encontrados em {args.raiz}', flush=True)
+
+    if args.relatorio in ('produtos', 'completo') and not is_start_json():
+        print('ERRO: criar arquivo de LOGIN (start.json) !', file=sys.stderr)
+        return 1
+
+    try:
+        if args.relatorio == 'produtos':
+            main_produtos(
+                raiz,
+                args.export,
+                ProgressoConsole(len(raiz) + 2),
+                engine=args.engine,
+                layout=args.layout,
+                kardex_cache=kardex_incremental(args.kardex_completo),
+                **opcoes,
+                **read_start_json()
+            )
+        elif args.relatorio == 'completo':
+            main_completo(
+                raiz,
+                args.export,
+                ProgressoConsole(len(raiz) + 3),
+                engine=args.engine,
+                layout=args.layout,
+                kardex_cache=kardex_incremental(args.kardex_completo),
+                historico=args.historico,
+                **opcoes,
+                **read_start_json()
+            )
+        else:
+            main_ruptura(
+                raiz,
+                args.export,
+                ProgressoConsole(len(raiz) + 2),
+                historico=args.historico,
+                **opcoes
+            )
+
+    except Exception as e:
+        logging.exception(e)
+        traceback.print_exc()
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,6 +4,8 @@ import json
 
 DEFAULT_RAIZ = Path(__file__).parent
 CONFIG_FILE = DEFAULT_RAIZ / 'start.json'
+CACHE_DIR = DEFAULT_RAIZ / 'cache'
+HISTORICO_DIR = DEFAULT_RAIZ / 'historico'
 
 ICON = str(DEFAULT_RAIZ.joinpath('img/armazem.png'))
 IMG = str(DEFAULT_RAIZ.joinpath('img/troca.png'))
@@ -0,0 +1,131 @@
+"""
+Busca dos bancos e controle do Worker, comum aos dialogos Produtos e Ruptura
+
+O dialogo precisa dos widgets input, excluir, btn_cancel, progress e logs,
+do threadpool e do slot worker_error. Os valores dos widgets sao lidos na
+thread da interface e seguem para o Worker como argumentos
+"""
+from PySide6.QtWidgets import *
+from PySide6.QtCore import *
+from config import CACHE_DIR
+from pathlib import Path
+from worker import Worker
+
+
+def padroes_excluir(texto: str) -> tuple[str, ...]:
+    """'ARQUIVO*; *backup*' -> ('ARQUIVO*', '*backup*')"""
+    return tuple(p.strip() for p in texto.split(';') if p.strip())
+
+
+def descobre_bancos(
+    path: str,
+    excluir: tuple[str, ...],
+    progress_callback,
+    metrics_callback,
+    cancel_token
+) -> list[Path]:
+    from discovery import lista_bancos
+
+    encontrados = 0
+
+    def encontrado(caminho: Path) -> None:
+        nonlocal encontrados
+        encontrados += 1
+        progress_callback.emit((encontrados, '/'.join(caminho.parts[-2:])))
+
+    return lista_bancos(
+        path,
+        excluir=excluir,
+        pasta_manifesto=CACHE_DIR,
+        cancel=cancel_token,
+        encontrado=encontrado
+    )
+
+
+class DescobertaMixin:
+    """LISTAR ACCESS em segundo plano, CANCELAR e fechamento do dialogo
+
+    class Produtos(DescobertaMixin, QDialog)
+    """
+
+    @Slot()
+    def action_get_path(self):
+        self.progress.setValue(0)
+
+        path = QFileDialog.getExistingDirectory(
+            self,
+            'Selecionar pasta',
+            dir='.',
+            options=QFileDialog.Option.ShowDirsOnly
+        )
+
+        if path and self.worker is None:
+            self.input.setText(path)
+            self.dir_path = None
+
+            # NOTE: busca fora da thread da interface, os bancos chegam pelo progress
+            worker = Worker(descobre_bancos, path, padroes_excluir(self.excluir.text()))
+
+            worker.signals.progress.connect(self.update_descoberta)
+            worker.signals.result.connect(self.descoberta_finalizada)
+            worker.signals.error.connect(self.worker_error)
+
+            for sinal in (worker.signals.finished, worker.signals.error, worker.signals.cancelled):
+                sinal.connect(self.worker_done)
+
+            self.worker = worker
+            self.btn_cancel.setEnabled(True)
+            self.progress.setRange(0, 0)
+            self.logs.setText("Procurando bancos ...")
+
+            self.threadpool.start(worker)
+        elif not path:
+            self.dir_path = None
+
+    def update_descoberta(self, logs: tuple):
+        value, name = logs
+        self.logs.setText(f"{value} bancos encontrados, {name}")
+
+    def descoberta_finalizada(self, encontrados: list[Path]):
+        self.progress.setRange(0, 1)
+        self.progress.setValue(0)
+
+        if not encontrados:
+            QMessageBox.critical(
+                self,
+                "ERRO",
+                "Não existe arquivo (.accdb) !",
+                QMessageBox.StandardButton.Ok
+            )
+        else:
+            self.dir_path = encontrados
+            self.logs.setText(f"{len(encontrados)} bancos encontrados")
+
+            QMessageBox.warning(
+                self,
+                "OK",
+                "Lista finalizada !",
+                QMessageBox.StandardButton.Ok
+            )
+
+    def worker_done(self):
+        self.worker = None
+        self.btn_cancel.setDisabled(True)
+
+        # NOTE: busca dos bancos interrompida com a barra ocupada
+        if self.progress.maximum() == 0:
+            self.progress.setRange(0, 1)
+
+    @Slot()
+    def action_cancel(self) -> None:
+        if self.worker is not None:
+            self.worker.cancel.cancel()
+            self.btn_cancel.setDisabled(True)
+            self.logs.setText("Cancelando, aguardando os bancos em andamento ...")
+
+    def done(self, r: int) -> None:
+        # NOTE: fechar o dialogo cancela a execucao em andamento
+        if self.worker is not None:
+            self.worker.cancel.cancel()
+
+        super().done(r)
@@ -3,25 +3,27 @@ from PySide6.QtGui import *
 from PySide6.QtCore import *
 from config import (
     ICON,
+    CACHE_DIR,
+    HISTORICO_DIR,
     IMG_RUP
 )
-from utils import main_ruptura
-from pathlib import Path
+from dialog.descoberta import DescobertaMixin
 from worker import Worker
 import os
 import subprocess
 
 
-class Ruptura(QDialog):
+class Ruptura(DescobertaMixin, QDialog):
     def __init__(self, parent: QWidget | None = None) -> None:
         super().__init__(parent)
         self.dir_path = None
         self.threadpool = QThreadPool()
+        self.worker = None
         
         # TODO: Configura DIALOGO
         self.setWindowTitle("Gera Ruptura")
         self.setWindowIcon(QIcon(ICON))
-        self.setFixedSize(500, 350)
+        self.setFixedSize(500, 580)
         
         # TODO: Definir style
         self.setStyleSheet("""
@@ -42,6 +44,10 @@ class Ruptura(QDialog):
         self.input.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.input.setDisabled(True)
         
+        # TODO: Pastas ignoradas na busca dos bancos (padroes separados por ;)
+        self.excluir = QLineEdit()
+        self.excluir.setPlaceholderText("ignorar pastas, ex: ARQUIVO*; *backup*")
+
         # TODO: BTN - Listar arquivos
         self.btn_dir = QPushButton("LISTAR ACCESS")
         self.btn_dir.setCursor(Qt.CursorShape.PointingHandCursor)
@@ -51,12 +57,37 @@ class Ruptura(QDialog):
         self.label = QLabel("- Selecionar tipo de saida do arquivo")
         self.combox = QComboBox()
         self.combox.addItems(['xlsx', 'csv', 'parquet'])
+
+        # TODO: Quantidade de bancos processados em paralelo
+        self.label_workers = QLabel("- Bancos processados em paralelo")
+        self.workers = QSpinBox()
+        self.workers.setRange(1, os.cpu_count() or 1)
+        self.workers.setValue(min(4, os.cpu_count() or 1))
+
+        # TODO: Tempo limite por banco, o banco preso e ignorado (logs.txt)
+        self.label_timeout = QLabel("- Tempo limite por banco (0 = sem limite)")
+        self.timeout = QSpinBox()
+        self.timeout.setRange(0, 240)
+        self.timeout.setValue(10)
+        self.timeout.setSuffix(" min")
+
+        # TODO: Historico em parquet particionado por data e filial
+        self.historico = QCheckBox("Gravar no historico (parquet por data e filial)")
+
+        # TODO: Exportar em streaming, uma loja por vez na memoria
+        self.stream = QCheckBox("Exportar em streaming (menos memoria)")
         
         # TODO: BTN - Gerar Relatorio dos Produtos
         self.btn = QPushButton("RUPTURA")
         self.btn.setCursor(Qt.CursorShape.PointingHandCursor)
         self.btn.clicked.connect(self.action_exec_ruptura)
 
+        # TODO: BTN - Cancelar, para de iniciar novos bancos
+        self.btn_cancel = QPushButton("CANCELAR")
+        self.btn_cancel.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.btn_cancel.setDisabled(True)
+        self.btn_cancel.clicked.connect(self.action_cancel)
+
         # TODO: Barra de progresso
         self.progress = QProgressBar(self)
         self.progress.setValue(0)
@@ -65,6 +96,12 @@ class Ruptura(QDialog):
         self.logs = QLabel("...")
         self.logs.setAlignment(Qt.AlignmentFlag.AlignRight)
 
+        # TODO: Tempo acumulado por etapa (fetch, transform, categoria, merge, exporta)
+        self.metricas = QLabel("")
+        self.metricas.setAlignment(Qt.AlignmentFlag.AlignRight)
+        self.metricas.setStyleSheet("color: gray;")
+        self.totais: dict[str, float] = {}
+
         # TODO: Adicionar IMAGEM
         img = QPixmap(IMG_RUP)
         self.lbl_img = QLabel()
@@ -75,51 +112,34 @@ class Ruptura(QDialog):
         self.vlayout = QVBoxLayout()
         self.vlayout.addWidget(self.lbl_img)
         self.vlayout.addWidget(self.input)
+        self.vlayout.addWidget(self.excluir)
         self.vlayout.addWidget(self.btn_dir)
         self.vlayout.addWidget(self.label)
         self.vlayout.addWidget(self.combox)
+        self.vlayout.addWidget(self.label_workers)
+        self.vlayout.addWidget(self.workers)
+        self.vlayout.addWidget(self.label_timeout)
+        self.vlayout.addWidget(self.timeout)
+        self.vlayout.addWidget(self.stream)
+        self.vlayout.addWidget(self.historico)
         self.vlayout.addWidget(self.btn)
+        self.vlayout.addWidget(self.btn_cancel)
         self.vlayout.addWidget(self.progress)
         self.vlayout.addWidget(self.logs)
+        self.vlayout.addWidget(self.metricas)
         self.setLayout(self.vlayout)
 
-    @Slot()
-    def action_get_path(self):
-        self.progress.setValue(0)
-
-        path = QFileDialog.getExistingDirectory(
-            self, 
-            'Selecionar pasta', 
-            dir='.',
-            options=QFileDialog.Option.ShowDirsOnly
-        )
-
-        if path:
-            self.input.setText(path)
-            self.dir_path = list(Path(path).glob("**/*.accdb"))
-
-            if not self.dir_path:
-                QMessageBox.critical(
-                    self,
-                    "ERRO",
-                    "Não existe arquivo (.accdb) !",
-                    QMessageBox.StandardButton.Ok
-                )
-                self.dir_path = None
-            else:
-                QMessageBox.warning(
-                    self,
-                    "OK",
-                    "Lista finalizada !",
-                    QMessageBox.StandardButton.Ok
-                )
-        else:
-            self.dir_path = None
-    
     def update_progress(self, logs: tuple):
         value, name = logs
         self.progress.setValue(value)
         self.logs.setText(name)
+
+    def update_metrics(self, registro: dict):
+        etapa = registro['etapa']
+        self.totais[etapa] = self.totais.get(etapa, 0) + registro['segundos']
+        self.metricas.setText(
+            ' | '.join(f'{nome} {segundos:.1f}s' for nome, segundos in self.totais.items())
+        )
     
     def worker_finished(self):
         QMessageBox.warning(
@@ -132,6 +152,14 @@ class Ruptura(QDialog):
         # abre o local que fica o excel
         subprocess.Popen(['explorer', os.getcwd()], shell=True)
     
+    def worker_cancelled(self):
+        QMessageBox.warning(
+            self,
+            "CANCELADO",
+            "Execução cancelada !",
+            QMessageBox.StandardButton.Ok
+        )
+
     def worker_error(self, error):
         self.progress.setStyleSheet("""
             QProgressBar {
@@ -151,6 +179,10 @@ class Ruptura(QDialog):
     
     @Slot()
     def action_exec_ruptura(self) -> None:
+        # NOTE: busca dos bancos ou relatorio em andamento
+        if self.worker is not None:
+            return
+
         if self.dir_path is None:
             QMessageBox.critical(
                 self,
@@ -169,17 +201,46 @@ class Ruptura(QDialog):
                 }
             """
             )    
-            worker = Worker(self.__export_ruptura)
+            # NOTE: widgets lidos aqui, na thread da interface
+            worker = Worker(self.__export_ruptura, self.opcoes())
 
             worker.signals.error.connect(self.worker_error)
             worker.signals.finished.connect(self.worker_finished)
             worker.signals.progress.connect(self.update_progress)
+            worker.signals.metrics.connect(self.update_metrics)
+            worker.signals.cancelled.connect(self.worker_cancelled)
+
+            for sinal in (worker.signals.finished, worker.signals.error, worker.signals.cancelled):
+                sinal.connect(self.worker_done)
+
+            self.worker = worker
+            self.btn_cancel.setEnabled(True)
+
+            self.totais = {}
+            self.metricas.clear()
             
             self.threadpool.start(worker)
 
-    def __export_ruptura(self, progress_callback) -> None:
+    def opcoes(self) -> dict:
+        """parametros do relatorio a partir dos widgets"""
+        return {
+            'export': self.combox.currentText(),
+            'workers': self.workers.value(),
+            'timeout': self.timeout.value() * 60 or None,
+            'stream': self.stream.isChecked(),
+            'historico': HISTORICO_DIR if self.historico.isChecked() else None,
+        }
+
+    def __export_ruptura(self, opcoes, progress_callback, metrics_callback, cancel_token) -> None:
+        # NOTE: pandas/pyodbc carregados apenas ao gerar o relatorio
+        from utils import main_ruptura
+        from cache import RunCache
+
         __ = main_ruptura(
             self.dir_path, 
-            self.combox.currentText(), 
-            progress_callback
-        )
\ No newline at end of file
+            progress_callback=progress_callback,
+            metrics_callback=metrics_callback,
+            cancel=cancel_token,
+            cache=RunCache(CACHE_DIR),
+            **opcoes
+        )
@@ -0,0 +1,185 @@
+"""
+Descoberta dos bancos (.accdb) nas pastas das lojas
+
+A busca roda fora da thread da interface (Worker) e entrega cada banco
+assim que encontra. O manifesto guarda, por diretorio, o mtime, os
+subdiretorios e os arquivos (nome, tamanho e mtime): na busca seguinte
+o diretorio com o mesmo mtime nao e listado de novo, apenas o stat dele
+
+NOTE: o mtime do diretorio muda quando um arquivo e criado, removido ou
+renomeado, nao quando o banco e alterado, por isso tamanho e mtime dos
+bancos de diretorios sem mudanca vem do manifesto (o RunCache faz o
+proprio stat para a chave)
+"""
+from pathlib import Path
+from fnmatch import fnmatch
+from typing import Callable, Generator, NamedTuple, Any
+import hashlib
+import json
+import logging
+import os
+
+from cancel import CancelToken
+
+
+INCLUIR = ('*.accdb',)
+
+
+class Arquivo(NamedTuple):
+    caminho: Path
+    tamanho: int
+    mtime_ns: int
+
+
+class Manifesto:
+    """diretorios da ultima busca completa de uma raiz, um json por raiz
+
+    diretorio (relativo a raiz) -> mtime_ns, subdirs e arquivos,
+    todos os arquivos e subdiretorios ficam salvos, os padroes de
+    incluir / excluir sao aplicados na busca
+    """
+
+    VERSAO = 1
+
+    def __init__(self, pasta: Path | str, raiz: Path | str) -> None:
+        self.raiz = Path(raiz)
+        chave = hashlib.sha1(str(self.raiz.resolve()).lower().encode('utf-8')).hexdigest()
+
+        self.file = Path(pasta) / f'descoberta_{chave}.json'
+        self.diretorios: dict[str, dict] = {}
+
+    def load(self) -> 'Manifesto':
+        try:
+            with self.file.open('r', encoding='utf-8') as fp:
+                dados = json.load(fp)
+        except (OSError, ValueError):
+            return self
+
+        if dados.get('versao') == self.VERSAO:
+            self.diretorios = dados['diretorios']
+
+        return self
+
+    def save(self) -> None:
+        self.file.parent.mkdir(parents=True, exist_ok=True)
+
+        dados = {
+            'versao': self.VERSAO,
+            'raiz': str(self.raiz),
+            'diretorios': self.diretorios,
+        }
+
+        # NOTE: cache traz o pandas, importado so ao gravar
+        from cache import grava_atomico
+
+        with grava_atomico(self.file) as tmp:
+            with tmp.open('w', encoding='utf-8') as fp:
+                json.dump(dados, fp)
+
+
+def casa(nome: str, relativo: str, padroes: tuple[str, ...]) -> bool:
+    """padrao no nome ou no caminho relativo a raiz, sem diferenciar maiusculas"""
+    nome, relativo = nome.lower(), relativo.lower()
+
+    return any(
+        fnmatch(nome, padrao) or fnmatch(relativo, padrao)
+        for padrao in map(str.lower, padroes)
+    )
+
+
+def lista_diretorio(caminho: Path) -> dict[str, list]:
+    subdirs, arquivos = [], []
+
+    with os.scandir(caminho) as entradas:
+        for entrada in entradas:
+            try:
+                if entrada.is_dir(follow_symlinks=False):
+                    subdirs.append(entrada.name)
+                elif entrada.is_file():
+                    # NOTE: no windows o stat vem da propria listagem
+                    metadados = entrada.stat()
+                    arquivos.append([entrada.name, metadados.st_size, metadados.st_mtime_ns])
+            except OSError as e:
+                logging.warning(f"{e} @{entrada.path}")
+
+    return {'subdirs': sorted(subdirs), 'arquivos': sorted(arquivos)}
+
+
+def descobre(
+    raiz: Path | str,
+    incluir: tuple[str, ...] = INCLUIR,
+    excluir: tuple[str, ...] = (),
+    manifesto: Manifesto | None = None,
+    cancel: CancelToken | None = None
+) -> Generator[Arquivo, Any, None]:
+    """entrega os arquivos da raiz conforme encontra
+
+    incluir -> padroes do arquivo (nome ou caminho relativo)
+    excluir -> padroes de diretorios e arquivos ignorados, ex: ('ARQUIVO*', '*/backup')
+    manifesto -> reaproveita a listagem dos diretorios sem mudanca,
+    atualizado ao final da busca (busca cancelada nao grava)
+    """
+    raiz = Path(raiz)
+    anterior = manifesto.diretorios if manifesto is not None else {}
+    atual: dict[str, dict] = {}
+    pilha = ['.']
+
+    while pilha:
+        if cancel is not None:
+            cancel.verifica()
+
+        relativo = pilha.pop()
+        caminho = raiz / relativo
+
+        try:
+            mtime_ns = caminho.stat().st_mtime_ns
+            entrada = anterior.get(relativo)
+
+            if entrada is None or entrada['mtime_ns'] != mtime_ns:
+                entrada = {'mtime_ns': mtime_ns, **lista_diretorio(caminho)}
+
+        except OSError as e:
+            logging.warning(f"{e} @{caminho}")
+            continue
+
+        atual[relativo] = entrada
+        prefixo = '' if relativo == '.' else f'{relativo}/'
+
+        for nome, tamanho, mtime_arquivo in entrada['arquivos']:
+            if (
+                casa(nome, prefixo + nome, incluir)
+                and not casa(nome, prefixo + nome, excluir)
+            ):
+                yield Arquivo(caminho / nome, tamanho, mtime_arquivo)
+
+        # NOTE: ordem alfabetica, a pilha inverte
+        for nome in reversed(entrada['subdirs']):
+            if not casa(nome, prefixo + nome, excluir):
+                pilha.append(prefixo + nome)
+
+    if manifesto is not None:
+        manifesto.diretorios = atual
+        manifesto.save()
+
+
+def lista_bancos(
+    raiz: Path | str,
+    incluir: tuple[str, ...] = INCLUIR,
+    excluir: tuple[str, ...] = (),
+    pasta_manifesto: Path | str | None = None,
+    cancel: CancelToken | None = None,
+    encontrado: Callable[[Path], None] | None = None
+) -> list[Path]:
+    """caminhos em ordem, com o manifesto salvo em pasta_manifesto
+    encontrado -> recebe cada caminho assim que a busca encontra
+    """
+    manifesto = None if pasta_manifesto is None else Manifesto(pasta_manifesto, raiz).load()
+    caminhos = []
+
+    for arquivo in descobre(raiz, incluir, excluir, manifesto, cancel):
+        caminhos.append(arquivo.caminho)
+
+        if encontrado is not None:
+            encontrado(arquivo.caminho)
+
+    return sorted(caminhos)
@@ -0,0 +1,222 @@
+from pathlib import Path
+from abc import ABC, abstractmethod
+from typing import Callable
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import tempfile
+from openpyxl import Workbook
+import shutil
+
+
+class StreamExport(ABC):
+    """exporta o consolidado sem manter todas as lojas em memoria
+
+    cada loja recebida em add vai para um parquet temporario, no close
+    os schemas sao unificados antes da primeira escrita e as lojas sao
+    gravadas uma a uma, na ordem de pos, pico de memoria de uma loja
+
+    prepara -> aplicado em cada loja ja com as colunas unificadas
+    ordena -> ordem final das colunas
+    """
+
+    def __init__(
+        self,
+        nome_saida: Path | str,
+        prepara: Callable[[pd.DataFrame], pd.DataFrame] | None = None,
+        ordena: Callable[[list[str]], list[str]] | None = None
+    ) -> None:
+        self.nome_saida = Path(nome_saida)
+        self.prepara = prepara or (lambda df: df)
+        self.ordena = ordena or (lambda cols: cols)
+        self.arquivos: dict[int, Path] = {}
+        self._tmp = Path(tempfile.mkdtemp(prefix='stream_'))
+
+    def __enter__(self) -> 'StreamExport':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        shutil.rmtree(self._tmp, ignore_errors=True)
+
+    def add(self, pos: int, df: pd.DataFrame) -> None:
+        file = self._tmp / f'{pos:06d}.parquet'
+        df.to_parquet(file, index=False)
+        self.arquivos[pos] = file
+
+    def schema(self) -> tuple[list[str], pa.Schema, pa.Schema]:
+        """colunas unificadas, schema de entrada e schema final (apos prepara)"""
+        schemas = [pq.read_schema(self.arquivos[pos]) for pos in sorted(self.arquivos)]
+        entrada = pa.unify_schemas(
+            [s.remove_metadata() for s in schemas],
+            promote_options='permissive'
+        )
+
+        cols = self.ordena(entrada.names)
+        vazio = (
+            entrada.empty_table()
+            .to_pandas()
+            .loc[:, cols]
+        )
+        final = pa.Schema.from_pandas(self.prepara(vazio), preserve_index=False)
+
+        # NOTE: colunas de texto vazias saem como null, usa o tipo da primeira loja
+        nulos = [f.name for f in final if pa.types.is_null(f.type)]
+
+        if nulos:
+            primeira = pd.read_parquet(self.arquivos[min(self.arquivos)]).reindex(columns=cols)
+            amostra = pa.Schema.from_pandas(self.prepara(primeira), preserve_index=False)
+
+            for col in nulos:
+                tipo = amostra.field(col).type
+                tipo = pa.string() if pa.types.is_null(tipo) else tipo
+                final = final.set(final.get_field_index(col), pa.field(col, tipo))
+
+        return cols, entrada, final.remove_metadata()
+
+    def lojas(self):
+        cols, _, final = self.schema()
+
+        for pos in sorted(self.arquivos):
+            df = pd.read_parquet(self.arquivos[pos]).reindex(columns=cols)
+
+            yield pa.Table.from_pandas(self.prepara(df), schema=final, preserve_index=False)
+
+            self.arquivos[pos].unlink(missing_ok=True)
+
+    @abstractmethod
+    def close(self) -> int:
+        """grava o arquivo final, retorna as linhas gravadas"""
+
+
+class ParquetStream(StreamExport):
+    """cada loja vira um row group do ParquetWriter"""
+
+    def close(self) -> int:
+        linhas = 0
+        writer = None
+
+        try:
+            for tbl in self.lojas():
+                if writer is None:
+                    writer = pq.ParquetWriter(self.nome_saida, tbl.schema)
+
+                writer.write_table(tbl)
+                linhas += tbl.num_rows
+        finally:
+            if writer is not None:
+                writer.close()
+
+        return linhas
+
+
+# NOTE: limite de linhas de uma aba do excel, incluindo o cabecalho
+EXCEL_MAX_LINHAS = 1_048_576
+
+
+class ExcelWriter:
+    """escreve dataframes em xlsx no modo write_only do openpyxl
+
+    as linhas vao direto para o arquivo em blocos, sem montar a planilha
+    em memoria, ao atingir max_linhas abre uma nova aba (Sheet2, Sheet3...)
+    """
+
+    def __init__(
+        self,
+        nome_saida: Path | str,
+        max_linhas: int | None = None,
+        bloco: int = 50_000
+    ) -> None:
+        self.nome_saida = Path(nome_saida)
+        # NOTE: lido na criacao, nao na definicao (testes trocam o limite)
+        self.max_linhas = max_linhas or EXCEL_MAX_LINHAS
+        self.bloco = bloco
+        self.wb = Workbook(write_only=True)
+        self.ws = None
+        self.cabecalho: list[str] | None = None
+        self.linhas_aba = 0
+        self.abas = 0
+
+    def __enter__(self) -> 'ExcelWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _nova_aba(self) -> None:
+        self.abas += 1
+        self.ws = self.wb.create_sheet(f'Sheet{self.abas}')
+        self.ws.append(self.cabecalho)
+        self.linhas_aba = 1
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.cabecalho is None:
+            self.cabecalho = [str(col) for col in df.columns]
+            self._nova_aba()
+
+        for inicio in range(0, len(df), self.bloco):
+            bloco = df.iloc[inicio:inicio + self.bloco].astype(object)
+            bloco = bloco.where(bloco.notna(), None)
+
+            for row in bloco.itertuples(index=False, name=None):
+                if self.linhas_aba >= self.max_linhas:
+                    self._nova_aba()
+
+                self.ws.append(row)
+                self.linhas_aba += 1
+
+    def close(self) -> None:
+        if self.wb is None:
+            return
+
+        if self.ws is None:
+            self.wb.create_sheet('Sheet1')
+
+        self.wb.save(self.nome_saida)
+        self.wb = None
+
+
+def to_excel(df: pd.DataFrame, nome_saida: Path | str) -> None:
+    with ExcelWriter(nome_saida) as writer:
+        writer.write(df)
+
+
+class ExcelStream(StreamExport):
+    """lojas gravadas em sequencia no ExcelWriter"""
+
+    def close(self) -> int:
+        linhas = 0
+
+        with ExcelWriter(self.nome_saida) as writer:
+            for tbl in self.lojas():
+                writer.write(tbl.to_pandas())
+                linhas += tbl.num_rows
+
+        return linhas
+
+
+class CsvStream(StreamExport):
+    """lojas anexadas em sequencia no csv"""
+
+    def close(self) -> int:
+        linhas = 0
+
+        for tbl in self.lojas():
+            tbl.to_pandas().to_csv(
+                self.nome_saida,
+                sep=';',
+                encoding='utf-8',
+                index=False,
+                mode='w' if linhas == 0 else 'a',
+                header=linhas == 0
+            )
+            linhas += tbl.num_rows
+
+        return linhas
+
+
+# NOTE: formatos com exportacao em streaming
+STREAMS = {
+    'parquet': ParquetStream,
+    'xlsx': ExcelStream,
+    'csv': CsvStream,
+}
@@ -0,0 +1,92 @@
+"""
+Historico da Ruptura em parquet particionado (hive)
+
+    historico/data=2026-10-18/page_cd_filial=101/part-0.parquet
+
+cada execucao acrescenta as lojas processadas, a particao de uma
+loja em uma data e substituida quando a loja roda de novo, as demais
+ficam como estao. consulta_historico le apenas as particoes do filtro
+
+uso:
+    consulta_historico('historico', inicio=date(2026, 9, 1), filiais=[101, 102])
+"""
+from pathlib import Path
+from datetime import date
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from cache import grava_atomico
+
+
+PARTICOES = pa.schema([
+    ('data', pa.date32()),
+    ('page_cd_filial', pa.int32()),
+])
+
+
+def particionamento() -> ds.Partitioning:
+    return ds.partitioning(PARTICOES, flavor='hive')
+
+
+def pasta_particao(pasta: Path, data: date, filial: int) -> Path:
+    return pasta / f'data={data:%Y-%m-%d}' / f'page_cd_filial={filial}'
+
+
+def grava_historico(df: pd.DataFrame, pasta: Path | str) -> int:
+    """acrescenta o consolidado ao historico, retorna as particoes gravadas
+
+    cada particao (data, filial) vai para um temporario e substitui o
+    part-0.parquet (grava_atomico), a loja que roda de novo na mesma data
+    e trocada sem janela com a particao vazia
+
+    NOTE: escrita propria no lugar do ds.write_dataset, o pool de threads
+    do writer abortava o fechamento do interpretador em algumas execucoes
+    """
+    pasta = Path(pasta)
+    datas = df['page_dh_inclusao'].dt.date
+    filiais = df['page_cd_filial'].astype('int32')
+    tabela = pa.Table.from_pandas(df.drop(columns=['page_cd_filial']), preserve_index=False)
+
+    grupos = pd.Series(range(len(df))).groupby([datas.to_numpy(), filiais.to_numpy()]).indices
+
+    for (data, filial), linhas in grupos.items():
+        destino = pasta_particao(pasta, data, filial)
+        destino.mkdir(parents=True, exist_ok=True)
+
+        with grava_atomico(destino / 'part-0.parquet') as tmp:
+            pq.write_table(tabela.take(linhas), tmp)
+
+        for antigo in destino.glob('*.parquet'):
+            if antigo.name != 'part-0.parquet':
+                antigo.unlink(missing_ok=True)
+
+    return len(grupos)
+
+
+def consulta_historico(
+    pasta: Path | str,
+    colunas: list[str] | None = None,
+    inicio: date | None = None,
+    fim: date | None = None,
+    filiais: list[int] | None = None
+) -> pd.DataFrame:
+    """le o historico, apenas as particoes entre inicio e fim (inclusive)
+    e das filiais pedidas, colunas -> None para todas
+    """
+    dataset = ds.dataset(Path(pasta), format='parquet', partitioning=particionamento())
+    filtro = None
+
+    for cond in [
+        None if inicio is None else ds.field('data') >= inicio,
+        None if fim is None else ds.field('data') <= fim,
+        None if filiais is None else ds.field('page_cd_filial').isin(filiais),
+    ]:
+        if cond is not None:
+            filtro = cond if filtro is None else filtro & cond
+
+    df = dataset.to_table(columns=colunas, filter=filtro).to_pandas()
+    ordem = [col for col in PARTICOES.names if col in df]
+
+    return df.sort_values(ordem, ignore_index=True) if ordem else df
@@ -2,14 +2,15 @@ from PySide6.QtCore import *       # not interfaces
 from PySide6.QtWidgets import *    # widgets pronto para uso, ex: QPushButton
 from PySide6.QtGui import *        # adiciona o CORE, como eventos
 import sys
+import multiprocessing
 from config import (
     is_start_json,
     ICON,
     IMG
 )
-from dialog.login import Login
-from dialog.produtos import Produtos
-from dialog.ruptura import Ruptura
+
+# NOTE: dialogos importados ao abrir, a janela principal sobe sem
+# carregar pandas, pyarrow, pyodbc e boto3
 
 
 class MainWindow(QMainWindow):
@@ -68,6 +69,8 @@ class MainWindow(QMainWindow):
     
     def show_dialog_prod(self) -> None:
         if is_start_json():
+            from dialog.produtos import Produtos
+
             dialog = Produtos()
             dialog.exec()
         else:
@@ -79,15 +82,22 @@ class MainWindow(QMainWindow):
             )
     
     def show_dialog_ruptura(self) -> None:
+        from dialog.ruptura import Ruptura
+
         dialog = Ruptura()
         dialog.exec()
     
     def show_dialog_login(self) -> None:
+        from dialog.login import Login
+
         dialog = Login()
         dialog.exec()
 
 
 if __name__ == '__main__':
+    # NOTE: necessario para o pool de processos no executavel do PyInstaller
+    multiprocessing.freeze_support()
+
     app = QApplication(sys.argv)
 
     window = MainWindow()
@@ -0,0 +1,275 @@
+"""
+Metricas da execucao por etapa e por arquivo
+
+Cada registro tem etapa, arquivo, segundos, linhas, bytes e o pico de
+RSS durante a etapa (amostrado por uma thread do proprio processo, com
+workers em threads o pico inclui os bancos processados ao mesmo tempo)
+
+Os registros seguem para o callback (Signal metrics do WorkerSignals)
+conforme terminam e sao gravados em um json ao lado do arquivo de saida
+"""
+from pathlib import Path
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Generator, Any
+import json
+import os
+import sys
+import threading
+import time
+
+from cancel import Cancelado
+
+
+def _memoria_windows():
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD),
+            ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t),
+            ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t),
+            ('PeakPagefileUsage', ctypes.c_size_t),
+        ]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    ctypes.windll.psapi.GetProcessMemoryInfo(
+        ctypes.windll.kernel32.GetCurrentProcess(),
+        ctypes.byref(counters),
+        counters.cb
+    )
+    return counters
+
+
+def pico_rss_mb() -> float:
+    """pico de memoria residente do processo atual em MB"""
+
+    try:
+        import resource
+    except ImportError:
+        return _memoria_windows().PeakWorkingSetSize / 1024 ** 2
+
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # NOTE: linux reporta em KB, macOS em bytes
+    return maxrss / (1024 ** 2 if sys.platform == 'darwin' else 1024)
+
+
+def rss_atual_mb() -> float:
+    """memoria residente atual do processo em MB"""
+
+    if sys.platform == 'win32':
+        return _memoria_windows().WorkingSetSize / 1024 ** 2
+
+    try:
+        with open('/proc/self/statm') as fp:
+            paginas = int(fp.read().split()[1])
+        return paginas * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except OSError:
+        return pico_rss_mb()
+
+
+class Amostrador:
+    """uma thread por processo amostrando o rss das etapas abertas"""
+
+    _atual: 'Amostrador | None' = None
+    _lock = threading.Lock()
+
+    def __init__(self, intervalo: float = 0.05) -> None:
+        self.intervalo = intervalo
+        self.pid = os.getpid()
+        self.abertas: set['Etapa'] = set()
+        self._lock_abertas = threading.Lock()
+
+        thread = threading.Thread(target=self._amostra, name='metricas', daemon=True)
+        thread.start()
+
+    @classmethod
+    def atual(cls) -> 'Amostrador':
+        # NOTE: novo amostrador em cada processo do pool
+        with cls._lock:
+            if cls._atual is None or cls._atual.pid != os.getpid():
+                cls._atual = cls()
+
+            return cls._atual
+
+    def _amostra(self) -> None:
+        while True:
+            time.sleep(self.intervalo)
+
+            if not self.abertas:
+                continue
+
+            rss = rss_atual_mb()
+            with self._lock_abertas:
+                for etapa in self.abertas:
+                    etapa.pico = max(etapa.pico, rss)
+
+    def abre(self, etapa: 'Etapa') -> None:
+        with self._lock_abertas:
+            self.abertas.add(etapa)
+
+    def fecha(self, etapa: 'Etapa') -> None:
+        with self._lock_abertas:
+            self.abertas.discard(etapa)
+
+
+class Etapa:
+    """mede o bloco: segundos e pico de rss, linhas e bytes informados em conta()"""
+
+    def __init__(self, nome: str, arquivo: str | None = None) -> None:
+        self.nome = nome
+        self.arquivo = arquivo
+        self.linhas: int | None = None
+        self.bytes: int | None = None
+        self.extras: dict = {}
+        self.segundos = 0.0
+        self.pico = 0.0
+
+    def __enter__(self) -> 'Etapa':
+        self.pico = rss_atual_mb()
+        self._inicio = time.perf_counter()
+        Amostrador.atual().abre(self)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.segundos = time.perf_counter() - self._inicio
+        Amostrador.atual().fecha(self)
+        self.pico = max(self.pico, rss_atual_mb())
+
+    def conta(self, linhas: int | None = None, bytes: int | None = None, **extras) -> None:
+        self.linhas = linhas
+        self.bytes = bytes
+        self.extras.update(extras)
+
+    def registro(self) -> dict:
+        return registro(self.nome, self.arquivo, self.segundos, self.linhas, self.bytes, self.pico, **self.extras)
+
+
+def registro(
+    etapa: str,
+    arquivo: str | None,
+    segundos: float,
+    linhas: int | None = None,
+    bytes: int | None = None,
+    pico_rss_mb: float | None = None,
+    **extras
+) -> dict:
+    return {
+        'etapa': etapa,
+        'arquivo': arquivo,
+        'segundos': round(segundos, 4),
+        'linhas': linhas,
+        'bytes': bytes,
+        'pico_rss_mb': None if pico_rss_mb is None else round(pico_rss_mb, 1),
+        **extras,
+    }
+
+
+# NOTE: leituras no banco somadas por thread (ver SourceSession.read),
+# cada transform medido abre a sua coleta
+_fetch = threading.local()
+
+
+@contextmanager
+def coleta_fetch() -> Generator[dict, Any, None]:
+    _fetch.atual = {'segundos': 0.0, 'linhas': 0, 'bytes': 0}
+
+    try:
+        yield _fetch.atual
+    finally:
+        _fetch.atual = None
+
+
+def registra_fetch(segundos: float, linhas: int, bytes: int) -> None:
+    atual = getattr(_fetch, 'atual', None)
+
+    if atual is not None:
+        atual['segundos'] += segundos
+        atual['linhas'] += linhas
+        atual['bytes'] += bytes
+
+
+class Metricas:
+    """registros de uma execucao
+
+    callback -> objeto com emit(dict), o Signal metrics dos dialogos
+    """
+
+    def __init__(self, callback=None) -> None:
+        self.callback = callback
+        self.registros: list[dict] = []
+        self.inicio = datetime.now()
+        self._lock = threading.Lock()
+
+    def adiciona(self, registro: dict) -> None:
+        with self._lock:
+            self.registros.append(registro)
+
+        if self.callback is not None:
+            self.callback.emit(registro)
+
+    @contextmanager
+    def etapa(self, nome: str, arquivo: str | None = None, **extras) -> Generator[Etapa, Any, None]:
+        with Etapa(nome, arquivo) as etapa:
+            etapa.extras.update(extras)
+            yield etapa
+
+        self.adiciona(etapa.registro())
+
+    def resumo(self) -> dict[str, dict]:
+        """totais por etapa, na ordem em que apareceram"""
+        resumo: dict[str, dict] = {}
+
+        with self._lock:
+            for reg in self.registros:
+                total = resumo.setdefault(
+                    reg['etapa'],
+                    {'arquivos': 0, 'segundos': 0.0, 'linhas': 0, 'bytes': 0, 'pico_rss_mb': 0.0}
+                )
+                total['arquivos'] += reg['arquivo'] is not None
+                total['segundos'] = round(total['segundos'] + reg['segundos'], 4)
+                total['linhas'] += reg['linhas'] or 0
+                total['bytes'] += reg['bytes'] or 0
+                total['pico_rss_mb'] = max(total['pico_rss_mb'], reg['pico_rss_mb'] or 0)
+
+        return resumo
+
+    @contextmanager
+    def relatorio(self, nome_saida: str) -> Generator['Metricas', Any, None]:
+        """grava o json ao final do bloco, inclusive quando falha"""
+        status = 'erro'
+
+        try:
+            yield self
+            status = 'ok'
+        except Cancelado:
+            status = 'cancelado'
+            raise
+        finally:
+            self.grava(nome_saida, status)
+
+    def grava(self, nome_saida: str, status: str = 'ok') -> Path:
+        """Produtos_ddmmYYYY_HHMMSS.parquet -> Produtos_ddmmYYYY_HHMMSS.metricas.json"""
+        saida = Path(nome_saida)
+        destino = saida.with_name(f'{saida.stem}.metricas.json')
+
+        relatorio = {
+            'saida': str(saida),
+            'status': status,
+            'inicio': self.inicio.isoformat(timespec='seconds'),
+            'fim': datetime.now().isoformat(timespec='seconds'),
+            'pico_rss_mb': round(pico_rss_mb(), 1),
+            'etapas': self.resumo(),
+            'registros': self.registros,
+        }
+
+        destino.write_text(json.dumps(relatorio, indent=4, ensure_ascii=False), encoding='utf-8')
+        return destino
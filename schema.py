@@ -0,0 +1,127 @@
+"""
+Schema das tabelas dos bancos das lojas
+
+Para cada tabela: coluna no banco -> nome no dataframe, tipo e, nas
+datas em texto, se o dia vem primeiro. Os tipos numericos seguem para
+o fetch (cada lote ja sai no tipo final), nulos numericos viram 0 e
+texto vira categoria sem acento, como no converter_numeric_txt
+
+O tipo numerico e aplicado apenas sem perda (sources.cast_sem_perda),
+uma coluna com 1.5 no banco continua float no lugar de int32
+
+Colunas fora do schema continuam pelo caminho antigo do get_table
+(rename_columns + converter_numeric_txt)
+"""
+from typing import Callable, NamedTuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from sources import cast_sem_perda
+
+
+class Coluna(NamedTuple):
+    nome: str
+    tipo: str
+    dayfirst: bool = False
+
+
+# NOTE: tipo do schema -> tipo arrow no fetch,
+# None fica com o tipo do banco e e tratado no frame
+TIPOS = {
+    'int32': pa.int32(),
+    'int64': pa.int64(),
+    'float32': pa.float32(),
+    'categoria': None,
+    'data': None,
+}
+
+SCHEMAS: dict[str, dict[str, Coluna]] = {
+    'KARDEX_FILIAL': {
+        'KAFI_CD_PRODUTO': Coluna('kafi_cd_produto', 'int32'),
+        'KAFI_DT_MOV': Coluna('kafi_dt_mov', 'data'),
+        'KAFI_TP_MOV': Coluna('kafi_tp_mov', 'categoria'),
+        'KAFI_QT_SALDO': Coluna('kafi_qt_saldo', 'int32'),
+        'KAFI_VL_CMPG': Coluna('kafi_vl_cmpg', 'float32'),
+    },
+    'PRODUTO_MESTRE': {
+        'PRME_CD_PRODUTO': Coluna('prme_cd_produto', 'int32'),
+        'PRME_VL_CONFFINAL': Coluna('prme_vl_conffinal', 'int32'),
+        'QTDE_SUBESTOQUE': Coluna('qtde_subestoque', 'int32'),
+        'PRFI_VL_CMPG': Coluna('prfi_vl_cmpg', 'float32'),
+        'PRFI_QT_ESTOQATUAL': Coluna('prfi_qt_estoqatual', 'int32'),
+        'PRFI_VL_PRECOVENDA': Coluna('prfi_vl_precovenda', 'float32'),
+    },
+    'PARAMETRO_GERAL': {
+        'PAGE_CD_FILIAL': Coluna('page_cd_filial', 'int32'),
+        'PAGE_DH_INCLUSAO': Coluna('page_dh_inclusao', 'data', dayfirst=True),
+    },
+}
+
+
+def colunas_schema(table_name: str) -> dict[str, Coluna]:
+    return SCHEMAS.get(table_name.upper(), {})
+
+
+def tipos_fetch(table_name: str) -> dict[str, pa.DataType]:
+    """coluna no banco (maiuscula) -> tipo arrow de cada lote do fetch"""
+    return {
+        col: TIPOS[coluna.tipo]
+        for col, coluna in colunas_schema(table_name).items()
+        if TIPOS[coluna.tipo] is not None
+    }
+
+
+def converte_coluna(
+    arr: pa.ChunkedArray,
+    coluna: Coluna,
+    texto: Callable[[pd.Series], pd.Series]
+) -> pd.Series:
+    if coluna.tipo == 'data':
+        if pa.types.is_timestamp(arr.type) or pa.types.is_date(arr.type):
+            return arr.to_pandas(coerce_temporal_nanoseconds=True)
+
+        return pd.to_datetime(arr.to_pandas(), dayfirst=coluna.dayfirst)
+
+    if coluna.tipo == 'categoria':
+        return texto(arr.to_pandas())
+
+    arr = cast_sem_perda(arr, TIPOS[coluna.tipo])
+
+    if not (pa.types.is_integer(arr.type) or pa.types.is_floating(arr.type)):
+        return arr.to_pandas()
+
+    return pc.fill_null(arr, 0).to_pandas()
+
+
+def frame_schema(
+    tabela: pa.Table,
+    table_name: str,
+    texto: Callable[[pd.Series], pd.Series]
+) -> tuple[pd.DataFrame, list[str]]:
+    """tabela arrow -> dataframe, colunas do schema ja no nome e tipo final
+    retorna tambem as colunas tratadas, as demais ficam como vieram
+    texto -> normalizacao das colunas de categoria (utils.normaliza_texto)
+
+    colunas inteiras nulas sao descartadas, como no drop_columns_na,
+    a tabela sem linhas mantem todas as colunas
+    """
+    schema = colunas_schema(table_name)
+    dados = {}
+    tratadas = []
+
+    for nome, arr in zip(tabela.column_names, tabela.columns):
+        coluna = schema.get(nome.upper())
+
+        if coluna is None:
+            dados[nome] = arr.to_pandas(coerce_temporal_nanoseconds=True)
+            continue
+
+        if len(arr) and arr.null_count == len(arr):
+            continue
+
+        dados[coluna.nome] = converte_coluna(arr, coluna, texto)
+        tratadas.append(coluna.nome)
+
+    return pd.DataFrame(dados, index=pd.RangeIndex(tabela.num_rows)), tratadas
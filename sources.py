@@ -0,0 +1,585 @@
+"""
+Origens das tabelas das lojas para o get_table
+
+    OdbcSource    -> .accdb / .mdb pelo driver odbc do access (somente windows)
+    SqliteSource  -> .sqlite / .db
+    DuckDBSource  -> .duckdb
+    ParquetSource -> pasta .snapshot com um TABELA.parquet por tabela,
+                     gerada pelo exporta_snapshot a partir de qualquer origem
+
+Todas leem (tabela, colunas, filtro) e devolvem uma tabela arrow com os
+nomes e tipos originais, o tratamento das colunas fica no get_table
+"""
+from pathlib import Path
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Generator, Any, TYPE_CHECKING
+from datetime import datetime
+import sqlite3
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pandas as pd
+
+from cache import grava_atomico
+from metrics import registra_fetch
+
+# NOTE: pyodbc e duckdb sao importados apenas quando usados
+if TYPE_CHECKING:
+    from pyodbc import Cursor
+
+
+# NOTE: linhas por fetchmany no get_table
+BATCH_SIZE = 50_000
+
+# NOTE: type_code do pyodbc -> tipo arrow da coluna,
+# tipos fora do mapa sao inferidos pelo arrow
+TIPOS_ARROW = {
+    int: pa.int64(),
+    float: pa.float64(),
+    str: pa.string(),
+    bool: pa.bool_(),
+    datetime: pa.timestamp('us'),
+}
+
+# NOTE: operadores aceitos no filtro do get_table
+OPERADORES = ('=', '<>', '<', '<=', '>', '>=', 'in', 'not in')
+
+driver_str = (
+    'DRIVER={{Microsoft Access Driver (*.mdb, *.accdb)}};'
+    'DBQ={};'
+)
+
+SUFIXOS_SQLITE = ('.sqlite', '.db')
+SUFIXOS_DUCKDB = ('.duckdb',)
+SUFIXO_SNAPSHOT = '.snapshot'
+
+# NOTE: tabelas lidas pelos transforms, copiadas no snapshot
+TABELAS_SNAPSHOT = ('KARDEX_FILIAL', 'PRODUTO_MESTRE', 'PARAMETRO_GERAL')
+
+
+@contextmanager
+def do_connect(driver: str) -> Generator['Cursor', Any, None]:
+    import pyodbc
+
+    con = pyodbc.connect(driver)
+    cursor = con.cursor()
+
+    try:
+        yield cursor
+    except Exception:
+        raise
+    finally:
+        cursor.close()
+        con.close()
+
+
+def concat_chunks(chunks: list[pa.Array], tipo: pa.DataType | None) -> pa.ChunkedArray:
+    if tipo is not None:
+        return pa.chunked_array(chunks, type=tipo)
+
+    # NOTE: lotes so com nulos saem como pa.null(), assume o tipo dos demais
+    tipos = {c.type for c in chunks if c.type != pa.null()}
+
+    if not tipos:
+        return pa.chunked_array(chunks, type=pa.null())
+
+    if len(tipos) == 1:
+        tipo = tipos.pop()
+        return pa.chunked_array([c.cast(tipo) for c in chunks], type=tipo)
+
+    return pa.chunked_array([pa.array([v for c in chunks for v in c.to_pylist()])])
+
+
+def cast_sem_perda(arr: pa.Array | pa.ChunkedArray, tipo: pa.DataType) -> pa.Array | pa.ChunkedArray:
+    """cast para o tipo do schema apenas quando nao perde valor, como o
+    downcast do pd.to_numeric: valor que nao cabe (ex: 1.5 em int32)
+    mantem o tipo lido do banco
+    """
+    try:
+        return arr.cast(tipo)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return arr
+
+
+def fetch_arrow(
+    cursor: 'Cursor',
+    batch_size: int = BATCH_SIZE,
+    tipos: dict[str, pa.DataType] | None = None
+) -> pa.Table:
+    """le o resultado do cursor com fetchmany em lotes
+    cada lote vai direto para arrays arrow por coluna,
+    sem montar um dict por linha
+
+    tipos -> coluna (maiuscula) -> tipo final, cada lote ja e convertido
+    (cast_sem_perda), a coluna com valor que nao cabe fica com o tipo lido
+    """
+    tipos = tipos or {}
+    cols = [col[0] for col in cursor.description]
+    lidos = [TIPOS_ARROW.get(col[1]) for col in cursor.description]
+    finais = [tipos.get(col.upper()) for col in cols]
+    chunks = [[] for _ in cols]
+
+    while rows := cursor.fetchmany(batch_size):
+        for pos, (lido, valores) in enumerate(zip(lidos, zip(*rows))):
+            arr = pa.array(valores, type=lido, from_pandas=True)
+
+            if finais[pos] is not None:
+                convertido = cast_sem_perda(arr, finais[pos])
+
+                if convertido.type != finais[pos]:
+                    # NOTE: lotes anteriores voltam ao tipo lido, sem perda
+                    finais[pos] = None
+                    chunks[pos] = [chunk.cast(arr.type) for chunk in chunks[pos]]
+
+                arr = convertido
+
+            chunks[pos].append(arr)
+
+    return pa.Table.from_arrays(
+        [
+            concat_chunks(chunk, final or lido)
+            for chunk, lido, final in zip(chunks, lidos, finais)
+        ],
+        names=cols
+    )
+
+
+def aplica_tipos(tabela: pa.Table, tipos: dict[str, pa.DataType] | None) -> pa.Table:
+    """tipos do fetch_arrow para as origens que ja leem colunar"""
+    if not tipos:
+        return tabela
+
+    return pa.Table.from_arrays(
+        [
+            cast_sem_perda(arr, tipos[nome.upper()]) if nome.upper() in tipos else arr
+            for nome, arr in zip(tabela.column_names, tabela.columns)
+        ],
+        names=tabela.column_names
+    )
+
+
+def fetch_frame(cursor: 'Cursor', batch_size: int = BATCH_SIZE) -> pd.DataFrame:
+    return fetch_arrow(cursor, batch_size).to_pandas(coerce_temporal_nanoseconds=True)
+
+
+def monta_sql(
+    table_name: str,
+    columns: list[str] | None = None,
+    where: list[tuple] | None = None,
+    aspas: str = '[{}]'
+) -> tuple[str, list]:
+    """monta o select enviado ao banco
+    columns -> colunas projetadas, None para todas
+    where -> lista de (coluna, operador, valor) unidos por and,
+    os valores seguem como parametros (?)
+    aspas -> formato dos identificadores no dialeto do banco
+    """
+    cols = ', '.join(aspas.format(col) for col in columns) if columns else '*'
+    stmt = f'select {cols} from {aspas.format(table_name)}'
+    params = []
+
+    if where:
+        conds = []
+        for col, op, valor in valida_where(where):
+            if op in ('in', 'not in'):
+                valores = list(valor)
+                conds.append(f"{aspas.format(col)} {op} ({', '.join('?' * len(valores))})")
+                params.extend(valores)
+            else:
+                conds.append(f'{aspas.format(col)} {op} ?')
+                params.append(valor)
+
+        stmt += ' where ' + ' and '.join(conds)
+
+    return stmt, params
+
+
+def valida_where(where: list[tuple]) -> list[tuple]:
+    conds = []
+    for col, op, valor in where:
+        op = op.lower()
+
+        if op not in OPERADORES:
+            raise ValueError(f'Operador invalido: {op}')
+
+        conds.append((col, op, valor))
+
+    return conds
+
+
+class TableSource(ABC):
+    """banco de uma loja aberto como context manager
+
+    with open_source(file) as fonte:
+        tabela = fonte.read('PRODUTO_MESTRE', columns=[...], where=[...])
+    """
+
+    def __init__(self, file: Path | str) -> None:
+        self.file = Path(file)
+
+    def __enter__(self) -> 'TableSource':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        pass
+
+    @abstractmethod
+    def read(
+        self,
+        table_name: str,
+        columns: list[str] | None = None,
+        where: list[tuple] | None = None,
+        batch_size: int = BATCH_SIZE,
+        tipos: dict[str, pa.DataType] | None = None
+    ) -> pa.Table:
+        ...
+
+    @abstractmethod
+    def tabelas(self) -> list[str]:
+        ...
+
+
+class CursorSource(TableSource):
+    """origens com cursor dbapi (fetchmany + parametros ?)"""
+
+    aspas = '[{}]'
+
+    def __init__(self, file: Path | str) -> None:
+        super().__init__(file)
+        self.con = self.connect()
+        self.cursor = self.con.cursor()
+
+    @abstractmethod
+    def connect(self) -> Any:
+        ...
+
+    def close(self) -> None:
+        self.cursor.close()
+        self.con.close()
+
+    def read(
+        self,
+        table_name: str,
+        columns: list[str] | None = None,
+        where: list[tuple] | None = None,
+        batch_size: int = BATCH_SIZE,
+        tipos: dict[str, pa.DataType] | None = None
+    ) -> pa.Table:
+
+        stmt, params = monta_sql(table_name, columns, where, self.aspas)
+        rst = self.cursor.execute(stmt, params) if params else self.cursor.execute(stmt)
+
+        return fetch_arrow(rst, batch_size, tipos)
+
+
+class OdbcSource(CursorSource):
+
+    def connect(self) -> Any:
+        import pyodbc
+
+        return pyodbc.connect(driver_str.format(self.file))
+
+    def tabelas(self) -> list[str]:
+        return [t.table_name for t in self.cursor.tables(tableType='TABLE').fetchall()]
+
+
+class SqliteSource(CursorSource):
+    """copias locais dos bancos em sqlite (ver benchmarks/dataset.py)"""
+
+    aspas = '"{}"'
+
+    def connect(self) -> Any:
+        return sqlite3.connect(self.file, detect_types=sqlite3.PARSE_DECLTYPES)
+
+    def tabelas(self) -> list[str]:
+        rst = self.cursor.execute("select name from sqlite_master where type = 'table'")
+        return [nome for nome, in rst.fetchall()]
+
+
+class DuckDBSource(TableSource):
+
+    aspas = '"{}"'
+
+    def __init__(self, file: Path | str) -> None:
+        import duckdb
+
+        super().__init__(file)
+        self.con = duckdb.connect(str(self.file), read_only=True)
+
+    def close(self) -> None:
+        self.con.close()
+
+    def read(
+        self,
+        table_name: str,
+        columns: list[str] | None = None,
+        where: list[tuple] | None = None,
+        batch_size: int = BATCH_SIZE,
+        tipos: dict[str, pa.DataType] | None = None
+    ) -> pa.Table:
+
+        # NOTE: resultado ja colunar, sem fetchmany
+        stmt, params = monta_sql(table_name, columns, where, self.aspas)
+        return aplica_tipos(self.con.execute(stmt, params).arrow(), tipos)
+
+    def tabelas(self) -> list[str]:
+        return [nome for nome, in self.con.execute('show tables').fetchall()]
+
+
+# NOTE: operadores do get_table -> filters do pyarrow
+OPERADORES_ARROW = {'=': '==', '<>': '!='}
+
+
+class ParquetSource(TableSource):
+    """pasta .snapshot, projecao e filtro aplicados na leitura do parquet"""
+
+    def read(
+        self,
+        table_name: str,
+        columns: list[str] | None = None,
+        where: list[tuple] | None = None,
+        batch_size: int = BATCH_SIZE,
+        tipos: dict[str, pa.DataType] | None = None
+    ) -> pa.Table:
+
+        filters = [
+            (col, OPERADORES_ARROW.get(op, op), valor)
+            for col, op, valor in valida_where(where)
+        ] if where else None
+
+        return aplica_tipos(
+            pq.read_table(
+                self.file / f'{table_name}.parquet',
+                columns=columns,
+                filters=filters
+            ),
+            tipos
+        )
+
+    def tabelas(self) -> list[str]:
+        return sorted(p.stem for p in self.file.glob('*.parquet'))
+
+
+def open_source(file: Path | str) -> TableSource:
+    """escolhe a origem pelo sufixo do arquivo, demais pelo odbc do access"""
+    sufixo = Path(file).suffix.lower()
+
+    if sufixo == SUFIXO_SNAPSHOT or Path(file).is_dir():
+        return ParquetSource(file)
+
+    if sufixo in SUFIXOS_SQLITE:
+        return SqliteSource(file)
+
+    if sufixo in SUFIXOS_DUCKDB:
+        return DuckDBSource(file)
+
+    return OdbcSource(file)
+
+
+def normaliza_cond(cond: tuple) -> tuple:
+    col, op, valor = valida_where([cond])[0]
+
+    if op in ('in', 'not in'):
+        valor = tuple(valor)
+
+    return col.upper(), op, valor
+
+
+class SourceSession:
+    """sessao de um banco: uma conexao e cada tabela lida uma vez
+
+    as leituras ficam em memoria (arrow) e atendem os pedidos seguintes
+    cujas colunas e filtros estejam contidos nelas, o filtro que sobra e
+    aplicado no arrow, planeja() junta as leituras de varios transforms
+    para que a primeira ida ao banco ja traga o necessario para todos
+
+    contadores -> conexoes abertas, leituras no banco, pedidos atendidos
+    da memoria e bytes lidos (tamanho das tabelas arrow)
+    """
+
+    def __init__(self, file: Path | str) -> None:
+        self.file = Path(file)
+        self.fonte: TableSource | None = None
+        self.plano: dict[str, list[tuple]] = {}
+        self.lidas: dict[str, list[tuple]] = {}
+
+        self.conexoes = 0
+        self.leituras = 0
+        self.reusos = 0
+        self.bytes_lidos = 0
+
+    def __enter__(self) -> 'SourceSession':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self.fonte is not None:
+            self.fonte.close()
+            self.fonte = None
+
+        self.lidas.clear()
+
+    def planeja(self, leituras: list[tuple]) -> 'SourceSession':
+        """leituras -> (tabela, colunas, where) que serao pedidas na sessao"""
+        for tabela, columns, where in leituras:
+            self.plano.setdefault(tabela.upper(), []).append((columns, where))
+
+        return self
+
+    def contadores(self) -> dict:
+        return {
+            'conexoes': self.conexoes,
+            'leituras': self.leituras,
+            'reusos': self.reusos,
+            'bytes_lidos': self.bytes_lidos,
+        }
+
+    def read(
+        self,
+        table_name: str,
+        columns: list[str] | None = None,
+        where: list[tuple] | None = None,
+        batch_size: int = BATCH_SIZE,
+        tipos: dict[str, pa.DataType] | None = None
+    ) -> pa.Table:
+
+        pedido = {normaliza_cond(cond) for cond in where or []}
+
+        for lidas_cols, lidas_where, tabela in self.lidas.get(table_name.upper(), []):
+            if atende(lidas_cols, lidas_where, columns, pedido):
+                self.reusos += 1
+                return filtra(tabela, columns, pedido - lidas_where)
+
+        cols, conds = junta_leituras([(columns, where)] + self.plano.get(table_name.upper(), []))
+
+        if self.fonte is None:
+            self.fonte = open_source(self.file)
+            self.conexoes += 1
+
+        inicio = time.perf_counter()
+        tabela = self.fonte.read(table_name, cols, list(conds) or None, batch_size, tipos)
+        registra_fetch(time.perf_counter() - inicio, tabela.num_rows, tabela.nbytes)
+
+        self.leituras += 1
+        self.bytes_lidos += tabela.nbytes
+
+        self.lidas.setdefault(table_name.upper(), []).append((cols, conds, tabela))
+
+        return filtra(tabela, columns, pedido - conds)
+
+
+def junta_leituras(leituras: list[tuple]) -> tuple[list[str] | None, frozenset]:
+    """uma leitura que atende todas: filtros comuns a todas no banco,
+    colunas somadas mais as colunas dos filtros que nao sao comuns
+    """
+    filtros = [{normaliza_cond(cond) for cond in where or []} for _, where in leituras]
+    comuns = frozenset.intersection(*map(frozenset, filtros))
+
+    if any(columns is None for columns, _ in leituras):
+        return None, comuns
+
+    cols: dict[str, str] = {}
+    for (columns, _), conds in zip(leituras, filtros):
+        for col in list(columns) + [c for c, _, _ in conds - comuns]:
+            cols.setdefault(col.upper(), col)
+
+    return list(cols.values()), comuns
+
+
+def atende(
+    lidas_cols: list[str] | None,
+    lidas_where: frozenset,
+    columns: list[str] | None,
+    pedido: set
+) -> bool:
+    if not lidas_where <= pedido:
+        return False
+
+    if lidas_cols is None:
+        return True
+
+    if columns is None:
+        return False
+
+    disponiveis = {col.upper() for col in lidas_cols}
+    necessarias = {col.upper() for col in columns} | {c for c, _, _ in pedido - lidas_where}
+
+    return necessarias <= disponiveis
+
+
+def filtra(tabela: pa.Table, columns: list[str] | None, conds: set) -> pa.Table:
+    # NOTE: nomes sem diferenciar maiusculas, como no access
+    nomes = {nome.upper(): nome for nome in tabela.column_names}
+
+    if conds:
+        tabela = tabela.filter(
+            pq.filters_to_expression([
+                (nomes[col], OPERADORES_ARROW.get(op, op), list(valor) if op in ('in', 'not in') else valor)
+                for col, op, valor in conds
+            ])
+        )
+
+    if columns is not None:
+        tabela = tabela.select([nomes[col.upper()] for col in columns])
+
+    return tabela
+
+
+@contextmanager
+def sessao_de(
+    file: 'Path | str | SourceSession',
+    leituras: list[tuple] | None = None
+) -> Generator[SourceSession, Any, None]:
+    """usa a sessao recebida (sem fechar) ou abre uma para o arquivo"""
+    if isinstance(file, SourceSession):
+        yield file
+        return
+
+    with SourceSession(file) as sessao:
+        yield sessao.planeja(leituras or [])
+
+
+def caminho_snapshot(
+    file: Path | str,
+    pasta: Path | str | None = None,
+    raiz: Path | str | None = None
+) -> Path:
+    """loja.accdb -> loja.snapshot ao lado do banco, ou dentro de pasta
+    mantendo o caminho relativo a raiz
+    """
+    file = Path(file)
+
+    if pasta is not None:
+        file = Path(pasta) / (file.relative_to(raiz) if raiz else file.name)
+
+    return file.with_suffix(SUFIXO_SNAPSHOT)
+
+
+def exporta_snapshot(
+    file: Path | str,
+    pasta: Path | str | None = None,
+    raiz: Path | str | None = None,
+    tabelas: tuple[str, ...] = TABELAS_SNAPSHOT
+) -> Path:
+    """copia as tabelas do banco para uma pasta .snapshot (um parquet por tabela)
+
+    a copia e gravada em uma pasta temporaria e trocada no final,
+    um snapshot interrompido nunca fica pela metade
+    """
+    destino = caminho_snapshot(file, pasta, raiz)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+
+    with grava_atomico(destino) as tmp, open_source(file) as fonte:
+        tmp.mkdir()
+
+        for tabela in tabelas:
+            pq.write_table(fonte.read(tabela), tmp / f'{tabela}.parquet')
+
+    return destino
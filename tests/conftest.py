@@ -0,0 +1,70 @@
+"""
+Bancos sqlite pequenos das lojas para os testes
+
+Mesmas tabelas, nomes e tipos do benchmarks/dataset.py, com as linhas
+informadas em cada teste
+"""
+from pathlib import Path
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+TABELAS = """
+    create table PRODUTO_MESTRE (
+        PRME_CD_PRODUTO integer,
+        PRME_VL_CONFFINAL integer,
+        QTDE_SUBESTOQUE integer,
+        PRFI_VL_CMPG real,
+        PRFI_QT_ESTOQATUAL integer,
+        PRFI_VL_PRECOVENDA real
+    );
+    create table KARDEX_FILIAL (
+        KAFI_CD_PRODUTO integer,
+        KAFI_DT_MOV timestamp,
+        KAFI_TP_MOV text,
+        KAFI_QT_SALDO integer,
+        KAFI_VL_CMPG real
+    );
+    create table PARAMETRO_GERAL (
+        PAGE_CD_FILIAL integer,
+        PAGE_DH_INCLUSAO text
+    );
+"""
+
+PARAMETRO = [(101, '18/10/2026 08:00:00')]
+
+
+def cria_loja(
+    file: Path,
+    mestre: list[tuple],
+    kardex: list[tuple],
+    parametro: list[tuple] = PARAMETRO
+) -> Path:
+    """mestre -> (produto, conffinal, subestoque, cmpg, estoqatual, precovenda)
+    kardex -> (produto, datetime, tipo, quantidade, cmpg)
+    parametro -> (filial, inclusao dd/mm/aaaa)
+    """
+    file.parent.mkdir(parents=True, exist_ok=True)
+    file.unlink(missing_ok=True)
+
+    with sqlite3.connect(file) as con:
+        con.executescript(TABELAS)
+        con.executemany('insert into PRODUTO_MESTRE values (?, ?, ?, ?, ?, ?)', mestre)
+        con.executemany('insert into KARDEX_FILIAL values (?, ?, ?, ?, ?)', kardex)
+        con.executemany('insert into PARAMETRO_GERAL values (?, ?)', parametro)
+
+    con.close()
+    return file
+
+
+@pytest.fixture
+def loja(tmp_path):
+    """loja(nome, mestre=..., kardex=..., parametro=...) -> caminho do banco"""
+    def criar(nome: str = 'loja', **tabelas) -> Path:
+        return cria_loja(tmp_path / nome / 'loja.sqlite', **tabelas)
+
+    return criar
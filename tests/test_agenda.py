@@ -0,0 +1,73 @@
+from pathlib import Path
+import os
+import sys
+import time
+
+import pytest
+
+from utils import agenda
+
+
+def lento(file: Path) -> str:
+    time.sleep(30 if file.name == 'preso' else 0.6)
+    return file.name
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+@pytest.mark.parametrize('pool', ['thread', 'process'])
+def test_banco_preso_nao_esgota_o_tempo_dos_seguintes(pool, workers):
+    # NOTE: no pool de processos o preso segue ocupando um processo,
+    # os bancos seguintes nao podem contar o tempo na fila
+    raiz = [Path('a/preso')] + [Path(f'a/b{i}') for i in range(4)]
+    concluidos, esgotados = [], []
+
+    for _, file, resultado in agenda(raiz, lento, workers, pool, timeout=1.0):
+        try:
+            concluidos.append(resultado())
+        except TimeoutError:
+            esgotados.append(file.name)
+
+    assert esgotados == ['preso']
+    assert sorted(concluidos) == ['b0', 'b1', 'b2', 'b3']
+
+
+def preso_com_pid(file: Path) -> str:
+    if file.name == 'preso':
+        (file.parent / 'preso.pid').write_text(str(os.getpid()))
+
+    return lento(file)
+
+
+def em_execucao(pid: int) -> bool:
+    try:
+        estado = Path(f'/proc/{pid}/stat').read_text().rsplit(')', 1)[1].split()[0]
+    except OSError:
+        return False
+
+    return estado not in ('Z', 'X')
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='estado do processo pelo /proc')
+def test_pool_trocado_encerra_o_processo_preso(tmp_path):
+    # NOTE: com 1 processo o preso ocupa o pool inteiro, o pool e trocado
+    # e o processo do preso e encerrado, sem esperar os 30s
+    raiz = [tmp_path / 'preso', tmp_path / 'b0', tmp_path / 'b1']
+    inicio = time.monotonic()
+
+    saida = {}
+    for _, file, resultado in agenda(raiz, preso_com_pid, 1, 'process', timeout=1.0):
+        try:
+            saida[file.name] = resultado()
+        except TimeoutError:
+            saida[file.name] = None
+
+    assert saida == {'preso': None, 'b0': 'b0', 'b1': 'b1'}
+    assert time.monotonic() - inicio < 15
+
+    pid = int((tmp_path / 'preso.pid').read_text())
+    for _ in range(50):
+        if not em_execucao(pid):
+            break
+        time.sleep(0.1)
+
+    assert not em_execucao(pid)
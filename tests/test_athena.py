@@ -0,0 +1,143 @@
+import os
+import sys
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from cache import CategCache, QueryCache
+from utils import Progresso, carrega_categ, categ_athena, consulta_athena
+
+
+CONEXAO = dict(
+    s3_staging_dir='s3://bucket/staging/',
+    schema_name='modelled',
+    catalog_name='awsdatacatalog',
+    region_name='us-east-1',
+    aws_access_key_id='AKIA',
+    aws_secret_access_key='segredo',
+)
+
+CATEG = pd.DataFrame({
+    'prme_cd_produto': ['10', '20'],
+    'descprod': ['DIPIRONA 500MG', 'SABONETE'],
+    'nivel1': ['MEDICAMENTOS', 'HIGIENE'],
+    'nivel2': ['ANALGESICOS', 'BANHO'],
+    'nivel3': ['DOR', 'SABONETES'],
+    'nivel4': ['DIPIRONA', 'BARRA'],
+})
+
+
+class CursorTeste:
+    """no lugar do CursorPython, guarda os parametros da conexao"""
+
+    def __init__(self, s3_location, **kwargs) -> None:
+        self.s3_location = s3_location
+        self.kwargs = kwargs
+
+
+class AthenaTeste:
+    """no lugar do Athena, conta as consultas executadas"""
+
+    execucoes: list[str] = []
+
+    def __init__(self, cursor) -> None:
+        self.cursor = cursor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        pass
+
+    def execute(self, stmt: str) -> None:
+        self.execucoes.append(stmt)
+
+    def to_arrow(self) -> pa.Table:
+        return pa.Table.from_pandas(CATEG, preserve_index=False)
+
+
+@pytest.fixture
+def athena():
+    AthenaTeste.execucoes = []
+    return dict(cursor_factory=CursorTeste, athena_factory=AthenaTeste)
+
+
+def test_sem_athena_mvsh(athena):
+    consulta_athena('select 1', None, **athena, **CONEXAO)
+
+    assert 'athena_mvsh' not in sys.modules
+    assert AthenaTeste.execucoes == ['select 1']
+
+
+def test_cache_hit_e_segredo_fora_da_chave(tmp_path, athena):
+    query_cache = QueryCache(tmp_path)
+
+    primeira = consulta_athena('select  1', query_cache, **athena, **CONEXAO)
+    outra_senha = {**CONEXAO, 'aws_secret_access_key': 'outro'}
+    segunda = consulta_athena('select 1', query_cache, **athena, **outra_senha)
+
+    assert len(AthenaTeste.execucoes) == 1
+    assert segunda.equals(primeira)
+
+    consulta_athena('select 1', query_cache, **athena, **{**CONEXAO, 'region_name': 'sa-east-1'})
+    assert len(AthenaTeste.execucoes) == 2
+
+
+def test_ttl(tmp_path, athena):
+    query_cache = QueryCache(tmp_path, ttl_horas=0)
+
+    consulta_athena('select 1', query_cache, **athena, **CONEXAO)
+    consulta_athena('select 1', query_cache, **athena, **CONEXAO)
+
+    assert len(AthenaTeste.execucoes) == 2
+
+
+def test_evict_menos_usados(tmp_path, athena):
+    query_cache = QueryCache(tmp_path)
+
+    for n in range(3):
+        consulta_athena(f'select {n}', query_cache, **athena, **CONEXAO)
+
+    arquivos = {n: query_cache.arquivo(query_cache.chave(f'select {n}', **CONEXAO)) for n in range(3)}
+
+    # NOTE: select 0 e o menos usado
+    agora = time.time()
+    for n, file in arquivos.items():
+        os.utime(file, (agora + n, agora + n))
+
+    query_cache.max_bytes = arquivos[1].stat().st_size + arquivos[2].stat().st_size
+
+    assert query_cache.evict() == 1
+    assert [n for n, file in arquivos.items() if file.is_file()] == [1, 2]
+
+
+def test_categ_athena(tmp_path, athena):
+    categ = categ_athena(QueryCache(tmp_path), **athena, **CONEXAO)
+
+    assert list(categ.columns) == list(CATEG.columns)
+    assert categ['prme_cd_produto'].astype('int64').tolist() == [10, 20]
+    assert categ['nivel4'].tolist() == ['DIPIRONA', 'BARRA']
+
+
+class Sinal:
+    def __init__(self) -> None:
+        self.mensagens = []
+
+    def emit(self, valor) -> None:
+        self.mensagens.append(valor)
+
+
+def test_carrega_categ_uma_camada(tmp_path, athena):
+    categ_cache = CategCache(tmp_path)
+    sinal = Sinal()
+
+    for _ in range(2):
+        CategCache._memoria.clear()
+        categ = carrega_categ(categ_cache, Progresso(sinal), **athena, **CONEXAO).result()
+
+    assert len(AthenaTeste.execucoes) == 1
+    assert categ['prme_cd_produto'].dtype == 'int64'
+    assert [texto for _, texto in sinal.mensagens][-1] == 'Base Categoria: disco'
+    assert sorted(file.name for file in tmp_path.iterdir()) == ['categ.json', 'categ.parquet']
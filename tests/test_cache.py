@@ -0,0 +1,86 @@
+from datetime import datetime
+import os
+import threading
+
+import pandas as pd
+
+from cache import CachedTransform, RunCache
+from utils import transform_produto
+
+
+MESTRE = [(produto, 5, 5, 10.0, 3, 20.0) for produto in range(1, 4)]
+KARDEX = [(1, datetime(2026, 9, 3), 'SV', 2, 1.0)]
+
+
+class Contando:
+    """transform_produto contando as execucoes (banco aberto)"""
+
+    __name__ = 'transform_produto'
+
+    def __init__(self) -> None:
+        self.execucoes = 0
+
+    def __call__(self, file) -> pd.DataFrame:
+        self.execucoes += 1
+        return transform_produto(file)
+
+
+def test_run_cache_hit_e_miss_pelo_mtime(loja, tmp_path):
+    file = loja(mestre=MESTRE, kardex=KARDEX)
+    transform = Contando()
+    cache = RunCache(tmp_path / 'run')
+
+    primeira = CachedTransform(transform, cache, 1)(file)
+    segunda = CachedTransform(transform, cache, 1)(file)
+
+    assert transform.execucoes == 1
+    pd.testing.assert_frame_equal(segunda, primeira)
+
+    # NOTE: mesmo conteudo, mtime novo (banco copiado de novo da loja)
+    mtime = file.stat().st_mtime_ns + 10 ** 9
+    os.utime(file, ns=(mtime, mtime))
+    CachedTransform(transform, cache, 1)(file)
+
+    assert transform.execucoes == 2
+
+    CachedTransform(transform, cache, 2)(file)
+    assert transform.execucoes == 3
+
+
+def test_run_cache_threads_gravando_a_mesma_chave(tmp_path):
+    cache = RunCache(tmp_path)
+    df = pd.DataFrame({'produto': range(1000)})
+    erros = []
+
+    def grava() -> None:
+        try:
+            for _ in range(20):
+                cache.put('chave', df)
+        except Exception as e:
+            erros.append(e)
+
+    threads = [threading.Thread(target=grava) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert erros == []
+    pd.testing.assert_frame_equal(cache.get('chave'), df)
+    assert [file.name for file in tmp_path.iterdir()] == ['chave.parquet']
+
+
+def test_run_cache_evict(tmp_path):
+    cache = RunCache(tmp_path, max_idade_dias=1, max_bytes=0)
+    df = pd.DataFrame({'produto': range(10)})
+
+    for chave in ('velho', 'a', 'b'):
+        cache.put(chave, df)
+
+    agora = datetime.now().timestamp()
+    os.utime(cache.arquivo('velho'), (agora - 2 * 86400, agora - 2 * 86400))
+    os.utime(cache.arquivo('a'), (agora - 10, agora - 10))
+    cache.max_bytes = cache.arquivo('b').stat().st_size
+
+    assert cache.evict() == 2
+    assert [file.name for file in tmp_path.iterdir()] == ['b.parquet']
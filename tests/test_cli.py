@@ -0,0 +1,81 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import cli
+
+
+MESTRE = [(produto, 5, 5, 10.0, 0, 20.0) for produto in range(1, 4)]
+KARDEX = [(1, datetime(2026, 9, 3), 'SV', 2, 1.0)]
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    # NOTE: manifesto da busca e RunCache fora da pasta do projeto
+    monkeypatch.setattr(cli, 'CACHE_DIR', tmp_path / 'cache')
+
+
+@pytest.fixture
+def raiz(loja, tmp_path):
+    for filial in (101, 102):
+        loja(f'loja_{filial}', mestre=MESTRE, kardex=KARDEX, parametro=[(filial, '18/10/2026 08:00:00')])
+
+    return tmp_path
+
+
+def roda(*args) -> int:
+    return cli.main([str(arg) for arg in args])
+
+
+def test_ruptura_ok(raiz, tmp_path, capsys):
+    saida = tmp_path / 'saida'
+
+    assert roda('ruptura', raiz, '--fonte', 'sqlite', '--output', saida) == 0
+
+    arquivos = list(saida.glob('Ruptura_*.parquet'))
+    assert len(arquivos) == 1
+    assert sorted(pd.read_parquet(arquivos[0])['page_cd_filial']) == [101, 102]
+    assert '2 bancos encontrados' in capsys.readouterr().out
+
+
+def test_snapshot_ok(raiz, tmp_path):
+    assert roda('snapshot', raiz, '--fonte', 'sqlite', '--output', tmp_path / 'snapshots') == 0
+    assert len(list((tmp_path / 'snapshots').glob('**/*.snapshot'))) == 2
+
+
+@pytest.mark.parametrize('args', [
+    ['pasta_que_nao_existe'],
+    ['{vazia}'],
+], ids=['sem_pasta', 'sem_bancos'])
+def test_raiz_invalida(tmp_path, capsys, args):
+    (tmp_path / 'vazia').mkdir()
+    args = [arg.format(vazia=tmp_path / 'vazia') for arg in args]
+
+    assert roda('ruptura', *args, '--fonte', 'sqlite') == 1
+    assert capsys.readouterr().err.startswith('ERRO')
+
+
+def test_todos_os_bancos_com_erro(tmp_path, capsys):
+    quebrado = tmp_path / 'loja' / 'loja.sqlite'
+    quebrado.parent.mkdir()
+    quebrado.write_bytes(b'nao e sqlite')
+
+    assert roda('ruptura', tmp_path, '--fonte', 'sqlite', '--output', tmp_path / 'saida') == 1
+    assert 'Traceback' in capsys.readouterr().err
+
+
+def test_produtos_sem_login(raiz, monkeypatch, capsys):
+    monkeypatch.setattr(cli, 'is_start_json', lambda: False)
+
+    assert roda('produtos', raiz, '--fonte', 'sqlite') == 1
+    assert 'start.json' in capsys.readouterr().err
+
+
+def test_excluir(raiz, tmp_path):
+    saida = tmp_path / 'saida'
+
+    assert roda('ruptura', raiz, '--fonte', 'sqlite', '--excluir', 'LOJA_102', '--output', saida) == 0
+
+    df = pd.read_parquet(next(saida.glob('Ruptura_*.parquet')))
+    assert df['page_cd_filial'].tolist() == [101]
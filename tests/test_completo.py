@@ -0,0 +1,101 @@
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import sources
+from cache import CategCache
+from utils import main_completo, main_produtos, main_ruptura
+
+
+MESTRE = [(produto, 5, 5, 10.0, 3 if produto % 2 else 0, 20.0) for produto in range(1, 5)]
+KARDEX = [
+    (1, datetime(2026, 8, 3), 'SV', 2, 1.0),
+    (2, datetime(2026, 9, 5), 'SV', 4, 1.0),
+]
+
+CATEG = pd.DataFrame({
+    'prme_cd_produto': np.arange(1, 5, dtype='int64'),
+    'nivel1': ['a', 'b', 'c', 'd'],
+})
+
+
+class Sinal:
+    def emit(self, valor) -> None:
+        pass
+
+
+@pytest.fixture
+def raiz(loja, tmp_path) -> list[Path]:
+    bancos = [
+        loja(f'loja_{filial}', mestre=MESTRE, kardex=KARDEX, parametro=[(filial, '18/10/2026 08:00:00')])
+        for filial in (101, 102)
+    ]
+
+    # NOTE: banco com erro fica fora dos dois relatorios
+    quebrado = tmp_path / 'quebrada' / 'loja.sqlite'
+    quebrado.parent.mkdir()
+    quebrado.write_bytes(b'nao e sqlite')
+
+    return bancos + [quebrado]
+
+
+@pytest.fixture
+def categ_cache(tmp_path) -> CategCache:
+    # NOTE: base em memoria e no disco, sem ir ao athena
+    categ_cache = CategCache(tmp_path / 'categ')
+    categ_cache.put(CATEG)
+    return categ_cache
+
+
+@pytest.fixture
+def aberturas(monkeypatch) -> list[Path]:
+    abertos = []
+    open_source = sources.open_source
+
+    def contando(file):
+        abertos.append(Path(file))
+        return open_source(file)
+
+    monkeypatch.setattr(sources, 'open_source', contando)
+    return abertos
+
+
+def ordena(df: pd.DataFrame) -> pd.DataFrame:
+    # NOTE: a Ruptura tem uma linha por loja, o Produtos uma por produto
+    return df.sort_values([col for col in ('page_cd_filial', 'prme_cd_produto') if col in df], ignore_index=True)
+
+
+def test_completo_igual_aos_dois_relatorios(raiz, categ_cache, tmp_path, aberturas):
+    produtos, ruptura = main_completo(raiz, 'parquet', Sinal(), categ_cache=categ_cache, output=tmp_path / 'completo')
+
+    # NOTE: cada banco aberto uma vez para os dois relatorios
+    assert sorted(aberturas) == sorted(raiz)
+
+    separado = tmp_path / 'separado'
+    pd.testing.assert_frame_equal(
+        ordena(produtos),
+        ordena(main_produtos(raiz, 'parquet', Sinal(), categ_cache=categ_cache, output=separado))
+    )
+    pd.testing.assert_frame_equal(ordena(ruptura), ordena(main_ruptura(raiz, 'parquet', Sinal(), output=separado)))
+
+    assert sorted(produtos['page_cd_filial'].unique()) == [101, 102]
+    assert sorted(ruptura['page_cd_filial'].unique()) == [101, 102]
+
+    arquivos = sorted(file.name.split('_')[0] for file in (tmp_path / 'completo').glob('*.parquet'))
+    assert arquivos == ['Produtos', 'Ruptura']
+
+
+def test_completo_stream(raiz, categ_cache, tmp_path):
+    produtos, ruptura = main_completo(raiz, 'parquet', Sinal(), categ_cache=categ_cache, output=tmp_path, stream=True)
+
+    assert (produtos, ruptura) == (None, None)
+
+    saida = {file.name.split('_')[0]: pd.read_parquet(file) for file in tmp_path.glob('*.parquet')}
+    em_memoria = main_completo(raiz, 'parquet', Sinal(), categ_cache=categ_cache, output=tmp_path / 'memoria')
+
+    for nome, df in zip(['Produtos', 'Ruptura'], em_memoria):
+        assert len(saida[nome]) == len(df)
+        assert sorted(saida[nome]['page_cd_filial'].unique()) == [101, 102]
@@ -0,0 +1,95 @@
+from concurrent.futures import Future
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import consolida_produtos, consolida_produtos_duckdb, stream_produtos, transform_produto
+
+
+MESTRE = [(produto, 5, 5, 10.0, 3, 20.0) for produto in range(1, 4)]
+KARDEX = [
+    (1, datetime(2026, 8, 3), 'SV', 2, 1.0),
+    (1, datetime(2026, 9, 3), 'SV', 3, 1.0),
+    (2, datetime(2026, 9, 5), 'SV', 4, 1.0),
+]
+DUAS_FILIAIS = [(101, '18/10/2026 08:00:00'), (102, '18/10/2026 08:00:00')]
+
+CATEG = pd.DataFrame({
+    'prme_cd_produto': np.arange(1, 4, dtype='int64'),
+    'nivel1': ['a', 'b', 'c'],
+})
+
+
+def categ_pronta() -> Future:
+    futuro = Future()
+    futuro.set_result(CATEG)
+    return futuro
+
+
+def confere_largo(df: pd.DataFrame, linhas_por_produto: int) -> None:
+    assert len(df) == 3 * linhas_por_produto
+    por_produto = df.groupby('prme_cd_produto')[['2026-08-01', '2026-09-01']]
+
+    assert por_produto.size().eq(linhas_por_produto).all()
+    # NOTE: cada linha com a quantidade do kardex, sem somar as repeticoes
+    assert por_produto.max().to_dict('list') == {'2026-08-01': [2, 0, 0], '2026-09-01': [3, 4, 0]}
+    assert por_produto.min().equals(por_produto.max())
+
+
+@pytest.mark.parametrize('mestre, parametro', [
+    (MESTRE, DUAS_FILIAIS),
+    (MESTRE + MESTRE, None),
+], ids=['duas_filiais', 'codigo_repetido'])
+def test_pivot_uma_linha_por_linha_do_mestre(loja, tmp_path, mestre, parametro):
+    tabelas = {'mestre': mestre, 'kardex': KARDEX}
+    if parametro is not None:
+        tabelas['parametro'] = parametro
+
+    df = transform_produto(loja(**tabelas))
+
+    confere_largo(consolida_produtos([df], CATEG), 2)
+
+    saida = str(tmp_path / 'duckdb.parquet')
+    consolida_produtos_duckdb([df.copy()], CATEG, saida, 'parquet')
+    confere_largo(pd.read_parquet(saida), 2)
+
+    saida = str(tmp_path / 'stream.parquet')
+    stream, pivota = stream_produtos(saida, 'parquet', categ_pronta())
+    with stream:
+        stream.add(0, pivota(df))
+        stream.close()
+    confere_largo(pd.read_parquet(saida), 2)
+
+
+def test_longo_sem_coluna_interna(loja):
+    df = transform_produto(loja(mestre=MESTRE, kardex=KARDEX, parametro=DUAS_FILIAIS))
+    longo = consolida_produtos([df], CATEG, 'longo')
+
+    assert len(longo) == 2 * 4
+    assert not any(col.startswith('_') for col in longo.columns)
+
+
+def test_stream_com_meses_na_mesma_ordem(loja, tmp_path):
+    # NOTE: a segunda loja tem meses antes e depois dos da primeira
+    kardex = [(1, datetime(2026, 2, 3), 'SV', 1, 1.0), (2, datetime(2026, 10, 3), 'SV', 1, 1.0)]
+    dfs = [
+        transform_produto(loja('a', mestre=MESTRE, kardex=KARDEX)),
+        transform_produto(loja('b', mestre=MESTRE, kardex=kardex)),
+    ]
+
+    saida = str(tmp_path / 'stream.parquet')
+    stream, pivota = stream_produtos(saida, 'parquet', categ_pronta())
+    with stream:
+        for pos, df in enumerate(dfs):
+            stream.add(pos, pivota(df))
+        stream.close()
+
+    memoria = consolida_produtos(dfs, CATEG)
+    streaming = pd.read_parquet(saida)
+    meses = [col for col in memoria.columns if '-' in col]
+
+    assert meses == sorted(meses)
+    assert streaming.columns.tolist() == memoria.columns.tolist()
+    assert memoria.columns[-2:].tolist() == ['vendas', 'nivel1']
@@ -0,0 +1,115 @@
+import os
+from pathlib import Path
+
+import pytest
+
+import discovery
+from discovery import Manifesto, lista_bancos
+
+
+BANCOS = [
+    'loja_101/loja_101.accdb',
+    'loja_102/dados/loja_102.ACCDB',
+    'loja_103/loja_103.accdb',
+    'loja_103/backup/loja_103.accdb',
+    'loja_103/loja_103_backup.accdb',
+    'Arquivo_2020/loja_099.accdb',
+]
+
+
+@pytest.fixture
+def raiz(tmp_path) -> Path:
+    raiz = tmp_path / 'lojas'
+
+    for relativo in BANCOS + ['loja_101/leiame.txt']:
+        file = raiz / relativo
+        file.parent.mkdir(parents=True, exist_ok=True)
+        file.write_bytes(b'x')
+
+    return raiz
+
+
+@pytest.fixture
+def listagens(monkeypatch) -> list[Path]:
+    """diretorios listados de novo (sem reaproveitar o manifesto)"""
+    listados = []
+    lista_diretorio = discovery.lista_diretorio
+
+    def contando(caminho: Path) -> dict[str, list]:
+        listados.append(caminho)
+        return lista_diretorio(caminho)
+
+    monkeypatch.setattr(discovery, 'lista_diretorio', contando)
+    return listados
+
+
+def relativos(raiz: Path, caminhos: list[Path]) -> list[str]:
+    return [file.relative_to(raiz).as_posix() for file in caminhos]
+
+
+def test_excluir_pastas_e_arquivos(raiz):
+    assert relativos(raiz, lista_bancos(raiz)) == sorted(BANCOS)
+
+    # NOTE: sem diferenciar maiusculas, no nome ou no caminho relativo
+    encontrados = lista_bancos(raiz, excluir=('ARQUIVO*', '*backup*'))
+
+    assert relativos(raiz, encontrados) == [
+        'loja_101/loja_101.accdb',
+        'loja_102/dados/loja_102.ACCDB',
+        'loja_103/loja_103.accdb',
+    ]
+    assert relativos(raiz, lista_bancos(raiz, excluir=('loja_103/*',))) == [
+        'Arquivo_2020/loja_099.accdb',
+        'loja_101/loja_101.accdb',
+        'loja_102/dados/loja_102.ACCDB',
+    ]
+
+
+def test_manifesto_reaproveita_diretorios_sem_mudanca(raiz, tmp_path, listagens):
+    cache = tmp_path / 'cache'
+    primeira = lista_bancos(raiz, pasta_manifesto=cache)
+    total = len(listagens)
+
+    assert total == 7
+    assert lista_bancos(raiz, pasta_manifesto=cache) == primeira
+    assert len(listagens) == total
+
+
+def test_manifesto_lista_de_novo_o_diretorio_alterado(raiz, tmp_path, listagens):
+    cache = tmp_path / 'cache'
+    lista_bancos(raiz, pasta_manifesto=cache)
+    listagens.clear()
+
+    novo = raiz / 'loja_101' / 'loja_101_novo.accdb'
+    novo.write_bytes(b'x')
+    # NOTE: garante o mtime diferente do diretorio em sistemas de arquivos com pouca resolucao
+    mtime = novo.parent.stat().st_mtime_ns + 10 ** 9
+    os.utime(novo.parent, ns=(mtime, mtime))
+
+    encontrados = lista_bancos(raiz, pasta_manifesto=cache)
+
+    assert listagens == [raiz / 'loja_101']
+    assert novo in encontrados
+
+
+def test_manifesto_de_outra_versao_e_ignorado(raiz, tmp_path, listagens, monkeypatch):
+    cache = tmp_path / 'cache'
+    lista_bancos(raiz, pasta_manifesto=cache)
+    listagens.clear()
+
+    monkeypatch.setattr(Manifesto, 'VERSAO', Manifesto.VERSAO + 1)
+
+    assert relativos(raiz, lista_bancos(raiz, pasta_manifesto=cache)) == sorted(BANCOS)
+    assert len(listagens) == 7
+
+
+def test_busca_cancelada_nao_grava_o_manifesto(raiz, tmp_path):
+    from cancel import CancelToken, Cancelado
+
+    cancel = CancelToken()
+    cancel.cancel()
+
+    with pytest.raises(Cancelado):
+        lista_bancos(raiz, pasta_manifesto=tmp_path / 'cache', cancel=cancel)
+
+    assert not (tmp_path / 'cache').exists()
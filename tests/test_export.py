@@ -0,0 +1,58 @@
+from openpyxl import load_workbook
+import pandas as pd
+import pytest
+
+import export
+from export import ExcelWriter, to_excel
+
+
+def abas(file) -> dict[str, list[tuple]]:
+    wb = load_workbook(file)
+    return {ws.title: list(ws.iter_rows(values_only=True)) for ws in wb.worksheets}
+
+
+@pytest.fixture
+def limite(monkeypatch):
+    # NOTE: cabecalho + 3 linhas por aba
+    monkeypatch.setattr(export, 'EXCEL_MAX_LINHAS', 4)
+
+
+@pytest.mark.parametrize('linhas, esperado', [
+    (3, [3]),
+    (6, [3, 3]),
+    (10, [3, 3, 3, 1]),
+])
+def test_excel_nova_aba_no_limite(tmp_path, limite, linhas, esperado):
+    df = pd.DataFrame({'produto': range(linhas), 'nome': [f'p{i}' for i in range(linhas)]})
+    file = tmp_path / 'saida.xlsx'
+
+    to_excel(df, file)
+    saida = abas(file)
+
+    assert list(saida) == [f'Sheet{n}' for n in range(1, len(esperado) + 1)]
+    assert all(linhas[0] == ('produto', 'nome') for linhas in saida.values())
+    assert [len(linhas) - 1 for linhas in saida.values()] == esperado
+    assert [linha[0] for linhas in saida.values() for linha in linhas[1:]] == list(range(len(df)))
+
+
+def test_excel_limite_entre_lojas(tmp_path, limite):
+    # NOTE: a aba vira no meio do segundo dataframe, nos blocos menores
+    file = tmp_path / 'saida.xlsx'
+
+    with ExcelWriter(file, bloco=2) as writer:
+        writer.write(pd.DataFrame({'produto': [1, 2], 'nulo': [None, 1.5]}))
+        writer.write(pd.DataFrame({'produto': [3, 4, 5], 'nulo': [None, None, 2.0]}))
+
+    assert abas(file) == {
+        'Sheet1': [('produto', 'nulo'), (1, None), (2, 1.5), (3, None)],
+        'Sheet2': [('produto', 'nulo'), (4, None), (5, 2)],
+    }
+
+
+def test_excel_vazio(tmp_path):
+    file = tmp_path / 'saida.xlsx'
+
+    with ExcelWriter(file):
+        pass
+
+    assert abas(file) == {'Sheet1': []}
@@ -0,0 +1,53 @@
+from datetime import date, datetime
+
+import pandas as pd
+
+from history import consulta_historico, grava_historico
+
+
+def ruptura(dia: int, filiais: dict[int, int], ruptura: int = 1) -> pd.DataFrame:
+    """filial -> quantidade de produtos, todos na data 2026-10-<dia>"""
+    linhas = [
+        (filial, produto, datetime(2026, 10, dia, 8), ruptura)
+        for filial, produtos in filiais.items()
+        for produto in range(produtos)
+    ]
+    return pd.DataFrame(linhas, columns=['page_cd_filial', 'prme_cd_produto', 'page_dh_inclusao', 'ruptura'])
+
+
+def test_rodar_de_novo_substitui_a_particao(tmp_path):
+    assert grava_historico(ruptura(1, {101: 3, 102: 2}), tmp_path) == 2
+
+    # NOTE: a 101 roda de novo no mesmo dia com outro resultado
+    assert grava_historico(ruptura(1, {101: 2}, ruptura=0), tmp_path) == 1
+
+    particao = tmp_path / 'data=2026-10-01' / 'page_cd_filial=101'
+    assert [file.name for file in particao.iterdir()] == ['part-0.parquet']
+
+    df = consulta_historico(tmp_path)
+
+    assert df.groupby('page_cd_filial')['ruptura'].agg(['size', 'sum']).to_dict('index') == {
+        101: {'size': 2, 'sum': 0},
+        102: {'size': 2, 'sum': 2},
+    }
+
+
+def test_consulta_so_as_particoes_do_filtro(tmp_path):
+    for dia in (1, 2, 3):
+        grava_historico(ruptura(dia, {101: 1, 102: 2, 103: 3}), tmp_path)
+
+    df = consulta_historico(
+        tmp_path,
+        colunas=['data', 'page_cd_filial', 'prme_cd_produto'],
+        inicio=date(2026, 10, 2),
+        fim=date(2026, 10, 3),
+        filiais=[101, 103]
+    )
+
+    assert list(df.columns) == ['data', 'page_cd_filial', 'prme_cd_produto']
+    assert df[['data', 'page_cd_filial']].drop_duplicates().values.tolist() == [
+        [date(2026, 10, 2), 101], [date(2026, 10, 2), 103],
+        [date(2026, 10, 3), 101], [date(2026, 10, 3), 103],
+    ]
+    assert len(df) == 8
+    assert len(consulta_historico(tmp_path)) == 18
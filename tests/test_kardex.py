@@ -0,0 +1,76 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from cache import KardexCache
+from sources import SourceSession
+from utils import kardex_mensal
+
+
+MESTRE = [(produto, 5, 5, 10.0, 3, 20.0) for produto in range(1, 4)]
+
+KARDEX = [
+    (1, datetime(2026, 4, 2), 'SV', 2, 1.0),
+    (2, datetime(2026, 5, 9), 'SV', 1, 2.0),
+    (1, datetime(2026, 6, 1), 'SV', 3, 1.0),
+    (3, datetime(2026, 7, 20), 'SV', 4, 1.5),
+    (2, datetime(2026, 7, 28), 'EN', 9, 2.0),
+]
+NOVOS = [
+    (1, datetime(2026, 8, 5), 'SV', 1, 1.0),
+    (3, datetime(2026, 9, 10), 'SV', 2, 1.5),
+]
+
+
+def mensal(file, kardex_cache=None) -> pd.DataFrame:
+    with SourceSession(file) as sessao:
+        return kardex_mensal(sessao, kardex_cache)
+
+
+def confere(file, kardex_cache) -> None:
+    pd.testing.assert_frame_equal(mensal(file, kardex_cache), mensal(file))
+
+
+@pytest.fixture
+def kardex_cache(tmp_path):
+    return KardexCache(tmp_path / 'kardex')
+
+
+def test_sem_mudanca(loja, kardex_cache):
+    file = loja(mestre=MESTRE, kardex=KARDEX + NOVOS)
+
+    confere(file, kardex_cache)
+    _, marca = kardex_cache.get(101, kardex_cache.origem(file))
+    confere(file, kardex_cache)
+
+    assert kardex_cache.get(101, kardex_cache.origem(file))[1] == marca == pd.Timestamp(2026, 9, 10)
+
+
+def test_novos_movimentos_no_mes_da_marca(loja, kardex_cache):
+    file = loja(mestre=MESTRE, kardex=KARDEX + NOVOS)
+    confere(file, kardex_cache)
+
+    # NOTE: mesmo mes da marca, antes e depois dela
+    mais = [(2, datetime(2026, 9, 2), 'SV', 5, 2.0), (1, datetime(2026, 9, 25), 'SV', 1, 1.0)]
+    file = loja(mestre=MESTRE, kardex=KARDEX + NOVOS + mais)
+    confere(file, kardex_cache)
+
+    assert kardex_cache.get(101, kardex_cache.origem(file))[1] == pd.Timestamp(2026, 9, 25)
+
+
+@pytest.mark.parametrize('mesmo_caminho', [True, False])
+def test_banco_mais_antigo(loja, kardex_cache, mesmo_caminho):
+    novo = loja('novo', mestre=MESTRE, kardex=KARDEX + NOVOS)
+    confere(novo, kardex_cache)
+
+    # NOTE: copia da loja com o kardex cortado antes de 2026-08
+    antigo = loja('novo' if mesmo_caminho else 'antigo', mestre=MESTRE, kardex=KARDEX)
+    saida = mensal(antigo, kardex_cache)
+
+    assert saida['kafi_dt_mov'].max() == pd.Timestamp(2026, 7, 1)
+    pd.testing.assert_frame_equal(saida, mensal(antigo))
+
+    # NOTE: o historico regravado pelo banco antigo nao afeta o novo
+    if not mesmo_caminho:
+        confere(novo, kardex_cache)
@@ -0,0 +1,68 @@
+from datetime import datetime
+
+import pandas as pd
+
+from utils import transform_produto, transform_ruptura, get_table, prepara_produtos
+
+
+MESTRE = [(produto, 5, 5, 10.0, 3, 20.0) for produto in range(1, 9)]
+
+
+def test_loja_sem_venda_no_kardex(loja):
+    # NOTE: o filtro KAFI_TP_MOV = 'SV' no banco nao retorna linhas
+    file = loja(mestre=MESTRE, kardex=[(1, datetime(2026, 9, 3), 'EN', 2, 1.0)])
+
+    df = transform_produto(file)
+
+    assert len(df) == 8
+    assert df['kafi_qt_saldo'].eq(0).all()
+    assert df['kafi_dt_mov'].isna().all()
+
+
+def test_loja_sem_subestoque(loja):
+    # NOTE: o filtro QTDE_SUBESTOQUE > 0 no banco nao retorna linhas
+    mestre = [(produto, 5, 0, 10.0, 3, 20.0) for produto in range(1, 4)]
+    file = loja(mestre=mestre, kardex=[(1, datetime(2026, 9, 3), 'SV', 2, 1.0)])
+
+    assert transform_produto(file).empty
+    assert transform_ruptura(file)['qtd_sku_estq_init'].tolist() == [3]
+
+
+def test_leitura_vazia_mantem_colunas(loja):
+    file = loja(mestre=MESTRE, kardex=[])
+
+    df = get_table(file, 'KARDEX_FILIAL', columns=['KAFI_CD_PRODUTO', 'KAFI_DT_MOV', 'KAFI_QT_SALDO'])
+
+    assert df.empty
+    assert df.columns.tolist() == ['kafi_cd_produto', 'kafi_dt_mov', 'kafi_qt_saldo']
+
+
+def test_quantidade_fracionada_mantem_float(loja):
+    # NOTE: KAFI_QT_SALDO e int32 no schema, o 1.5 chega no terceiro lote
+    kardex = [
+        (1, datetime(2026, 9, 3), 'SV', 2, 1.0),
+        (2, datetime(2026, 9, 4), 'SV', 3, 1.0),
+        (1, datetime(2026, 9, 5), 'SV', 1.5, 1.0),
+    ]
+    file = loja(mestre=MESTRE, kardex=kardex)
+
+    df = get_table(file, 'KARDEX_FILIAL', columns=['KAFI_CD_PRODUTO', 'KAFI_QT_SALDO'], batch_size=1)
+
+    assert df['kafi_qt_saldo'].dtype.kind == 'f'
+    assert df['kafi_qt_saldo'].tolist() == [2, 3, 1.5]
+    assert df['kafi_cd_produto'].dtype == 'int32'
+
+    produto = transform_produto(file)
+    assert produto.loc[produto['prme_cd_produto'].eq(1), 'valor'].tolist() == [3.5]
+
+
+def test_codigo_texto_com_tipo():
+    # NOTE: codigo lido como texto (object) com o tipo final informado
+    df = pd.DataFrame({'prme_cd_produto': pd.Series(['1', '2'], dtype=object), '2026-09': [1.0, None]})
+    categ = pd.DataFrame({'prme_cd_produto': pd.Series([1, 2], dtype='int64'), 'nivel1': ['A', 'B']})
+
+    saida = prepara_produtos(df, categ)
+
+    assert saida['prme_cd_produto'].dtype == 'int64'
+    assert saida['2026-09'].tolist() == [1, 0]
+    assert saida['nivel1'].tolist() == ['A', 'B']
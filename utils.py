@@ -1,15 +1,29 @@
-import pyodbc
-from pyodbc import Cursor
 from pathlib import Path
 import pandas as pd
-from contextlib import contextmanager
-from typing import Generator, Any
+import numpy as np
+import pyarrow as pa
+from typing import Any, Callable, Generator
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
 from unicodedata import combining, normalize
-from athena_mvsh import CursorPython, Athena
-import os
+from pandas.api.types import is_bool_dtype, is_integer_dtype, is_numeric_dtype, is_object_dtype
+from functools import lru_cache, partial
 from datetime import datetime
+from multiprocessing import SimpleQueue
 import logging
-
+import os
+import signal
+import threading
+import time
+from cache import RunCache, CachedTransform, CategCache, KardexCache, QueryCache
+from config import CACHE_DIR
+from export import STREAMS, StreamExport, to_excel
+from sources import BATCH_SIZE, SourceSession, sessao_de
+from schema import frame_schema, tipos_fetch
+from metrics import Metricas, Etapa, coleta_fetch, registro
+from cancel import CancelToken
+
+# NOTE: pyodbc, athena_mvsh (boto3) e duckdb sao importados apenas
+# quando usados, ver sources, categ_athena e consolida_produtos_duckdb
 
 FILE_LOGS = logging.FileHandler(
     'logs.txt',
@@ -24,48 +38,77 @@ logging.basicConfig(
     datefmt='%d/%m/%Y %H:%M:%S'
 )
 
-driver_str = (
-    'DRIVER={{Microsoft Access Driver (*.mdb, *.accdb)}};'
-    'DBQ={};'
-)
-
-
-@contextmanager
-def do_connect(driver: str) -> Generator[Cursor, Any, None]:
-    con = pyodbc.connect(driver)
-    cursor = con.cursor()
+# NOTE: incrementar ao alterar transform_produto / transform_ruptura
+# ou os tipos da saida (schema, cast_sem_perda, otimiza_tipos), invalida o
+# RunCache dos resultados por banco
+PIPELINE_VERSION = 6
 
-    try:
-        yield cursor
-    except Exception:
-        raise
-    finally:
-        cursor.close()
-        con.close()
 
+def executa_athena(
+    stmt: str,
+    cursor_factory: Callable[..., Any] | None = None,
+    athena_factory: Callable[..., Any] | None = None,
+    **kwargs
+) -> pa.Table:
+    """executa a consulta no athena e retorna o resultado em arrow
 
-def date_criate(file: str) -> bool:
-    if not os.path.isfile(file):
-        return True
-
-    metadados = os.stat(file)
-    st_ctime = metadados.st_ctime
-
-    dt_criacao = datetime.fromtimestamp(st_ctime).date()
-    now = datetime.now().date()
+    cursor_factory -> no lugar do CursorPython (ex: cursor de teste),
+    recebe o s3_staging_dir e os demais parametros da conexao
+    athena_factory -> no lugar do cliente Athena, recebe cursor=
 
-    return now > dt_criacao
+    NOTE: o athena_mvsh so e importado para o que nao foi informado,
+    com os dois os testes rodam sem boto3
+    """
+    if cursor_factory is None:
+        from athena_mvsh import CursorPython as cursor_factory
 
+    if athena_factory is None:
+        from athena_mvsh import Athena as athena_factory
 
-def categ_athena(**kwargs) -> pd.DataFrame:
+    kwargs = dict(kwargs)
     s3_location = kwargs.pop('s3_staging_dir')
 
-    cursor = CursorPython(
+    cursor = cursor_factory(
         s3_location,
         result_reuse_enable=True,
         **kwargs
     )
-    
+
+    with athena_factory(cursor=cursor) as cliente:
+        cliente.execute(stmt)
+
+        # NOTE: arrow direto do cliente, o pandas fica para quem consome (uma conversao)
+        return cliente.to_arrow()
+
+
+def consulta_athena(
+    stmt: str,
+    query_cache: QueryCache | None = None,
+    cursor_factory: Callable[..., Any] | None = None,
+    athena_factory: Callable[..., Any] | None = None,
+    **kwargs
+) -> pa.Table:
+    """consulta no athena, com o query_cache o resultado vem do disco
+    (arrow ipc com memory map) enquanto estiver no ttl
+
+    NOTE: o result_reuse_enable do athena ainda paga a rede e o download
+    a cada chamada, o query_cache evita os dois
+    """
+    executa = partial(executa_athena, stmt, cursor_factory, athena_factory, **kwargs)
+
+    if query_cache is None:
+        return executa()
+
+    tabela, _ = query_cache.consulta(stmt, executa, **kwargs)
+    return tabela
+
+
+def categ_athena(
+    query_cache: QueryCache | None = None,
+    cursor_factory: Callable[..., Any] | None = None,
+    athena_factory: Callable[..., Any] | None = None,
+    **kwargs
+) -> pd.DataFrame:
     stmt = """
         SELECT 
             pm.prme_cd_produto,
@@ -85,15 +128,21 @@ def categ_athena(**kwargs) -> pd.DataFrame:
         ON substring(pm.capn_cd_categoria, 1, 12) || '.00.00.00.00' = n4.capn_cd_categoria
     """
 
-    with Athena(cursor=cursor) as cliente:
-        cliente.execute(stmt)
+    return (
+        consulta_athena(stmt, query_cache, cursor_factory, athena_factory, **kwargs)
+        .to_pandas()
+        .pipe(rename_columns)
+        .pipe(drop_columns_na)
+        .pipe(converter_numeric_txt)
+    )
 
-        return (
-            cliente.to_pandas()
-            .pipe(rename_columns)
-            .pipe(drop_columns_na)
-            .pipe(converter_numeric_txt)
-        )
+
+@lru_cache(maxsize=2 ** 16)
+def _remove_accent(txt: str) -> str:
+    nfd = normalize('NFD', txt)
+    comb = ''.join(c for c in nfd if not combining(c))
+
+    return normalize('NFC', comb)
 
 
 def remove_accent(txt: str | None) -> str:
@@ -104,10 +153,42 @@ def remove_accent(txt: str | None) -> str:
     if pd.isna(txt):
         return txt
     
-    nfd = normalize('NFD', txt)
-    comb = ''.join(c for c in nfd if not combining(c))
+    return _remove_accent(txt)
 
-    return normalize('NFC', comb)
+
+def normaliza_texto(serie: pd.Series, como: str = 'category') -> pd.Series:
+    """remove acentos apenas dos valores unicos da serie
+    como -> 'category' retorna categorica, 'arrow' retorna dicionario do arrow
+    (pd.ArrowDtype(pa.dictionary(int32, string)))
+    colunas com valores que nao sao texto ficam como estao
+    """
+    codes, uniques = pd.factorize(serie)
+
+    if not all(isinstance(v, str) for v in uniques):
+        return serie
+
+    # NOTE: valores distintos podem ficar iguais sem acento, ex: Acao e Ação
+    limpos, categorias = pd.factorize(np.array([_remove_accent(v) for v in uniques], dtype=object))
+
+    if len(limpos):
+        codes = np.where(codes >= 0, limpos[codes], -1)
+
+    if como == 'arrow':
+        arr = pa.DictionaryArray.from_arrays(
+            pa.array(codes, mask=codes == -1, type=pa.int32()),
+            pa.array(categorias, type=pa.string())
+        )
+        return pd.Series(
+            pd.arrays.ArrowExtensionArray(arr),
+            index=serie.index,
+            name=serie.name
+        )
+
+    return pd.Series(
+        pd.Categorical.from_codes(codes, categories=categorias),
+        index=serie.index,
+        name=serie.name
+    )
 
 
 def rename_columns(df: pd.DataFrame) -> pd.DataFrame:
@@ -123,61 +204,139 @@ def rename_columns(df: pd.DataFrame) -> pd.DataFrame:
     return df.rename(rename, axis=1)
 
 
-def converter_numeric_txt(df: pd.DataFrame) -> pd.DataFrame:
-    numeros = ['number']
-    inteiros = ['integer']
-    ponto_flutuante = ['float']
-    texto = ['object']
+def otimiza_coluna(serie: pd.Series, tipo: str | None = None, downcast: bool = True) -> pd.Series:
+    """nulos numericos -> 0 e menor tipo numerico (pd.to_numeric downcast),
+    texto -> categoria sem acento, tipo -> tipo final sem downcast
+    a serie volta sem copia quando nao muda
+    """
+    if is_object_dtype(serie.dtype):
+        if tipo is not None:
+            return serie.astype(tipo)
 
-    return (
-        df
-        .pipe(lambda _df: _df.assign(**{c:_df[c].fillna(0) for c in _df.select_dtypes(numeros)}))
-        .pipe(lambda _df: _df.assign(**{c:pd.to_numeric(_df[c], downcast='integer') for c in _df.select_dtypes(inteiros)}))
-        .pipe(lambda _df: _df.assign(**{c:pd.to_numeric(_df[c], downcast='float') for c in _df.select_dtypes(ponto_flutuante)}))
-        .pipe(lambda _df: _df.assign(**{c:_df[c].map(remove_accent) for c in _df.select_dtypes(texto)}))
-    )
+        return normaliza_texto(serie) if downcast else serie
+
+    if not is_numeric_dtype(serie.dtype) or is_bool_dtype(serie.dtype):
+        return serie if tipo is None else serie.astype(tipo)
+
+    inteiro = is_integer_dtype(serie.dtype)
+
+    if not isinstance(serie.dtype, np.dtype):
+        # NOTE: tipos do pandas com mascara (Int64, Float64)
+        serie = serie.fillna(0)
+
+        if tipo is not None:
+            return serie.astype(tipo)
+
+        return pd.to_numeric(serie, downcast='integer' if inteiro else 'float') if downcast else serie
+
+    original = valores = serie.to_numpy()
+
+    if not inteiro:
+        nulos = np.isnan(valores)
+
+        if nulos.any():
+            valores = np.where(nulos, 0, valores).astype(valores.dtype, copy=False)
+
+    if tipo is not None:
+        valores = valores.astype(tipo, copy=False)
+    elif downcast:
+        valores = pd.to_numeric(valores, downcast='integer' if inteiro else 'float')
+
+    if valores is original:
+        return serie
+
+    return pd.Series(valores, index=serie.index, name=serie.name, copy=False)
+
+
+def otimiza_tipos(
+    df: pd.DataFrame,
+    tipos: dict[str, str] | None = None,
+    downcast: bool = True,
+    colunas: list[str] | None = None,
+    etapa: Etapa | None = None
+) -> pd.DataFrame:
+    """fillna(0), downcast dos numeros e texto sem acento em uma passada
+    por coluna, o frame e montado uma vez no final, sem uma copia inteira
+    por etapa como no encadeamento de assign
+
+    tipos -> coluna: tipo final (ex: meses do pivot em int32)
+    downcast -> False apenas preenche os nulos e aplica os tipos
+    colunas -> tratadas, as demais seguem como estao
+    etapa -> recebe bytes_antes e bytes_depois nas metricas
+    """
+    tipos = tipos or {}
+    tratar = set(df.columns if colunas is None else colunas)
+
+    if etapa is not None:
+        bytes_antes = tamanho(df)
+
+    dados = {
+        col: otimiza_coluna(serie, tipos.get(col), downcast) if col in tratar else serie
+        for col, serie in df.items()
+    }
+    df = pd.DataFrame(dados, index=df.index)
+
+    if etapa is not None:
+        etapa.extras.update(bytes_antes=bytes_antes, bytes_depois=tamanho(df))
+
+    return df
+
+
+def converter_numeric_txt(df: pd.DataFrame) -> pd.DataFrame:
+    return otimiza_tipos(df)
 
 
 def drop_columns_na(df: pd.DataFrame) -> pd.DataFrame:
+    # NOTE: sem linhas (ex: filtro sem resultado) mantem as colunas projetadas
+    if df.empty and len(df.columns):
+        return df
+
     return (
         df.dropna(axis=1, how='all')
     )
 
 
 def get_table(
-    file: Path | str, 
+    file: Path | str | SourceSession, 
     table_name: str,
     dtype: dict | None = None,
-    parse_dates: list[tuple] | None = None
+    parse_dates: list[tuple] | None = None,
+    batch_size: int = BATCH_SIZE,
+    columns: list[str] | None = None,
+    where: list[tuple] | None = None
 ) -> pd.DataFrame:
-    
-    driver = driver_str.format(file)
-
-    with do_connect(driver) as c:
-        rst = c.execute(f"""select * from {table_name}""")
-        cols = [col[0] for col in rst.description]
-        data = [dict(zip(cols, row)) for row in rst.fetchall()]
-
-        df = pd.DataFrame(data)
-        
-        if dtype:
-            df = df.astype(dtype)
-
-        if parse_dates:
-            df = df.assign(
-                **{
-                    col: lambda _df, c=col,d=days: pd.to_datetime(_df[c], dayfirst=d) 
-                    for col, days in parse_dates
-                }
-            )
+    """file -> caminho do banco ou uma SourceSession ja aberta,
+    com a sessao a tabela pode vir da memoria sem nova ida ao banco
+
+    colunas do schema (schema.SCHEMAS) saem do fetch com o nome e tipo
+    finais, dtype, parse_dates e o converter_numeric_txt valem apenas
+    para as colunas fora dele
+    """
+    with sessao_de(file) as sessao:
+        tabela = sessao.read(table_name, columns, where, batch_size, tipos_fetch(table_name))
+
+    df, tratadas = frame_schema(tabela, table_name, normaliza_texto)
+
+    if dtype:
+        df = df.astype({col: tipo for col, tipo in dtype.items() if col in df})
 
-        return(
-            df
-            .pipe(rename_columns)
-            .pipe(drop_columns_na)
-            .pipe(converter_numeric_txt)
+    if parse_dates:
+        df = df.assign(
+            **{
+                col: lambda _df, c=col,d=days: pd.to_datetime(_df[c], dayfirst=d) 
+                for col, days in parse_dates
+                if col in df
+            }
         )
 
+    df = df.pipe(rename_columns).pipe(drop_columns_na)
+    outras = [col for col in df.columns if col not in tratadas]
+
+    if not outras:
+        return df
+
+    return otimiza_tipos(df, colunas=outras)
+
 
 def conds_sub_estoque(df: pd.DataFrame) -> pd.Series:
     """condicoes para o subestoque
@@ -192,42 +351,158 @@ def conds_sub_estoque(df: pd.DataFrame) -> pd.Series:
     )
 
 
-def transform_produto(file_path: Path | str) -> pd.DataFrame:
-    # NOTE: Retorna tabela do kardex
-    kardex = (
-        get_table(file_path, "KARDEX_FILIAL") 
-        .loc[lambda _df: _df['kafi_tp_mov'].eq('SV'), :]
+# TODO: Colunas lidas de cada tabela pelos transforms
+COLUNAS_KARDEX = ['KAFI_CD_PRODUTO', 'KAFI_DT_MOV', 'KAFI_QT_SALDO', 'KAFI_VL_CMPG']
+COLUNAS_MESTRE_PRODUTO = ['PRME_CD_PRODUTO', 'PRME_VL_CONFFINAL', 'QTDE_SUBESTOQUE', 'PRFI_VL_CMPG']
+COLUNAS_MESTRE_RUPTURA = COLUNAS_MESTRE_PRODUTO + ['PRFI_QT_ESTOQATUAL']
+COLUNAS_PARAMETRO = ['PAGE_CD_FILIAL', 'PAGE_DH_INCLUSAO']
+
+FILTRO_KARDEX = [('KAFI_TP_MOV', '=', 'SV')]
+FILTRO_MESTRE_PRODUTO = [('QTDE_SUBESTOQUE', '>', 0)]
+
+# NOTE: (tabela, colunas, filtro) de cada transform, planejadas na
+# SourceSession para uma unica leitura por tabela
+LEITURAS_PRODUTO = [
+    ('KARDEX_FILIAL', COLUNAS_KARDEX, FILTRO_KARDEX),
+    ('PRODUTO_MESTRE', COLUNAS_MESTRE_PRODUTO, FILTRO_MESTRE_PRODUTO),
+    ('PARAMETRO_GERAL', COLUNAS_PARAMETRO, None),
+]
+LEITURAS_RUPTURA = [
+    ('PRODUTO_MESTRE', COLUNAS_MESTRE_RUPTURA, None),
+    ('PARAMETRO_GERAL', COLUNAS_PARAMETRO, None),
+]
+
+
+def leituras_produto(kardex_cache: KardexCache | None = None) -> list[tuple]:
+    # NOTE: com o kardex incremental o filtro da marca d'agua so e
+    # conhecido na leitura, o KARDEX_FILIAL fica fora do plano
+    return LEITURAS_PRODUTO[1:] if kardex_cache is not None else LEITURAS_PRODUTO
+
+
+def transform_produto(
+    file_path: Path | str | SourceSession,
+    kardex_cache: KardexCache | None = None
+) -> pd.DataFrame:
+    """formato longo: uma linha por produto e mes do kardex,
+    produtos sem venda ficam com kafi_dt_mov vazio,
+    o pivot dos meses fica para a consolidacao (pivota_kardex)
+
+    kardex_cache -> le do banco apenas os movimentos novos (kardex_mensal)
+    """
+    with sessao_de(file_path, leituras_produto(kardex_cache)) as sessao:
+        return _transform_produto(sessao, kardex_cache)
+
+
+class TransformProduto:
+    """transform_produto com o kardex incremental"""
+
+    def __init__(self, kardex_cache: KardexCache) -> None:
+        self.kardex_cache = kardex_cache
+        # NOTE: mesma chave do RunCache do transform_produto, o resultado e o mesmo
+        self.__name__ = transform_produto.__name__
+
+    def __call__(self, file: Path) -> pd.DataFrame:
+        return transform_produto(file, self.kardex_cache)
+
+
+def kardex_incremental(reconstroi: bool = False) -> KardexCache:
+    """historico mensal do kardex por filial na pasta do cache"""
+    return KardexCache(CACHE_DIR / 'kardex', PIPELINE_VERSION, reconstroi)
+
+
+def agrega_kardex(movimentos: pd.DataFrame) -> pd.DataFrame:
+    """movimentos de venda -> quantidade e valor por produto e mes"""
+    return (
+        movimentos
         .assign(valor = lambda _df: _df['kafi_qt_saldo'].mul(_df['kafi_vl_cmpg']))
         .groupby(['kafi_cd_produto', pd.Grouper(key='kafi_dt_mov', freq='MS')])
         .agg({'kafi_qt_saldo': 'sum', 'valor': 'sum'})
         .reset_index()
-        .sort_values(['kafi_cd_produto', 'kafi_dt_mov'])
-        .assign(vendas = lambda _df: (
-            _df.sort_values(['kafi_cd_produto'])
-               .groupby(['kafi_cd_produto'])
-               ['valor']
-               .transform('sum')
-            )
+    )
+
+
+def filial_banco(sessao: SourceSession) -> int | None:
+    filiais = get_table(sessao, "PARAMETRO_GERAL", columns=COLUNAS_PARAMETRO)['page_cd_filial'].unique()
+
+    return int(filiais[0]) if len(filiais) == 1 else None
+
+
+def kardex_mensal(sessao: SourceSession, kardex_cache: KardexCache | None = None) -> pd.DataFrame:
+    """agregado mensal do KARDEX_FILIAL do banco
+
+    com o kardex_cache le do banco apenas os movimentos a partir do
+    primeiro dia do mes da marca d'agua, os meses anteriores vem do
+    historico da filial e o mes da marca e refeito inteiro (movimentos
+    do mesmo mes gravados depois da ultima leitura)
+
+    o historico vale apenas para o mesmo banco (KardexCache.origem) e
+    enquanto o banco chega ate a marca: sem movimentos a partir da marca
+    (ex: copia mais antiga da loja) o kardex e lido inteiro e regravado
+
+    NOTE: correcoes em meses anteriores a marca nao sao vistas,
+    KardexCache(reconstroi=True) le o kardex inteiro de novo
+    """
+    filial = None if kardex_cache is None else filial_banco(sessao)
+
+    if filial is None:
+        return agrega_kardex(
+            get_table(sessao, "KARDEX_FILIAL", columns=COLUNAS_KARDEX, where=FILTRO_KARDEX)
         )
-        .assign(kafi_dt_mov = lambda _df: _df['kafi_dt_mov'].dt.strftime('%Y-%m-%d'))
-        .pivot_table(
-            values='kafi_qt_saldo', 
-            index=['kafi_cd_produto', 'vendas'], 
-            columns='kafi_dt_mov', 
-            aggfunc='sum',
-            fill_value=0
+
+    origem = kardex_cache.origem(sessao.file)
+    historico, marca = kardex_cache.get(filial, origem)
+    movimentos = None
+
+    if historico is not None:
+        corte = marca.to_period('M').to_timestamp()
+        movimentos = get_table(
+            sessao, "KARDEX_FILIAL", columns=COLUNAS_KARDEX,
+            where=FILTRO_KARDEX + [('KAFI_DT_MOV', '>=', corte.to_pydatetime())]
         )
-        .reset_index()
-        .loc[:, lambda _df: sorted(_df.columns.to_list(), key=lambda k: 10 if k == 'vendas' else 1)]
+
+        if movimentos.empty or movimentos['kafi_dt_mov'].max() < marca:
+            historico = marca = movimentos = None
+        else:
+            historico = historico.loc[historico['kafi_dt_mov'].lt(corte)]
+
+    if movimentos is None:
+        movimentos = get_table(sessao, "KARDEX_FILIAL", columns=COLUNAS_KARDEX, where=FILTRO_KARDEX)
+
+    if movimentos.empty:
+        return agrega_kardex(movimentos)
+
+    novos = movimentos['kafi_dt_mov'].max()
+    marca = novos if marca is None else max(marca, novos)
+
+    mensal = (
+        pd.concat([historico, agrega_kardex(movimentos)], ignore_index=True)
+        .sort_values(['kafi_cd_produto', 'kafi_dt_mov'], ignore_index=True)
+    )
+    kardex_cache.put(filial, mensal, marca, origem)
+
+    return mensal
+
+
+def _transform_produto(sessao: SourceSession, kardex_cache: KardexCache | None = None) -> pd.DataFrame:
+    # NOTE: Retorna tabela do kardex
+    kardex = (
+        kardex_mensal(sessao, kardex_cache)
+        .assign(vendas = lambda _df: _df.groupby('kafi_cd_produto')['valor'].transform('sum'))
         .rename({'kafi_cd_produto': 'prme_cd_produto'}, axis=1)
     )
 
     mestre = (
-        get_table(file_path, 'PRODUTO_MESTRE', dtype={'PRFI_VL_CMPG': 'float', 'PRFI_VL_PRECOVENDA': 'float'})
-         .join(get_table(file_path, "PARAMETRO_GERAL", parse_dates=[('PAGE_DH_INCLUSAO', True)]), how='cross')
+        get_table(
+            sessao, 
+            'PRODUTO_MESTRE', 
+            columns=COLUNAS_MESTRE_PRODUTO,
+            where=FILTRO_MESTRE_PRODUTO
+        )
+         .join(get_table(sessao, "PARAMETRO_GERAL", columns=COLUNAS_PARAMETRO), how='cross')
          .loc[lambda _df: conds_sub_estoque(_df) , :]
          .assign(valor_total = lambda _df: _df['prfi_vl_cmpg'].mul(_df['prme_vl_conffinal']))
          .loc[:, ['page_dh_inclusao', 'page_cd_filial', 'prfi_vl_cmpg', 'prme_cd_produto', 'prme_vl_conffinal', 'valor_total']]
+         .assign(**{LINHA_BASE: lambda _df: np.arange(len(_df), dtype='int32')})
     )
 
     return (
@@ -236,16 +511,69 @@ def transform_produto(file_path: Path | str) -> pd.DataFrame:
             on=['prme_cd_produto'],
             how='left'
         )
-        .fillna(0)
-        .pipe(lambda _df: _df.assign(**{col: _df[col].astype('int32') for col in _df.columns if '-' in col}))
+        .pipe(otimiza_tipos, {'kafi_qt_saldo': 'int32'}, downcast=False)
+    )
+
+
+# NOTE: colunas do formato longo que viram colunas de mes no pivot
+COLUNAS_LONGO = ['kafi_dt_mov', 'kafi_qt_saldo', 'valor']
+
+# NOTE: linha do mestre (x PARAMETRO_GERAL) de cada linha do formato longo,
+# o mesmo produto pode ter mais de uma (duas filiais no PARAMETRO_GERAL ou
+# codigo repetido), o pivot agrupa por ela e nao pelo prme_cd_produto
+LINHA_BASE = '_linha_base'
+
+
+def pivota_kardex(pre_dfs: list[pd.DataFrame]) -> pd.DataFrame:
+    """formato longo das lojas -> largo, um unico pivot para todas,
+    uma coluna YYYY-MM-DD por mes com a quantidade, na ordem das lojas,
+    uma linha por linha do mestre (LINHA_BASE)
+
+    as quantidades vao direto para uma matriz int32 (produtos x meses)
+    com todos os meses do conjunto, sem concatenar as tabelas longas
+    e sem o NaN dos meses que faltam em cada loja
+    """
+    bases = [
+        df.drop_duplicates(LINHA_BASE).drop(columns=[*COLUNAS_LONGO, LINHA_BASE])
+        for df in pre_dfs
+    ]
+
+    meses = pd.DatetimeIndex(
+        np.unique(np.concatenate([
+            df['kafi_dt_mov'].dropna().unique() for df in pre_dfs
+        ]))
+    )
+    matriz = np.zeros((sum(len(base) for base in bases), len(meses)), dtype='int32')
+
+    inicio = 0
+    for df, base in zip(pre_dfs, bases):
+        tem_mov = df['kafi_dt_mov'].notna().to_numpy()
+
+        linhas = df.groupby(LINHA_BASE, sort=False).ngroup().to_numpy()[tem_mov]
+        colunas = meses.get_indexer(df['kafi_dt_mov'].to_numpy()[tem_mov])
+        np.add.at(matriz, (linhas + inicio, colunas), df['kafi_qt_saldo'].to_numpy()[tem_mov])
+
+        inicio += len(base)
+
+    return pd.concat(
+        [
+            pd.concat(bases, ignore_index=True),
+            pd.DataFrame(matriz, columns=meses.strftime('%Y-%m-%d'))
+        ],
+        axis=1
     )
 
 
-def transform_ruptura(file_path: Path | str) -> pd.DataFrame:
+def transform_ruptura(file_path: Path | str | SourceSession) -> pd.DataFrame:
+    with sessao_de(file_path, LEITURAS_RUPTURA) as sessao:
+        return _transform_ruptura(sessao)
+
+
+def _transform_ruptura(sessao: SourceSession) -> pd.DataFrame:
 
     mestre = (
-        get_table(file_path, 'PRODUTO_MESTRE', dtype={'PRFI_VL_CMPG': 'float', 'PRFI_VL_PRECOVENDA': 'float'})
-        .join(get_table(file_path, "PARAMETRO_GERAL", parse_dates=[('PAGE_DH_INCLUSAO', True)]), how='cross')
+        get_table(sessao, 'PRODUTO_MESTRE', columns=COLUNAS_MESTRE_RUPTURA)
+        .join(get_table(sessao, "PARAMETRO_GERAL", columns=COLUNAS_PARAMETRO), how='cross')
         .assign(
             qtd_sku_estq_init = lambda df: df['prfi_qt_estoqatual'].where(df['prfi_qt_estoqatual'].gt(0)),
             valor_estq_init   = lambda df: df['prfi_qt_estoqatual'].mul(df['prfi_vl_cmpg']),
@@ -275,114 +603,911 @@ def transform_ruptura(file_path: Path | str) -> pd.DataFrame:
     return mestre
 
 
-def main_produtos(
-    raiz: list[Path], 
-    export: str,
-    progress_callback,
-    **kwargs
+def exporta(dfs: pd.DataFrame, nome_saida: str, export: str) -> None:
+    if export == 'xlsx':
+       to_excel(dfs, nome_saida)
+    elif export == 'csv':
+       dfs.to_csv(nome_saida, sep=';', encoding='utf-8', index=False)
+    else:
+        dfs.to_parquet(nome_saida, index=False)
+
+
+def ordem_colunas(colunas: list[str]) -> list[str]:
+    # NOTE: meses (YYYY-MM-DD) em ordem, no streaming os meses que so
+    # aparecem nas lojas seguintes chegam no fim do schema unificado
+    meses = iter(sorted(col for col in colunas if '-' in col))
+    colunas = [next(meses) if '-' in col else col for col in colunas]
+
+    # NOTE: vendas sempre na ultima coluna
+    return sorted(colunas, key=lambda k: 10 if k == 'vendas' else 1)
+
+
+def prepara_produtos(df: pd.DataFrame, categ: pd.DataFrame, etapa: Etapa | None = None) -> pd.DataFrame:
+    # NOTE: meses em int32 e nulos em 0 na mesma passada (otimiza_tipos)
+    tipos = {col: 'int32' for col in df.columns if '-' in col}
+
+    return (
+        otimiza_tipos(df, {**tipos, 'prme_cd_produto': 'int64'}, downcast=False, etapa=etapa)
+        .merge(categ, on=["prme_cd_produto"])
+    )
+
+
+def prepara_longo(df: pd.DataFrame, categ: pd.DataFrame, etapa: Etapa | None = None) -> pd.DataFrame:
+    # NOTE: LINHA_BASE e so do pivot, fica fora da saida
+    df = df.drop(columns=[LINHA_BASE], errors='ignore')
+
+    return (
+        otimiza_tipos(df, {'prme_cd_produto': 'int64'}, downcast=False, etapa=etapa)
+        .merge(categ, on=["prme_cd_produto"])
+    )
+
+
+def consolida_produtos(
+    pre_dfs: list[pd.DataFrame], 
+    categ: pd.DataFrame,
+    layout: str = 'largo',
+    metricas: Metricas | None = None
 ) -> pd.DataFrame:
+    """layout -> 'largo' pivota os meses uma unica vez sobre todas as lojas,
+    'longo' mantem uma linha por produto e mes (para ferramentas de BI)
+
+    metricas -> etapas merge (lojas em uma tabela) e categoria_join
+    """
+    metricas = metricas or Metricas()
+
+    with metricas.etapa('merge') as etapa:
+        if layout == 'longo':
+            base = pd.concat(pre_dfs, ignore_index=True)
+            prepara = prepara_longo
+        else:
+            base = pivota_kardex(pre_dfs)
+            prepara = prepara_produtos
+
+        base = base.loc[:, ordem_colunas(base.columns.to_list())]
+        etapa.conta(len(base), tamanho(base))
+
+    with metricas.etapa('categoria_join') as etapa:
+        dfs = prepara(base, categ, etapa)
+        etapa.conta(len(dfs), tamanho(dfs))
+
+    return dfs
+
 
-    # TODO: Verificar data de criacao do arquivo
+def consolida_produtos_duckdb(
+    pre_dfs: list[pd.DataFrame], 
+    categ: pd.DataFrame,
+    nome_saida: str,
+    export: str,
+    layout: str = 'largo'
+) -> pd.DataFrame | None:
+    """mesma saida do consolida_produtos em um unico plano do duckdb:
+    union das lojas, pivot dos meses, fillna(0), cast int32 dos meses
+    e join com a categoria
 
-    # TODO: Categoria athena -- Se arquivo for do dia anterior criar novamente
-    # se não utilizar o que foi gerado
-    file_categ = 'categ.parquet'
+    parquet e csv sao escritos direto pelo COPY do duckdb e retorna None,
+    xlsx materializa o resultado e usa o to_excel do pandas
 
-    if date_criate(file_categ):
-        progress_callback.emit((1, 'Download Base Categoria'))
-        categ = (
-            categ_athena(**kwargs)
-            .astype({'prme_cd_produto': 'int64'})
+    consome a lista pre_dfs para liberar cada loja ao passar para o arrow
+    """
+    import duckdb
+
+    con = duckdb.connect()
+    colunas: dict[str, pa.DataType] = {}
+    selects = []
+
+    for pos in range(len(pre_dfs)):
+        tbl = pa.Table.from_pandas(pre_dfs.pop(0), preserve_index=False)
+        tbl = (
+            tbl
+            .append_column('_loja', pa.array([pos] * tbl.num_rows, pa.int32()))
+            .append_column('_linha', pa.array(range(tbl.num_rows), pa.int64()))
         )
-        categ.to_parquet(file_categ, index=False)
+
+        for field in tbl.schema:
+            colunas.setdefault(field.name, field.type)
+
+        con.register(f'loja_{pos}', tbl)
+        selects.append(f'select * from loja_{pos}')
+
+    con.register('categ', pa.Table.from_pandas(categ, preserve_index=False))
+    uniao = ' union all by name '.join(selects)
+
+    def coluna(col: str) -> str:
+        if '-' in col:
+            return f'cast(coalesce(l."{col}", 0) as integer) as "{col}"'
+        if col == 'prme_cd_produto':
+            return f'cast(u."{col}" as bigint) as "{col}"'
+
+        tipo = colunas[col]
+        if pa.types.is_integer(tipo) or pa.types.is_floating(tipo):
+            return f'coalesce(u."{col}", 0) as "{col}"'
+
+        return f'u."{col}"'
+
+    internas = ('_loja', '_linha', LINHA_BASE)
+
+    if layout == 'longo':
+        cols = ordem_colunas([c for c in colunas if c not in internas])
+        stmt = f"""
+            with u as ({uniao})
+            select
+                {', '.join(coluna(c) for c in cols)},
+                c.* exclude (prme_cd_produto)
+            from u
+            inner join categ as c
+            on cast(u.prme_cd_produto as bigint) = c.prme_cd_produto
+            order by u._loja, u._linha
+        """
     else:
-        progress_callback.emit((1, 'Load Base Categoria'))
-        categ = pd.read_parquet(file_categ)
+        meses = [
+            mes for mes, in con.sql(f"""
+                select distinct strftime(kafi_dt_mov, '%Y-%m-%d') 
+                from ({uniao}) 
+                where kafi_dt_mov is not null 
+                order by 1
+            """).fetchall()
+        ]
+        somas = ''.join(
+            f', sum(kafi_qt_saldo) filter (where mes = \'{mes}\') as "{mes}"'
+            for mes in meses
+        )
+        base = [c for c in colunas if c not in (*internas, *COLUNAS_LONGO)]
+        cols = ordem_colunas(base + meses)
+
+        stmt = f"""
+            with u as ({uniao}),
+            base as (
+                select * exclude ({', '.join(COLUNAS_LONGO)})
+                from u
+                qualify row_number() over (partition by _loja, {LINHA_BASE} order by _linha) = 1
+            ),
+            mov as (
+                select _loja, {LINHA_BASE}, strftime(kafi_dt_mov, '%Y-%m-%d') as mes, kafi_qt_saldo
+                from u
+                where kafi_dt_mov is not null
+            ),
+            largo as (
+                select _loja, {LINHA_BASE}{somas}
+                from mov
+                group by _loja, {LINHA_BASE}
+            )
+            select
+                {', '.join(coluna(c) for c in cols)},
+                c.* exclude (prme_cd_produto)
+            from base as u
+            left join largo as l
+            on u._loja = l._loja and u.{LINHA_BASE} = l.{LINHA_BASE}
+            inner join categ as c
+            on cast(u.prme_cd_produto as bigint) = c.prme_cd_produto
+            order by u._loja, u._linha
+        """
+
+    try:
+        if export == 'xlsx':
+            dfs = con.sql(stmt).df()
+            exporta(dfs, nome_saida, export)
+            return dfs
+
+        saida = nome_saida.replace("'", "''")
+        formato = "format csv, delimiter ';', header" if export == 'csv' else 'format parquet'
+        con.execute(f"copy ({stmt}) to '{saida}' ({formato})")
+
+    finally:
+        con.close()
 
-    pre_dfs = []
-    for valor, file in enumerate(raiz, 2):
+
+class Progresso:
+    """contador de progresso compartilhado entre threads
+    cada emit avanca uma posicao na barra
+    """
+
+    def __init__(self, progress_callback, inicio: int = 1) -> None:
+        self.progress_callback = progress_callback
+        self.valor = inicio - 1
+        self._lock = threading.Lock()
+
+    def emit(self, texto: str) -> int:
+        with self._lock:
+            self.valor += 1
+            self.progress_callback.emit((self.valor, texto))
+
+            return self.valor
+
+    def info(self, texto: str) -> None:
+        """mensagem sem avancar a barra"""
+        with self._lock:
+            self.progress_callback.emit((self.valor, texto))
+
+
+def tamanho(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=False, deep=True).sum())
+
+
+def tamanho_arquivo(nome_saida: str) -> int | None:
+    return Path(nome_saida).stat().st_size if Path(nome_saida).is_file() else None
+
+
+class TransformMedido:
+    """envolve o transform de um banco e devolve (resultado, registros)
+    com o fetch (leituras da SourceSession) e o restante do transform
+    """
+
+    def __init__(self, transform: Callable[[Path], Any]) -> None:
+        self.transform = transform
+
+    def __call__(self, file: Path) -> tuple[Any, list[dict]]:
+        with coleta_fetch() as fetch, Etapa('transform', str(file)) as etapa:
+            resultado = self.transform(file)
+
+        dfs = resultado if isinstance(resultado, tuple) else (resultado,)
+        etapa.conta(sum(len(df) for df in dfs), sum(tamanho(df) for df in dfs))
+
+        return resultado, [
+            registro('fetch', str(file), fetch['segundos'], fetch['linhas'], fetch['bytes'], etapa.pico),
+            registro(
+                'transform', str(file), etapa.segundos - fetch['segundos'],
+                etapa.linhas, etapa.bytes, etapa.pico
+            ),
+        ]
+
+
+# NOTE: intervalo para conferir cancelamento e tempo limite dos bancos
+INTERVALO_AGENDA = 0.2
+
+
+def em_thread(fn: Callable, *args) -> Future:
+    """executa fn em uma thread daemon: um banco preso (ex: pyodbc.connect
+    em um compartilhamento travado) nao segura o lote nem o fechamento do app
+    """
+    futuro = Future()
+    futuro.set_running_or_notify_cancel()
+
+    def executar() -> None:
+        try:
+            futuro.set_result(fn(*args))
+        except BaseException as e:
+            futuro.set_exception(e)
+
+    threading.Thread(target=executar, name='banco', daemon=True).start()
+
+    return futuro
+
+
+def tempo_esgotado(timeout: float) -> None:
+    raise TimeoutError(f'Tempo limite de {timeout:g}s excedido, banco ignorado')
+
+
+def registra_pid(pids: SimpleQueue) -> None:
+    """initializer do pool, cada processo informa o proprio pid"""
+    pids.put(os.getpid())
+
+
+class PoolProcessos:
+    """ProcessPoolExecutor que guarda o pid dos processos (initializer)
+
+    NOTE: o executor nao tem api publica para encerrar um processo preso,
+    encerra() termina pelos pids registrados, sem o executor._processes
+    """
+
+    def __init__(self, workers: int) -> None:
+        self.fila = SimpleQueue()
+        self.pids: set[int] = set()
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=registra_pid,
+            initargs=(self.fila,)
+        )
+
+    def submit(self, fn: Callable, *args) -> Future:
+        return self.executor.submit(fn, *args)
+
+    def encerra(self, terminar: bool) -> None:
+        if terminar:
+            while not self.fila.empty():
+                self.pids.add(self.fila.get())
+
+            for pid in self.pids:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except OSError:
+                    # NOTE: processo ja encerrado
+                    pass
+
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def agenda(
+    raiz: list[Path],
+    transform: Callable[[Path], Any],
+    workers: int,
+    pool: str,
+    timeout: float | None = None,
+    cancel: CancelToken | None = None
+) -> Generator[tuple[int, Path, Callable[[], Any]], Any, None]:
+    """entrega (posicao, banco, resultado) conforme cada banco termina
+
+    no maximo workers bancos em andamento, o tempo de cada um conta a
+    partir do inicio da execucao (futuro.running()), banco acima do
+    timeout e abandonado (resultado levanta TimeoutError)
+
+    na thread a vaga passa para o proximo da fila, no pool de processos
+    o banco abandonado segue ocupando o processo ate terminar: a vaga
+    so volta quando ele termina, e com todos os processos presos o pool
+    e encerrado e trocado por um novo
+
+    NOTE: no pool de processos o transform segue por pickle, funcao do
+    modulo ou classe com __call__ (CachedTransform, TransformProduto,
+    TransformMedido, TransformCompleto), nunca closure ou lambda
+    """
+    pendentes = list(enumerate(raiz))[::-1]
+    ativos: dict[Future, tuple[int, Path]] = {}
+    inicios: dict[Future, float] = {}
+    presos: set[Future] = set()
+    executor = PoolProcessos(workers) if pool == 'process' else None
+    abandonados = False
+
+    try:
+        while pendentes or ativos:
+            if cancel is not None:
+                cancel.verifica()
+
+            presos = {futuro for futuro in presos if not futuro.done()}
+
+            if pendentes and presos and len(presos) >= workers:
+                executor.encerra(terminar=True)
+                executor = PoolProcessos(workers)
+                presos.clear()
+
+            while pendentes and len(ativos) + len(presos) < workers:
+                pos, file = pendentes.pop()
+                futuro = executor.submit(transform, file) if executor else em_thread(transform, file)
+                ativos[futuro] = (pos, file)
+
+            prontos, _ = wait(ativos, timeout=INTERVALO_AGENDA, return_when=FIRST_COMPLETED)
+
+            for futuro in prontos:
+                pos, file = ativos.pop(futuro)
+                inicios.pop(futuro, None)
+                yield pos, file, futuro.result
+
+            if timeout:
+                agora = time.monotonic()
+
+                for futuro, (pos, file) in list(ativos.items()):
+                    if futuro.running():
+                        inicios.setdefault(futuro, agora)
+
+                    if agora - inicios.get(futuro, agora) > timeout:
+                        del ativos[futuro]
+                        del inicios[futuro]
+                        abandonados = True
+
+                        if executor is not None:
+                            presos.add(futuro)
+
+                        yield pos, file, partial(tempo_esgotado, timeout)
+    finally:
+        if executor is not None:
+            executor.encerra(terminar=abandonados or bool(ativos))
+
+
+def processa_arquivos(
+    raiz: list[Path],
+    transform: Callable[[Path], pd.DataFrame],
+    progresso: Progresso,
+    workers: int = 1,
+    pool: str = 'thread',
+    consumir: Callable[[int, pd.DataFrame], None] | None = None,
+    metricas: Metricas | None = None,
+    cancel: CancelToken | None = None,
+    timeout: float | None = None
+) -> list[pd.DataFrame]:
+    """aplica o transform em cada banco da raiz
+
+    workers > 1 processa os bancos em paralelo no pool escolhido,
+    o progresso chega conforme cada arquivo termina e o retorno
+    segue a ordem da raiz, bancos com erro vao para o log e sao ignorados
+
+    consumir -> recebe (posicao na raiz, resultado) assim que cada banco
+    termina, no lugar de acumular os resultados no retorno
+
+    metricas -> recebe o fetch e o transform de cada banco (TransformMedido)
+
+    cancel -> conferido entre os bancos, levanta Cancelado
+    timeout -> segundos por banco, o banco que passar e ignorado (log)
+    """
+    resultados: dict[int, pd.DataFrame] = {}
+
+    if metricas is not None:
+        transform = TransformMedido(transform)
+
+    def concluir(pos: int, file: Path, resultado: Callable[[], pd.DataFrame]) -> None:
         out_file_log = '/'.join(file.parts[-2:])
 
         try:
-            df = transform_produto(file)
-            pre_dfs.append(df)
+            df = resultado()
 
-            progress_callback.emit((valor, f"Transformando, {out_file_log}"))
+            if metricas is not None:
+                df, registros = df
+                for reg in registros:
+                    metricas.adiciona(reg)
+
+            if consumir is None:
+                resultados[pos] = df
+            else:
+                consumir(pos, df)
 
         except Exception as e:
-            progress_callback.emit((valor, f"Error, {out_file_log}"))
+            progresso.emit(f"Error, {out_file_log}")
             logging.warning(f"{e} @{file}")
-            continue
 
+            if metricas is not None:
+                metricas.adiciona(registro('erro', str(file), 0, erro=f'{e!r}'))
+        else:
+            progresso.emit(f"Transformando, {out_file_log}")
+
+    if workers <= 1 and not timeout:
+        for pos, file in enumerate(raiz):
+            if cancel is not None:
+                cancel.verifica()
+
+            concluir(pos, file, lambda f=file: transform(f))
     else:
+        for pos, file, resultado in agenda(raiz, transform, max(workers, 1), pool, timeout, cancel):
+            concluir(pos, file, resultado)
 
-        if not pre_dfs:
-            msg_error = "Erro em todas os bancos listados !"
-            logging.warning(f"{msg_error}")
-            raise ValueError(msg_error)
-        
-        dfs = (
-            pd.concat(pre_dfs, ignore_index=True)
-            .loc[:, lambda _df: sorted(_df.columns.to_list(), key=lambda k: 10 if k == 'vendas' else 1)]
-            .fillna(0)
-            .pipe(lambda _df: _df.assign(**{col: _df[col].astype('int32') for col in _df.columns if '-' in col}))
-            .astype({'prme_cd_produto': 'int64'})
-            .merge(categ, on=["prme_cd_produto"])
-        )
+    if cancel is not None:
+        cancel.verifica()
 
-        now = f'{datetime.now():%d%m%Y_%H%M%S}'
-        nome_saida = f'Produtos_{now}.{export}'
+    return [resultados[pos] for pos in sorted(resultados)]
 
-        progress_callback.emit((valor + 1, f'Produtos Consolidado: {nome_saida}'))
 
-        if export == 'xlsx':
-           dfs.to_excel(nome_saida, index=False)
-        elif export == 'csv':
-           dfs.to_csv(nome_saida, sep=';', encoding='utf-8', index=False)
-        else:
-            dfs.to_parquet(nome_saida, index=False)
+def nome_arquivo(prefixo: str, export: str, output: Path | str | None = None) -> str:
+    """nome do consolidado, Prefixo_ddmmYYYY_HHMMSS.export
+    output -> pasta de destino ou caminho completo do arquivo,
+    None grava na pasta atual
+    """
+    now = f'{datetime.now():%d%m%Y_%H%M%S}'
+    nome = f'{prefixo}_{now}.{export}'
+
+    if output is None:
+        return nome
+
+    output = Path(output)
+
+    if output.is_dir() or not output.suffix:
+        output.mkdir(parents=True, exist_ok=True)
+        return str(output / nome)
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    return str(output)
+
+
+def sem_resultados() -> ValueError:
+    msg_error = "Erro em todas os bancos listados !"
+    logging.warning(f"{msg_error}")
+
+    return ValueError(msg_error)
+
+
+def carrega_categ(
+    categ_cache: CategCache,
+    progresso: Progresso,
+    metricas: Metricas | None = None,
+    **kwargs
+) -> Future:
+    """inicia a carga da base de categoria em segundo plano
+    (memoria da sessao, disco dentro do ttl ou download do athena)
+
+    NOTE: o CategCache ja guarda a base com ttl, a consulta vai sem
+    query_cache para nao manter a mesma base duas vezes no disco
+    """
+    progresso.info('Base Categoria: carregando em paralelo')
+    metricas = metricas or Metricas()
+
+    def carregar() -> pd.DataFrame:
+        with metricas.etapa('categoria') as etapa:
+            categ, origem = categ_cache.load(
+                lambda: categ_athena(**kwargs).astype({'prme_cd_produto': 'int64'})
+            )
+            etapa.conta(len(categ), tamanho(categ), origem=origem)
+
+        progresso.emit(f'Base Categoria: {origem}')
+
+        return categ
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='categ')
+    futuro = executor.submit(carregar)
+    executor.shutdown(wait=False)
+
+    return futuro
+
+
+class TransformCompleto:
+    """transform_produto e transform_ruptura na mesma sessao do banco,
+    cada tabela lida uma vez para os dois relatorios
+
+    com cache usa as mesmas entradas do CachedTransform de cada
+    transform, so abre o banco se faltar algum dos dois resultados
+    kardex_cache -> kardex incremental do Produtos (kardex_mensal)
+    """
+
+    def __init__(
+        self,
+        cache: RunCache | None = None,
+        versao: int = PIPELINE_VERSION,
+        kardex_cache: KardexCache | None = None
+    ) -> None:
+        self.cache = cache
+        self.versao = versao
+        self.kardex_cache = kardex_cache
+
+    def __call__(self, file: Path) -> tuple[pd.DataFrame, pd.DataFrame]:
+        partes = [
+            (
+                transform_produto,
+                partial(_transform_produto, kardex_cache=self.kardex_cache),
+                leituras_produto(self.kardex_cache)
+            ),
+            (transform_ruptura, _transform_ruptura, LEITURAS_RUPTURA),
+        ]
+        resultados = [None, None]
+        chaves = [None, None]
+
+        if self.cache is not None:
+            for i, (transform, _, _) in enumerate(partes):
+                chaves[i] = self.cache.chave(file, transform.__name__, self.versao)
+                resultados[i] = self.cache.get(chaves[i])
+
+        faltam = [i for i, df in enumerate(resultados) if df is None]
+
+        if faltam:
+            leituras = [leitura for i in faltam for leitura in partes[i][2]]
+
+            with sessao_de(file, leituras) as sessao:
+                for i in faltam:
+                    resultados[i] = partes[i][1](sessao)
+
+                    if self.cache is not None:
+                        self.cache.put(chaves[i], resultados[i])
+
+        return resultados[0], resultados[1]
+
+
+def stream_produtos(
+    nome_saida: str,
+    export: str,
+    futuro_categ: Future,
+    layout: str = 'largo'
+) -> tuple[StreamExport, Callable[[pd.DataFrame], pd.DataFrame]]:
+    """saida em streaming do Produtos e o pivot aplicado em cada loja"""
+    if layout == 'longo':
+        prepara = lambda df: prepara_longo(df, futuro_categ.result())
+        pivota = lambda df: df
+    else:
+        prepara = lambda df: prepara_produtos(df, futuro_categ.result())
+        pivota = lambda df: pivota_kardex([df])
+
+    return STREAMS[export](nome_saida, prepara, ordem_colunas), pivota
+
+
+def saida_produtos(
+    pre_dfs: list[pd.DataFrame],
+    futuro_categ: Future,
+    progresso: Progresso,
+    nome_saida: str,
+    export: str,
+    engine: str = 'pandas',
+    layout: str = 'largo',
+    metricas: Metricas | None = None
+) -> pd.DataFrame | None:
+    """consolida o Produtos com a base categoria e grava o arquivo"""
+    metricas = metricas or Metricas()
+
+    progresso.info('Aguardando Base Categoria')
+    with metricas.etapa('espera_categoria'):
+        categ = futuro_categ.result()
+
+    if engine == 'duckdb':
+        progresso.emit(f'Produtos Consolidado: {nome_saida}')
+
+        # NOTE: union, pivot, join e export no mesmo plano do duckdb
+        with metricas.etapa('merge', engine='duckdb') as etapa:
+            dfs = consolida_produtos_duckdb(pre_dfs, categ, nome_saida, export, layout)
+            etapa.conta(None if dfs is None else len(dfs), tamanho_arquivo(nome_saida))
+
+        return dfs
+
+    dfs = consolida_produtos(pre_dfs, categ, layout, metricas)
+
+    progresso.emit(f'Produtos Consolidado: {nome_saida}')
+    exporta_medido(dfs, nome_saida, export, metricas)
+
+    return dfs
+
+
+def saida_ruptura(
+    pre_dfs: list[pd.DataFrame],
+    progresso: Progresso,
+    nome_saida: str,
+    export: str,
+    metricas: Metricas | None = None
+) -> pd.DataFrame:
+    metricas = metricas or Metricas()
+
+    with metricas.etapa('merge') as etapa:
+        dfs = pd.concat(pre_dfs, ignore_index=True)
+        etapa.conta(len(dfs), tamanho(dfs))
+
+    progresso.emit(f'Ruptura Consolidada: {nome_saida}')
+    exporta_medido(dfs, nome_saida, export, metricas)
 
     return dfs
 
 
+def exporta_medido(dfs: pd.DataFrame, nome_saida: str, export: str, metricas: Metricas) -> None:
+    with metricas.etapa('exporta') as etapa:
+        exporta(dfs, nome_saida, export)
+        etapa.conta(len(dfs), tamanho_arquivo(nome_saida), export=export)
+
+
+def grava_historico_medido(dfs: pd.DataFrame, pasta: Path | str, metricas: Metricas) -> None:
+    """acrescenta a Ruptura ao historico particionado (history.py)"""
+    from history import grava_historico
+
+    with metricas.etapa('historico') as etapa:
+        particoes = grava_historico(dfs, pasta)
+        etapa.conta(len(dfs), tamanho(dfs), particoes=particoes)
+
+
+def fecha_stream(saida: StreamExport, nome_saida: str, metricas: Metricas) -> None:
+    """grava o arquivo final do streaming (etapa exporta)"""
+    with metricas.etapa('exporta') as etapa:
+        linhas = saida.close()
+        etapa.conta(linhas, tamanho_arquivo(nome_saida), export=Path(nome_saida).suffix[1:], stream=True)
+
+
+def main_produtos(
+    raiz: list[Path], 
+    export: str,
+    progress_callback,
+    workers: int = 1,
+    pool: str = 'thread',
+    cache: RunCache | None = None,
+    engine: str = 'pandas',
+    stream: bool = False,
+    categ_cache: CategCache | None = None,
+    layout: str = 'largo',
+    output: Path | str | None = None,
+    metrics_callback = None,
+    cancel: CancelToken | None = None,
+    timeout: float | None = None,
+    kardex_cache: KardexCache | None = None,
+    **kwargs
+) -> pd.DataFrame | None:
+
+    # TODO: Categoria athena -- carregada em paralelo com os bancos,
+    # o merge espera por ela apenas no final
+    progresso = Progresso(progress_callback)
+    metricas = Metricas(metrics_callback)
+    futuro_categ = carrega_categ(categ_cache or CategCache(CACHE_DIR), progresso, metricas, **kwargs)
+
+    transform = transform_produto if kardex_cache is None else TransformProduto(kardex_cache)
+    if cache is not None:
+        transform = CachedTransform(transform, cache, PIPELINE_VERSION)
+
+    nome_saida = nome_arquivo('Produtos', export, output)
+
+    with metricas.relatorio(nome_saida):
+        # TODO: Streaming -- cada loja segue para o arquivo final sem acumular em memoria
+        if stream and export in STREAMS:
+            saida, pivota = stream_produtos(nome_saida, export, futuro_categ, layout)
+
+            with saida:
+                consumir = lambda pos, df: saida.add(pos, pivota(df))
+                processa_arquivos(raiz, transform, progresso, workers, pool, consumir, metricas, cancel, timeout)
+
+                if cache is not None:
+                    cache.evict()
+
+                if not saida.arquivos:
+                    raise sem_resultados()
+
+                progresso.info('Aguardando Base Categoria')
+                with metricas.etapa('espera_categoria'):
+                    futuro_categ.result()
+
+                progresso.emit(f'Produtos Consolidado: {nome_saida}')
+                fecha_stream(saida, nome_saida, metricas)
+
+            return None
+
+        pre_dfs = processa_arquivos(
+            raiz, transform, progresso, workers, pool,
+            metricas=metricas, cancel=cancel, timeout=timeout
+        )
+
+        if cache is not None:
+            cache.evict()
+
+        if not pre_dfs:
+            raise sem_resultados()
+
+        return saida_produtos(pre_dfs, futuro_categ, progresso, nome_saida, export, engine, layout, metricas)
+
+
 def main_ruptura(
     raiz: list[Path], 
     export: str,
-    progress_callback
-) -> pd.DataFrame:
+    progress_callback,
+    workers: int = 1,
+    pool: str = 'thread',
+    cache: RunCache | None = None,
+    stream: bool = False,
+    output: Path | str | None = None,
+    metrics_callback = None,
+    cancel: CancelToken | None = None,
+    timeout: float | None = None,
+    historico: Path | str | None = None
+) -> pd.DataFrame | None:
+    """historico -> pasta do parquet particionado por data e filial,
+    recebe tambem o consolidado (history.grava_historico)
+    """
 
-    pre_dfs = []
-    for valor, file in enumerate(raiz, 2):
-        out_file_log = '/'.join(file.parts[-2:])
+    progresso = Progresso(progress_callback, inicio=2)
+    metricas = Metricas(metrics_callback)
 
-        try:
-            progress_callback.emit((valor, f"Transformando, {out_file_log}"))
-            df = transform_ruptura(file)
-            pre_dfs.append(df)
+    transform = transform_ruptura
+    if cache is not None:
+        transform = CachedTransform(transform, cache, PIPELINE_VERSION)
 
-        except Exception as e:
-            progress_callback.emit((valor, f"Error, {out_file_log}"))
-            logging.warning(f"{e} @{file}")
-            continue
+    nome_saida = nome_arquivo('Ruptura', export, output)
+
+    with metricas.relatorio(nome_saida):
+        if stream and export in STREAMS:
+            # NOTE: uma linha por loja, o historico pode acumular em memoria
+            lojas: list[pd.DataFrame] = []
+
+            with STREAMS[export](nome_saida) as saida:
+                def consumir(pos: int, df: pd.DataFrame) -> None:
+                    saida.add(pos, df)
+
+                    if historico is not None:
+                        lojas.append(df)
+
+                processa_arquivos(raiz, transform, progresso, workers, pool, consumir, metricas, cancel, timeout)
+
+                if cache is not None:
+                    cache.evict()
+
+                if not saida.arquivos:
+                    raise sem_resultados()
+
+                progresso.emit(f'Ruptura Consolidada: {nome_saida}')
+                fecha_stream(saida, nome_saida, metricas)
+
+            if lojas:
+                grava_historico_medido(pd.concat(lojas, ignore_index=True), historico, metricas)
+
+            return None
+
+        pre_dfs = processa_arquivos(
+            raiz, transform, progresso, workers, pool,
+            metricas=metricas, cancel=cancel, timeout=timeout
+        )
+
+        if cache is not None:
+            cache.evict()
 
-    else:
         if not pre_dfs:
-            msg_error = "Erro em todas os bancos listados !"
-            logging.warning(f"{msg_error}")
-            raise ValueError(msg_error)
-        
-        dfs = pd.concat(pre_dfs, ignore_index=True)
+            raise sem_resultados()
 
-        now = f'{datetime.now():%d%m%Y_%H%M%S}'        
-        nome_saida = f'Ruptura_{now}.{export}'
+        dfs = saida_ruptura(pre_dfs, progresso, nome_saida, export, metricas)
 
-        progress_callback.emit((valor + 1, f'Ruptura Consolidada: {nome_saida}'))
+        if historico is not None:
+            grava_historico_medido(dfs, historico, metricas)
 
-        if export == 'xlsx':
-           dfs.to_excel(nome_saida, index=False)
-        elif export == 'csv':
-           dfs.to_csv(nome_saida, sep=';', encoding='utf-8', index=False)
-        else:
-            dfs.to_parquet(nome_saida, index=False)
+        return dfs
+
+
+def main_completo(
+    raiz: list[Path], 
+    export: str,
+    progress_callback,
+    workers: int = 1,
+    pool: str = 'thread',
+    cache: RunCache | None = None,
+    engine: str = 'pandas',
+    stream: bool = False,
+    categ_cache: CategCache | None = None,
+    layout: str = 'largo',
+    output: Path | str | None = None,
+    metrics_callback = None,
+    cancel: CancelToken | None = None,
+    timeout: float | None = None,
+    kardex_cache: KardexCache | None = None,
+    historico: Path | str | None = None,
+    **kwargs
+) -> tuple[pd.DataFrame | None, pd.DataFrame | None]:
+    """Produtos e Ruptura na mesma passada pelos bancos
+
+    cada loja e aberta uma vez (TransformCompleto), os dois consolidados
+    sao gravados no final, output e a pasta de destino dos dois arquivos
+    um banco com erro fica fora dos dois relatorios
+
+    o relatorio de metricas fica ao lado do arquivo do Produtos
+    historico -> a Ruptura vai tambem para o historico particionado
+    """
+    progresso = Progresso(progress_callback)
+    metricas = Metricas(metrics_callback)
+    futuro_categ = carrega_categ(categ_cache or CategCache(CACHE_DIR), progresso, metricas, **kwargs)
+
+    transform = TransformCompleto(cache, kardex_cache=kardex_cache)
+
+    if output is not None and Path(output).suffix:
+        output = Path(output).parent
+
+    nome_produtos = nome_arquivo('Produtos', export, output)
+    nome_ruptura = nome_arquivo('Ruptura', export, output)
+
+    with metricas.relatorio(nome_produtos):
+        if stream and export in STREAMS:
+            saida_prod, pivota = stream_produtos(nome_produtos, export, futuro_categ, layout)
+            lojas: list[pd.DataFrame] = []
+
+            with saida_prod, STREAMS[export](nome_ruptura) as saida_rup:
+                def consumir(pos: int, dfs: tuple[pd.DataFrame, pd.DataFrame]) -> None:
+                    produto, ruptura = dfs
+                    saida_prod.add(pos, pivota(produto))
+                    saida_rup.add(pos, ruptura)
+
+                    if historico is not None:
+                        lojas.append(ruptura)
+
+                processa_arquivos(raiz, transform, progresso, workers, pool, consumir, metricas, cancel, timeout)
+
+                if cache is not None:
+                    cache.evict()
+
+                if not saida_rup.arquivos:
+                    raise sem_resultados()
+
+                progresso.emit(f'Ruptura Consolidada: {nome_ruptura}')
+                fecha_stream(saida_rup, nome_ruptura, metricas)
+
+                if lojas:
+                    grava_historico_medido(pd.concat(lojas, ignore_index=True), historico, metricas)
+
+                progresso.info('Aguardando Base Categoria')
+                with metricas.etapa('espera_categoria'):
+                    futuro_categ.result()
+
+                progresso.emit(f'Produtos Consolidado: {nome_produtos}')
+                fecha_stream(saida_prod, nome_produtos, metricas)
+
+            return None, None
+
+        resultados = processa_arquivos(
+            raiz, transform, progresso, workers, pool,
+            metricas=metricas, cancel=cancel, timeout=timeout
+        )
+
+        if cache is not None:
+            cache.evict()
+
+        if not resultados:
+            raise sem_resultados()
+
+        produtos, rupturas = map(list, zip(*resultados))
+
+        # NOTE: ruptura primeiro, nao depende da base categoria
+        dfs_ruptura = saida_ruptura(rupturas, progresso, nome_ruptura, export, metricas)
+
+        if historico is not None:
+            grava_historico_medido(dfs_ruptura, historico, metricas)
+
+        dfs_produtos = saida_produtos(
+            produtos, futuro_categ, progresso, nome_produtos, export, engine, layout, metricas
+        )
 
-    return dfs
\ No newline at end of file
+        return dfs_produtos, dfs_ruptura
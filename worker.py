@@ -1,4 +1,5 @@
 from PySide6.QtCore import *
+from cancel import CancelToken, Cancelado
 import traceback
 import sys
 
@@ -8,6 +9,8 @@ class WorkerSignals(QObject):
     error = Signal(tuple)
     result = Signal(object)
     progress = Signal(tuple)
+    metrics = Signal(dict)
+    cancelled = Signal()
 
 class Worker(QRunnable):
     def __init__(self, fn, *args, **kwargs):
@@ -16,8 +19,11 @@ class Worker(QRunnable):
         self.args = args
         self.kwargs = kwargs
         self.signals = WorkerSignals()
+        self.cancel = CancelToken()
 
         self.kwargs['progress_callback'] = self.signals.progress
+        self.kwargs['metrics_callback'] = self.signals.metrics
+        self.kwargs['cancel_token'] = self.cancel
 
     @Slot()
     def run(self):
@@ -26,6 +32,8 @@ class Worker(QRunnable):
                 *self.args, 
                 **self.kwargs
             )
+        except Cancelado:
+            self.signals.cancelled.emit()
         except:
             traceback.print_exc()
             exctype, value = sys.exc_info()[:2]